@@ -1,10 +1,39 @@
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import os
+import threading
+import time
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from models import User
+from services.metrics import Counter, Histogram
+from services.tokens import InvalidTokenError, verify_access_token
+
+# bcrypt cost; hashes made with another cost are upgraded on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Worker processes for hashing, so bcrypt never runs on the event loop or
+# holds the GIL of the serving process
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Reject requests that identify the user by user_id alone, without a token
+REQUIRE_ACCESS_TOKEN = os.getenv("REQUIRE_ACCESS_TOKEN", "0").lower() in ("1", "true", "yes")
 
 # Configure password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "Time to hash or verify a password in the worker pool, including the wait for a worker",
+    ("operation",)
+)
+PASSWORD_REHASHES = Counter("password_rehashes_total", "Password hashes upgraded at login to the current bcrypt settings")
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
 
 def verify_password(plain_password, hashed_password):
     """Verify a password against its hash"""
@@ -14,6 +43,39 @@ def get_password_hash(password):
     """Generate password hash"""
     return pwd_context.hash(password)
 
+def verify_and_rehash(plain_password, hashed_password):
+    """
+    Verify a password and, when its hash uses outdated settings, hash it again
+    Returns (verified, new hash or None)
+    """
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False, None
+    if pwd_context.needs_update(hashed_password):
+        return True, pwd_context.hash(plain_password)
+    return True, None
+
+def _get_hash_pool():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        return _hash_pool
+
+async def _run_in_hash_pool(operation, fn, *args):
+    started = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_hash_pool(), fn, *args)
+    finally:
+        PASSWORD_HASH_DURATION.observe(time.perf_counter() - started, operation=operation)
+
+async def ahash_password(password):
+    """Hash a password in the worker pool"""
+    return await _run_in_hash_pool("hash", get_password_hash, password)
+
+async def averify_and_rehash(plain_password, hashed_password):
+    """verify_and_rehash in the worker pool"""
+    return await _run_in_hash_pool("verify", verify_and_rehash, plain_password, hashed_password)
+
 def get_user_by_username(db: Session, username: str):
     """Get a user by username"""
     return db.query(User).filter(User.username == username).first()
@@ -22,9 +84,23 @@ def get_user_by_email(db: Session, email: str):
     """Get a user by email"""
     return db.query(User).filter(User.email == email).first()
 
-def create_user(db: Session, username: str, password: str, email: str = None):
-    """Create a new user"""
-    hashed_password = get_password_hash(password)
+def find_registration_conflict(db: Session, username: str, email: str = None):
+    """
+    Check whether a username or email is taken, with one query
+    Returns "username", "email" or None
+    """
+    criteria = User.username == username
+    if email is not None:
+        criteria = or_(criteria, User.email == email)
+    taken = db.query(User.username, User.email).filter(criteria).limit(2).all()
+    if any(row.username == username for row in taken):
+        return "username"
+    if taken:
+        return "email"
+    return None
+
+def add_user(db: Session, username: str, hashed_password: str, email: str = None):
+    """Insert a user whose password is already hashed"""
     db_user = User(
         username=username,
         email=email,
@@ -35,3 +111,50 @@ def create_user(db: Session, username: str, password: str, email: str = None):
     db.commit()
     db.refresh(db_user)
     return db_user
+
+def update_password_hash(db: Session, user_id: int, hashed_password: str):
+    """Replace a user's password hash, e.g. after a rehash at login"""
+    db.query(User).filter(User.id == user_id).update({User.hashed_password: hashed_password})
+    db.commit()
+    PASSWORD_REHASHES.inc()
+
+def create_user(db: Session, username: str, password: str, email: str = None):
+    """Create a new user"""
+    return add_user(db, username, get_password_hash(password), email)
+
+_bearer = HTTPBearer(auto_error=False)
+
+async def get_token_claims(credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)):
+    """Claims of the request's bearer token, or None without one; no DB lookup"""
+    if credentials is None:
+        return None
+    try:
+        return verify_access_token(credentials.credentials)
+    except InvalidTokenError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+def resolve_user_id(claims, user_id=None):
+    """
+    The user a request acts for: the token's user, or the legacy user_id
+    parameter when there is no token (unless REQUIRE_ACCESS_TOKEN is set)
+    A request with neither is rejected, so no route ever acts for all users
+    """
+    if claims is None:
+        if REQUIRE_ACCESS_TOKEN or user_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Not authenticated",
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        return user_id
+    if user_id is not None and user_id != claims["sub"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="user_id does not match the access token")
+    return claims["sub"]
+
+async def get_request_user_id(user_id: Optional[int] = None, claims: Optional[dict] = Depends(get_token_claims)):
+    """Dependency for routes that take user_id as a query parameter"""
+    return resolve_user_id(claims, user_id)
@@ -0,0 +1,107 @@
+"""
+Measure the per-request cost of authenticating task requests.
+
+1. Times create_access_token and verify_access_token on their own.
+2. Sends --requests GET /tasks requests, --concurrency at a time, for a
+   user with --tasks tasks, identified by
+       user_id      the unauthenticated user_id query parameter
+       token        a bearer token verified by auth.get_token_claims
+       db_lookup    a bearer token plus a users-table lookup per request,
+                    the usual alternative to stateless tokens
+   and reports latency and SQL statements per request.
+
+Requires httpx.
+
+    python -m benchmarks.auth_overhead [--requests 500] [--concurrency 8]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import configure_environment, reset_database, seed_tasks
+
+configure_environment()
+
+import httpx  # noqa: E402
+from fastapi import Depends, HTTPException  # noqa: E402
+from fastapi.security import HTTPBearer  # noqa: E402
+
+import auth  # noqa: E402
+from benchmarks.load import percentile  # noqa: E402
+from database import DB_QUERIES, AsyncSessionLocal, async_engine  # noqa: E402
+from main import app  # noqa: E402
+from models import User  # noqa: E402
+from services.tokens import create_access_token, verify_access_token  # noqa: E402
+
+async def claims_with_db_lookup(credentials=Depends(HTTPBearer(auto_error=False))):
+    """get_token_claims, then load the user to check it still exists and is active"""
+    claims = await auth.get_token_claims(credentials)
+    if claims is not None:
+        async with AsyncSessionLocal() as session:
+            user = await session.get(User, claims["sub"])
+        if user is None or not user.is_active:
+            raise HTTPException(status_code=401, detail="Unknown user")
+    return claims
+
+def time_tokens(iterations):
+    started = time.perf_counter()
+    tokens = [create_access_token(1)[0] for _ in range(iterations)]
+    created = time.perf_counter() - started
+    started = time.perf_counter()
+    for token in tokens:
+        verify_access_token(token)
+    verified = time.perf_counter() - started
+    return {
+        "create_us": round(created / iterations * 1e6, 2),
+        "verify_us": round(verified / iterations * 1e6, 2)
+    }
+
+async def run(args, url, headers):
+    latencies = []
+    queries_before = DB_QUERIES.value()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def request():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(url, headers=headers)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(request() for _ in range(args.requests)))
+    # Pooled async connections belong to this event loop
+    await async_engine.dispose()
+
+    latencies.sort()
+    return {
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "queries_per_request": round((DB_QUERIES.value() - queries_before) / args.requests, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tasks", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=20000, help="token operations to time")
+    args = parser.parse_args()
+
+    reset_database()
+    seed_tasks(1, args.tasks)
+    token, _ = create_access_token(1)
+    bearer = {"Authorization": f"Bearer {token}"}
+
+    report = {"config": vars(args), "tokens": time_tokens(args.iterations)}
+    report["user_id"] = asyncio.run(run(args, "/tasks?user_id=1&limit=20", {}))
+    report["token"] = asyncio.run(run(args, "/tasks?limit=20", bearer))
+    app.dependency_overrides[auth.get_token_claims] = claims_with_db_lookup
+    report["db_lookup"] = asyncio.run(run(args, "/tasks?limit=20", bearer))
+    app.dependency_overrides.clear()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Compare POST /tasks/batch with one request per task change.
+
+Reschedules a day's worth of tasks (updates), plus some creates and deletes,
+first through PUT/POST/DELETE /tasks calls and then as a single
+POST /tasks/batch. Reports wall time and the number of SQL statements each
+path sends to the database.
+
+Requires httpx.
+
+    python -m benchmarks.batch_mutations [--updates 200] [--creates 50] [--deletes 50]
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import configure_environment, reset_database, seed_tasks
+
+configure_environment()
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from database import SessionLocal, engine  # noqa: E402
+from main import app  # noqa: E402
+from models import Task  # noqa: E402
+
+statements = {"count": 0}
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count_statement(*args):
+    statements["count"] += 1
+
+def task_ids(user_id):
+    db = SessionLocal()
+    try:
+        return [task_id for (task_id,) in db.query(Task.id).filter(Task.user_id == user_id).order_by(Task.id)]
+    finally:
+        db.close()
+
+def make_operations(ids, args, start):
+    # Scheduled tasks may not overlap, so move and create tasks past the seeded hours
+    later = start + timedelta(hours=len(ids) + 1)
+    updates = [{"op": "update", "id": task_id, "changes": {"deadline": (later + timedelta(hours=i)).isoformat()}}
+               for i, task_id in enumerate(ids[:args.updates])]
+    deletes = [{"op": "delete", "id": task_id} for task_id in ids[args.updates:args.updates + args.deletes]]
+    creates = [{"op": "create", "task": {"title": f"New task {i}", "deadline": (later + timedelta(hours=args.updates + i)).isoformat()}}
+               for i in range(args.creates)]
+    return updates + deletes + creates
+
+async def per_request(client, user_id, operations):
+    for operation in operations:
+        if operation["op"] == "update":
+            response = await client.put(f"/tasks/{operation['id']}?user_id={user_id}", json=operation["changes"])
+        elif operation["op"] == "delete":
+            response = await client.delete(f"/tasks/{operation['id']}?user_id={user_id}")
+        else:
+            response = await client.post(f"/tasks?user_id={user_id}", json=operation["task"])
+        response.raise_for_status()
+
+async def batched(client, user_id, operations):
+    response = await client.post(f"/tasks/batch?user_id={user_id}", json={"operations": operations})
+    response.raise_for_status()
+    assert response.json()["applied"]
+
+async def measure(name, fn, client, user_id, operations):
+    statements["count"] = 0
+    started = time.perf_counter()
+    await fn(client, user_id, operations)
+    elapsed = time.perf_counter() - started
+    return {
+        "path": name,
+        "operations": len(operations),
+        "seconds": round(elapsed, 3),
+        "operations_per_second": round(len(operations) / elapsed, 1),
+        "sql_statements": statements["count"]
+    }
+
+async def main_async(args):
+    reset_database()
+    total = args.updates + args.deletes
+    seed_tasks(1, total)
+    seed_tasks(2, total)
+    start = datetime.now().replace(minute=0, second=0, microsecond=0)
+
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        results.append(await measure("per_request", per_request, client, 1, make_operations(task_ids(1), args, start)))
+        results.append(await measure("batch", batched, client, 2, make_operations(task_ids(2), args, start)))
+
+    print(json.dumps(results, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--creates", type=int, default=50)
+    parser.add_argument("--deletes", type=int, default=50)
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Measure bulk task import/export against one POST /tasks call per task.
+
+Imports an NDJSON and a CSV file (with a few invalid rows mixed in) through
+POST /tasks/import, compares the rate with per-task POST /tasks calls, then
+streams GET /tasks/export for growing table sizes and records the peak Python
+memory allocated while serving it, which should stay flat.
+
+Requires httpx.
+
+    python -m benchmarks.bulk_import [--tasks 20000] [--single 500]
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from benchmarks.common import configure_environment, reset_database, seed_tasks
+
+configure_environment()
+
+import httpx  # noqa: E402
+
+from main import app  # noqa: E402
+
+BAD_ROW_EVERY = 1000
+
+def task_payload(i, start):
+    return {
+        "title": f"Imported task {i}",
+        "description": "line one\nline two" if i % 7 == 0 else "bulk import",
+        "priority": ("Low", "Normal", "High")[i % 3],
+        "deadline": (start + timedelta(minutes=30 * i)).isoformat(),
+        "duration": 30,
+        "user_id": 1
+    }
+
+def ndjson_lines(count, start):
+    for i in range(count):
+        if i % BAD_ROW_EVERY == BAD_ROW_EVERY - 1:
+            yield '{"title": "broken", "deadline": "not a date"}\n'
+        else:
+            yield json.dumps(task_payload(i, start)) + "\n"
+
+def csv_lines(count, start):
+    yield "title,description,priority,deadline,duration,user_id\n"
+    for i in range(count):
+        row = task_payload(i, start)
+        if i % BAD_ROW_EVERY == BAD_ROW_EVERY - 1:
+            row["duration"] = "soon"
+        description = '"' + row["description"].replace('"', '""') + '"'
+        yield f'{row["title"]},{description},{row["priority"]},{row["deadline"]},{row["duration"]},{row["user_id"]}\n'
+
+async def chunked_body(lines, chunk_size=64 * 1024):
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield "".join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+async def export_peak_memory():
+    """Drive GET /tasks/export through the raw ASGI interface, discarding the body"""
+    received = {"bytes": 0, "rows": 0}
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/tasks/export", "raw_path": b"/tasks/export", "root_path": "",
+        "query_string": b"format=ndjson&user_id=1",
+        "headers": [], "client": ("bench", 0), "server": ("bench", 80)
+    }
+
+    requested = asyncio.Event()
+
+    async def receive():
+        # Deliver the empty request body once, then never report a disconnect
+        if requested.is_set():
+            await asyncio.Event().wait()
+        requested.set()
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            received["bytes"] += len(body)
+            received["rows"] += body.count(b"\n")
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"rows": received["rows"], "bytes": received["bytes"], "seconds": round(elapsed, 3), "peak_kib": round(peak / 1024, 1)}
+
+async def main_async(args):
+    reset_database()
+    seed_tasks(1, 0)
+    start = datetime.now().replace(minute=0, second=0, microsecond=0)
+    report = {"tasks": args.tasks}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        for fmt, lines in (("ndjson", ndjson_lines), ("csv", csv_lines)):
+            started = time.perf_counter()
+            response = await client.post(
+                f"/tasks/import?format={fmt}&user_id=1", content=chunked_body(lines(args.tasks, start)))
+            elapsed = time.perf_counter() - started
+            body = response.json()
+            report[f"import_{fmt}"] = {
+                "imported": body["imported"],
+                "failed": body["failed"],
+                "first_error": body["errors"][0] if body["errors"] else None,
+                "seconds": round(elapsed, 3),
+                "rows_per_second": round(body["imported"] / elapsed, 1)
+            }
+            # Scheduled tasks may not overlap, so each batch of tasks starts after the last
+            start += timedelta(minutes=30 * args.tasks)
+
+        started = time.perf_counter()
+        for i in range(args.single):
+            response = await client.post("/tasks?user_id=1", json=task_payload(i, start))
+            response.raise_for_status()
+        elapsed = time.perf_counter() - started
+        report["single_post"] = {"tasks": args.single, "seconds": round(elapsed, 3),
+                                 "rows_per_second": round(args.single / elapsed, 1)}
+        start += timedelta(minutes=30 * args.single)
+
+    # Grow the table between exports; peak memory should not grow with it
+    report["export"] = [await export_peak_memory()]
+    for _ in range(2):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            await client.post("/tasks/import?format=ndjson&user_id=1", content=chunked_body(ndjson_lines(2 * args.tasks, start)))
+        start += timedelta(minutes=30 * 2 * args.tasks)
+        report["export"].append(await export_peak_memory())
+
+    print(json.dumps(report, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--single", type=int, default=500)
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
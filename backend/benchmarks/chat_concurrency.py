@@ -0,0 +1,88 @@
+"""
+Measure /chat throughput as the number of in-flight chats grows.
+
+Drives the real FastAPI app in-process (httpx ASGITransport) with a fake model
+that sleeps asynchronously. The "blocking" run swaps the route back to the
+synchronous chat_with_ai, which is how /chat behaved before it was async, so
+the two runs show serialized versus concurrent throughput.
+
+Requires httpx.
+
+    python -m benchmarks.chat_concurrency [--latency 0.2] [--requests 64]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import configure_environment, reset_database, seed_tasks
+
+configure_environment()
+
+import httpx  # noqa: E402
+
+from benchmarks.fake_llm import FakeChatModel  # noqa: E402
+from main import app  # noqa: E402
+from routes import tasks as task_routes  # noqa: E402
+from services import task_ai  # noqa: E402
+
+MESSAGES = [
+    "how busy am I this week?",
+    "what should I focus on today?",
+    "add gym tomorrow at 7",
+    "any free time this afternoon?"
+]
+
+async def _blocking_chat(user_message, user_id=None, session=None):
+    """The pre-async behaviour: a sync call straight on the event loop"""
+    return task_ai.chat_with_ai(user_message, user_id)
+
+async def run(concurrency, total):
+    """Send `total` chats with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i):
+            async with semaphore:
+                payload = {"message": MESSAGES[i % len(MESSAGES)], "user_id": 1 + i % 4}
+                response = await client.post("/chat", json=payload)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(total / elapsed, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model latency in seconds")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    args = parser.parse_args()
+
+    reset_database()
+    for user_id in range(1, 5):
+        seed_tasks(user_id, 20)
+    task_ai.llm = FakeChatModel(latency=args.latency)
+    # Measure raw model round-trips, not extraction cache hits
+    task_ai.extraction_cache.maxsize = 0
+
+    report = {"latency_per_llm_call": args.latency, "async": [], "blocking": []}
+    for concurrency in args.concurrency:
+        report["async"].append(asyncio.run(run(concurrency, args.requests)))
+
+    task_routes.achat_with_ai = _blocking_chat
+    for concurrency in args.concurrency:
+        report["blocking"].append(asyncio.run(run(concurrency, args.requests)))
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Count LLM calls and wall time per chat message type.
+
+Compares the single-call intent router used by chat_with_ai against the
+previous pipeline, which ran the delete, edit and create extractors in
+sequence before the final reply.
+
+    python -m benchmarks.chat_llm_calls [--latency 0.2] [--rounds 5]
+"""
+import argparse
+import json
+import time
+
+from benchmarks.common import configure_environment, reset_database
+
+configure_environment()
+
+from benchmarks.fake_llm import FakeChatModel  # noqa: E402
+from services import task_ai  # noqa: E402
+from services.task_conflicts import TaskConflictError  # noqa: E402
+
+MESSAGES = {
+    "create": "add gym tomorrow at 7",
+    "edit": "move gym to high priority",
+    "delete": "delete the gym session",
+    "none": "how busy am I this week?"
+}
+
+def legacy_chat(user_message, user_id):
+    """The sequential extractor pipeline that chat_with_ai used to run"""
+    delete_data = task_ai.extract_task_deletion_request(user_message)
+    if delete_data.get("is_delete_request", False):
+        task_ai.handle_task_deletion_request(delete_data, user_id)
+    else:
+        edit_data = task_ai.extract_task_edit_request(user_message)
+        if edit_data.get("is_edit_request", False):
+            task_ai.handle_task_edit_request(edit_data, user_id)
+        else:
+            task_data = task_ai.extract_task_from_message(user_message)
+            if task_data.get("is_task", False):
+                task_data["user_id"] = user_id
+                try:
+                    task_ai.create_task_from_extraction(task_data)
+                except TaskConflictError:
+                    # Later rounds create the same task again
+                    pass
+    task_ai.get_task_summary(user_id)
+    return task_ai.llm.invoke([("system", "reply"), ("user", user_message)]).content
+
+def measure(chat, fake, rounds, user_id):
+    """Run every message type `rounds` times and collect calls and timings"""
+    results = {}
+    for kind, message in MESSAGES.items():
+        fake.reset()
+        started = time.perf_counter()
+        for _ in range(rounds):
+            # Keep a task around for the edit/delete messages to match; a due
+            # date, so repeating it does not overlap
+            task_ai.create_task_from_extraction({
+                "is_task": True, "title": "Gym", "date": time.strftime("%Y-%m-%d"),
+                "start_time": "07:00", "is_due_date": True, "user_id": user_id
+            })
+            chat(message, user_id)
+        elapsed = time.perf_counter() - started
+        results[kind] = {
+            "llm_calls_per_message": fake.calls / rounds,
+            "avg_seconds": round(elapsed / rounds, 4)
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model latency in seconds")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    reset_database()
+    fake = FakeChatModel(latency=args.latency)
+    task_ai.llm = fake
+    # Measure raw model round-trips, not extraction cache hits
+    task_ai.extraction_cache.maxsize = 0
+
+    report = {
+        "latency_per_llm_call": args.latency,
+        "router": measure(task_ai.chat_with_ai, fake, args.rounds, user_id=1),
+        "sequential": measure(legacy_chat, fake, args.rounds, user_id=2)
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
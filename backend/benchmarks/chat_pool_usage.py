@@ -0,0 +1,160 @@
+"""
+Measure database pool usage of the chat pipeline.
+
+Sends each chat message type through POST /chat and reports, per request,
+the pooled connections checked out, the commits and the SQL statements run.
+The "per_helper" path runs the same pipeline without a shared session, so
+every helper opens its own, as it did before the unit of work. These runs
+keep the task snapshots out of memory so every read reaches the database;
+"warm_snapshots" repeats the unit-of-work path with the user's snapshot
+cached, as their previous turn leaves it.
+
+Then runs concurrent chats and reports how long connections stayed checked
+out in total, with and without handing the connection back before each model
+call.
+
+Requires httpx.
+
+    python -m benchmarks.chat_pool_usage [--latency 0.1] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import configure_environment, reset_database, seed_tasks
+
+configure_environment()
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from benchmarks.fake_llm import FakeChatModel  # noqa: E402
+from database import async_engine, engine  # noqa: E402
+from main import app  # noqa: E402
+from services import task_ai  # noqa: E402
+from services.recurrence import recurrence_cache  # noqa: E402
+from services.task_state import snapshot_cache  # noqa: E402
+
+MESSAGES = {
+    "create": "add gym tomorrow at 7",
+    "edit": "move gym to high priority",
+    "delete": "delete the gym session",
+    "none": "how busy am I this week?"
+}
+
+stats = {"checkouts": 0, "commits": 0, "statements": 0, "held_seconds": 0.0}
+_checked_out_at = {}
+
+for target in (engine, async_engine.sync_engine):
+    @event.listens_for(target, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        stats["checkouts"] += 1
+        _checked_out_at[id(connection_record)] = time.perf_counter()
+
+    @event.listens_for(target, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        started = _checked_out_at.pop(id(connection_record), None)
+        if started is not None:
+            stats["held_seconds"] += time.perf_counter() - started
+
+    @event.listens_for(target, "commit")
+    def _commit(*args):
+        stats["commits"] += 1
+
+    @event.listens_for(target, "before_cursor_execute")
+    def _statement(*args):
+        stats["statements"] += 1
+
+def reset_stats():
+    for key in ("checkouts", "commits", "statements", "held_seconds"):
+        stats[key] = 0
+
+def per_helper_chat(message, user_id):
+    """The pipeline with no shared session: each helper opens its own"""
+    dispatched = task_ai.dispatch_intent(task_ai.classify_message(message, user_id), user_id)
+    task_ai.get_task_summary(user_id)
+    return dispatched
+
+def add_gym_task(user_id):
+    # Keep a task around for the edit/delete messages to match; a due date,
+    # so repeating it does not overlap
+    task_ai.create_task_from_extraction({
+        "is_task": True, "title": "Gym", "date": "2030-01-01", "start_time": "07:00", "is_due_date": True,
+        "user_id": user_id
+    })
+
+async def per_request(client, user_id, helper_user_id):
+    """Both paths get their own user, so each creates its task without overlapping the other's"""
+    results = {"unit_of_work": {}, "per_helper": {}}
+    for kind, message in MESSAGES.items():
+        add_gym_task(user_id)
+        reset_stats()
+        response = await client.post("/chat", json={"message": message, "user_id": user_id})
+        response.raise_for_status()
+        results["unit_of_work"][kind] = {key: stats[key] for key in ("checkouts", "commits", "statements")}
+
+        add_gym_task(helper_user_id)
+        reset_stats()
+        per_helper_chat(message, helper_user_id)
+        results["per_helper"][kind] = {key: stats[key] for key in ("checkouts", "commits", "statements")}
+    return results
+
+async def per_request_warm(client, user_id):
+    """Checkouts per turn with the snapshot caches on and warmed before each turn"""
+    results = {}
+    for kind, message in MESSAGES.items():
+        add_gym_task(user_id)
+        task_ai.get_task_summary(user_id)
+        reset_stats()
+        response = await client.post("/chat", json={"message": message, "user_id": user_id})
+        response.raise_for_status()
+        results[kind] = {key: stats[key] for key in ("checkouts", "commits", "statements")}
+    return results
+
+async def connection_hold_time(client, concurrency):
+    """Total seconds connections spent checked out while serving concurrent chats"""
+    reset_stats()
+    await asyncio.gather(*(
+        client.post("/chat", json={"message": MESSAGES["none"], "user_id": 1 + i % 4})
+        for i in range(concurrency)
+    ))
+    return round(stats["held_seconds"], 3)
+
+async def main_async(args):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        report = {"per_request": await per_request(client, 1, 2)}
+
+        report["connection_seconds"] = {"concurrency": args.concurrency, "latency_per_llm_call": args.latency}
+        report["connection_seconds"]["released_before_llm"] = await connection_hold_time(client, args.concurrency)
+        release_connection = task_ai.release_connection
+        task_ai.release_connection = lambda db: None
+        try:
+            report["connection_seconds"]["held_during_llm"] = await connection_hold_time(client, args.concurrency)
+        finally:
+            task_ai.release_connection = release_connection
+
+        snapshot_cache.maxsize = recurrence_cache.maxsize = 4096
+        report["warm_snapshots"] = await per_request_warm(client, 3)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.1, help="fake model latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    reset_database()
+    for user_id in range(1, 5):
+        seed_tasks(user_id, 20)
+    task_ai.llm = FakeChatModel(latency=args.latency)
+    # Every request should reach the database, not the extraction cache
+    task_ai.extraction_cache.maxsize = 0
+    # Nor the in-memory task snapshots, until the warm_snapshots run
+    snapshot_cache.maxsize = 0
+    recurrence_cache.maxsize = 0
+
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Shared setup for the benchmark scripts.
+
+Run benchmarks from the backend directory, e.g.
+    python -m benchmarks.chat_llm_calls
+
+configure_environment() must be called before importing database, models or
+services.task_ai, because those modules read their settings at import time.
+"""
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+def configure_environment(database_url=None):
+    """Point the app at a throwaway SQLite database, with dummy API and token keys"""
+    if database_url is None:
+        handle, path = tempfile.mkstemp(prefix="scheduler_bench_", suffix=".db")
+        os.close(handle)
+        database_url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ.setdefault("ACCESS_TOKEN_SECRET", "benchmark-secret")
+    return database_url
+
+def reset_database():
+    """Drop and recreate all tables"""
+    import models  # noqa: F401 - registers the tables on Base
+    from database import init_db
+    init_db(drop_all=True)
+
+def seed_tasks(user_id, count, start=None):
+    """Insert `count` hourly tasks for a user and return their titles"""
+    from database import SessionLocal
+    from models import Task, User
+
+    start = start or datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    db = SessionLocal()
+    try:
+        if not db.get(User, user_id):
+            db.add(User(
+                id=user_id,
+                username=f"bench{user_id}",
+                email=f"bench{user_id}@example.com",
+                hashed_password="x",
+                created_at=datetime.now()
+            ))
+        titles = []
+        for i in range(count):
+            title = f"Task {user_id}-{i}"
+            titles.append(title)
+            db.add(Task(
+                title=title,
+                description="seeded by benchmark",
+                priority=("Low", "Normal", "High")[i % 3],
+                deadline=start + timedelta(hours=i),
+                duration=60,
+                user_id=user_id
+            ))
+        db.commit()
+        return titles
+    finally:
+        db.close()
+
+def seed_users(users, tasks_per_user, hashed_password="x", start=None):
+    """
+    Bulk-insert users 1..`users` (bench<N> / bench<N>@example.com), each with
+    `tasks_per_user` hourly tasks
+    """
+    from sqlalchemy import insert
+
+    from database import SessionLocal
+    from models import Task, User
+
+    start = start or datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    db = SessionLocal()
+    try:
+        db.execute(insert(User), [
+            {
+                "id": user_id,
+                "username": f"bench{user_id}",
+                "email": f"bench{user_id}@example.com",
+                "hashed_password": hashed_password,
+                "created_at": datetime.now()
+            }
+            for user_id in range(1, users + 1)
+        ])
+        rows = []
+        for user_id in range(1, users + 1):
+            for i in range(tasks_per_user):
+                rows.append({
+                    "title": f"Task {user_id}-{i}",
+                    "description": "seeded by benchmark",
+                    "priority": ("Low", "Normal", "High")[i % 3],
+                    "deadline": start + timedelta(hours=i),
+                    "duration": 60,
+                    "is_due_date": False,
+                    "user_id": user_id
+                })
+            if len(rows) >= 10000:
+                db.execute(insert(Task), rows)
+                rows = []
+        if rows:
+            db.execute(insert(Task), rows)
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,132 @@
+"""
+Compare overlap checks through the slot index with scans of a user's tasks.
+
+Seeds --users users with --tasks back-to-back hourly tasks each, then times
+    find_conflicts     the tasks a 90-minute slot at a random time would
+                       overlap, the lookup behind a rejected write and
+                       GET /tasks/conflicts?start=...
+    conflicting_pairs  every overlapping pair of a user's tasks, the
+                       GET /tasks/conflicts listing
+once through the SQLite R*Tree (services/task_conflicts.py) and once with the
+"scan" fallback, which reads the (user_id, deadline) index and, for pairs,
+every task of the user. Also reports the time per single-row insert with the
+overlap triggers and after dropping them.
+
+    python -m benchmarks.conflicts [--users 20] [--tasks 5000] [--lookups 500]
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import configure_environment, reset_database
+from benchmarks.load import percentile
+
+configure_environment()
+
+from sqlalchemy import insert, text  # noqa: E402
+
+from database import SessionLocal, engine  # noqa: E402
+from models import Task, User  # noqa: E402
+from services import task_conflicts  # noqa: E402
+
+def seed(user_count, task_count, start, batch_size=50000):
+    db = SessionLocal()
+    try:
+        db.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "hashed_password": "x", "created_at": datetime.now()}
+            for i in range(1, user_count + 1)
+        ])
+        rows = [
+            {"title": f"Task {user_id}-{i}", "priority": "Normal", "duration": 60, "is_due_date": False,
+             "user_id": user_id, "deadline": start + timedelta(hours=i)}
+            for user_id in range(1, user_count + 1) for i in range(task_count)
+        ]
+        for offset in range(0, len(rows), batch_size):
+            db.execute(insert(Task), rows[offset:offset + batch_size])
+        db.commit()
+    finally:
+        db.close()
+
+def use_backend(backend):
+    task_conflicts._backends[str(engine.url)] = backend
+
+def time_lookups(backend, windows):
+    use_backend(backend)
+    timings = []
+    found = 0
+    db = SessionLocal()
+    try:
+        for user_id, window_start in windows:
+            started = time.perf_counter()
+            found += len(task_conflicts.find_conflicts(db, user_id, window_start, window_start + timedelta(minutes=90)))
+            timings.append(time.perf_counter() - started)
+    finally:
+        db.close()
+    return {
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+        "p95_ms": round(percentile(sorted(timings), 95) * 1000, 3),
+        "conflicts_found": found
+    }
+
+def time_pairs(backend, user_ids):
+    use_backend(backend)
+    pairs = 0
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        for user_id in user_ids:
+            pairs += len(task_conflicts.find_conflicting_pairs(db, user_id))
+        elapsed = time.perf_counter() - started
+    finally:
+        db.close()
+    return {"mean_ms": round(elapsed / len(user_ids) * 1000, 3), "pairs_found": pairs}
+
+def time_inserts(user_id, start, count):
+    """Mean ms per committed single-row insert of non-overlapping tasks after `start`"""
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        for i in range(count):
+            db.execute(insert(Task), [{
+                "title": f"Inserted {i}", "priority": "Normal", "duration": 30, "is_due_date": False,
+                "user_id": user_id, "deadline": start + timedelta(hours=i)
+            }])
+            db.commit()
+        return round((time.perf_counter() - started) / count * 1000, 3)
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=5000, help="tasks per user")
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+
+    start = datetime.now().replace(minute=0, second=0, microsecond=0)
+    reset_database()
+    seed(args.users, args.tasks, start)
+
+    rng = random.Random(42)
+    windows = [
+        (rng.randint(1, args.users), start + timedelta(minutes=rng.randrange(args.tasks * 60)))
+        for _ in range(args.lookups)
+    ]
+    user_ids = list(range(1, args.users + 1))
+    report = {"config": vars(args)}
+    report["find_conflicts"] = {backend: time_lookups(backend, windows) for backend in ("rtree", "scan")}
+    report["conflicting_pairs"] = {backend: time_pairs(backend, user_ids) for backend in ("rtree", "scan")}
+
+    later = start + timedelta(hours=args.tasks + 1)
+    insert_ms = {"triggers": time_inserts(1, later, args.lookups)}
+    with engine.begin() as conn:
+        for trigger in ("tasks_no_overlap_bi", "tasks_no_overlap_bu", "tasks_slots_ai", "tasks_slots_ad", "tasks_slots_au"):
+            conn.execute(text(f"DROP TRIGGER {trigger}"))
+    insert_ms["no_triggers"] = time_inserts(2, later, args.lookups)
+    report["insert_ms"] = insert_ms
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Deterministic stand-in for the ChatOpenAI model used by services.task_ai.
+
+The fake answers every call with one JSON document that satisfies the intent
+router and each of the extract_* schemas (as tool-call arguments when bound
+with bind_tools), so the whole chat pipeline runs without network access.
+Latency is simulated with a sleep per call, token usage is estimated at four
+characters per token, and provider saturation, transient failures,
+invalid tool-call answers and prompt caching can be simulated too.
+"""
+import asyncio
+from collections import deque
+import json
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# OpenAI caches prompt prefixes from 1024 tokens on, in 128-token increments
+CACHE_MIN_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+
+DELETE_WORDS = ("delete", "remove", "cancel", "get rid of")
+EDIT_WORDS = ("move", "change", "reschedule", "rename", "update", "edit")
+CREATE_WORDS = ("add", "create", "schedule", "remind", "book")
+STOP_WORDS = {"the", "to", "at", "my", "a", "an", "for", "on", "in", "with"}
+
+def classify(message):
+    """Guess the intent of a benchmark message from its keywords"""
+    text = message.lower()
+    if any(word in text for word in DELETE_WORDS):
+        return "delete"
+    if any(word in text for word in EDIT_WORDS):
+        return "edit"
+    if any(word in text for word in CREATE_WORDS):
+        return "create"
+    return "none"
+
+def build_payload(message):
+    """Build a JSON payload that every extraction prompt can consume"""
+    intent = classify(message)
+    ignored = STOP_WORDS.union(*(w.split() for w in DELETE_WORDS + EDIT_WORDS + CREATE_WORDS))
+    words = [w for w in re.findall(r"[a-z]+", message.lower()) if w not in ignored]
+    keyword = words[0] if words else "task"
+    tomorrow = time.strftime("%Y-%m-%d", time.localtime(time.time() + 86400))
+
+    task = {
+        "title": keyword.capitalize(),
+        "description": message,
+        "priority": "Normal",
+        "date": tomorrow,
+        "start_time": "07:00",
+        "end_time": "08:00",
+        "is_due_date": False,
+        "uncertain_fields": []
+    }
+    identifiers = {"title_keywords": [keyword]}
+    changes = {"priority": "High"}
+
+    payload = {
+        "intent": intent,
+        "is_task": intent == "create",
+        "is_edit_request": intent == "edit",
+        "is_delete_request": intent == "delete",
+        "task_identifiers": identifiers,
+        "changes": changes,
+        "task": task
+    }
+    payload.update(task)
+    return payload
+
+def prompt_text(messages, tool=""):
+    """The prompt as the provider sees it: the tool definition, then the messages"""
+    return tool + "".join(f"{role}:{text}" for role, text in messages)
+
+def estimate_usage(messages, content, tool=""):
+    """Token usage in the shape of langchain's usage_metadata"""
+    prompt = len(prompt_text(messages, tool)) // 4
+    completion = len(content) // 4
+    return {"input_tokens": prompt, "output_tokens": completion, "total_tokens": prompt + completion}
+
+class FakeChatModel:
+    """
+    Counts calls and sleeps `latency` seconds before answering
+
+    capacity      calls the fake provider serves at full speed; past that,
+                  latency grows with the calls in flight, like a saturated API
+    failure_rate  share of calls failing with a transient ConnectionError
+    invalid_rate  share of tool-call answers missing their required fields
+    prompt_cache  simulate the provider's prefix cache: the prompt tokens
+                  shared with a recent prompt are reported as cache_read and
+                  cut the latency by `cache_speedup` times their share
+    A per-call `timeout` (the LLM gateway passes one) is honored: a call that
+    would take longer raises TimeoutError once it expires.
+    """
+
+    def __init__(self, latency=0.0, capacity=None, failure_rate=0.0, invalid_rate=0.0,
+                 prompt_cache=False, cache_speedup=0.5, seed=0):
+        self.latency = latency
+        self.capacity = capacity
+        self.failure_rate = failure_rate
+        self.invalid_rate = invalid_rate
+        self.prompt_cache = prompt_cache
+        self.cache_speedup = cache_speedup
+        self._recent_prompts = deque(maxlen=256)
+        self.calls = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.peak_in_flight = 0
+            self._recent_prompts.clear()
+
+    def _cache_read(self, prompt):
+        """Tokens of `prompt` served from the simulated prefix cache"""
+        if not self.prompt_cache:
+            return 0
+        shared = max((len(os.path.commonprefix([seen, prompt])) for seen in self._recent_prompts), default=0)
+        self._recent_prompts.append(prompt)
+        tokens = shared // 4
+        if tokens < CACHE_MIN_TOKENS:
+            return 0
+        return tokens - (tokens - CACHE_MIN_TOKENS) % CACHE_BLOCK_TOKENS
+
+    def _start(self, prompt):
+        """Count a call; return its latency, whether it fails and the cached prompt tokens"""
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            fails = self._random.random() < self.failure_rate
+            cached = self._cache_read(prompt)
+            latency = self.latency
+            if cached:
+                latency *= 1 - self.cache_speedup * cached / max(1, len(prompt) // 4)
+            if self.capacity:
+                latency *= max(1.0, self.in_flight / self.capacity)
+        return latency, fails, cached
+
+    def _finish(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _answer(self, messages):
+        user_message = messages[-1][1]
+        content = json.dumps(build_payload(user_message))
+        return SimpleNamespace(content=content, usage_metadata=estimate_usage(messages, content))
+
+    @staticmethod
+    def _report_cache_read(response, cached):
+        if cached:
+            response.usage_metadata["input_token_details"] = {"cache_read": cached}
+        return response
+
+    def _call(self, messages, timeout, answer, tool=""):
+        latency, fails, cached = self._start(prompt_text(messages, tool))
+        try:
+            if fails:
+                raise ConnectionError("fake transient failure")
+            if timeout is not None and latency > timeout:
+                time.sleep(timeout)
+                raise TimeoutError("fake model timed out")
+            if latency:
+                time.sleep(latency)
+            return self._report_cache_read(answer(messages), cached)
+        finally:
+            self._finish()
+
+    async def _acall(self, messages, timeout, answer, tool=""):
+        latency, fails, cached = self._start(prompt_text(messages, tool))
+        try:
+            if fails:
+                raise ConnectionError("fake transient failure")
+            if timeout is not None and latency > timeout:
+                await asyncio.sleep(timeout)
+                raise TimeoutError("fake model timed out")
+            if latency:
+                await asyncio.sleep(latency)
+            return self._report_cache_read(answer(messages), cached)
+        finally:
+            self._finish()
+
+    def invoke(self, messages, *args, timeout=None, **kwargs):
+        return self._call(messages, timeout, self._answer)
+
+    async def ainvoke(self, messages, *args, timeout=None, **kwargs):
+        return await self._acall(messages, timeout, self._answer)
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        """Answer with a call of the first tool, like a forced tool_choice"""
+        return FakeToolModel(self, tools[0])
+
+    async def astream(self, messages, *args, timeout=None, **kwargs):
+        """Stream the answer word by word, spreading the latency across chunks"""
+        latency, fails, cached = self._start(prompt_text(messages))
+        try:
+            if fails:
+                raise ConnectionError("fake transient failure")
+            answer = self._report_cache_read(self._answer(messages), cached)
+            words = answer.content.split(" ")
+            for i, word in enumerate(words):
+                if latency:
+                    await asyncio.sleep(latency / len(words))
+                yield SimpleNamespace(content=word if i == 0 else f" {word}", usage_metadata=None)
+            # Like OpenAI with stream_usage, usage comes on a final empty chunk
+            yield SimpleNamespace(content="", usage_metadata=answer.usage_metadata)
+        finally:
+            self._finish()
+
+class FakeToolModel:
+    """FakeChatModel bound to one schema tool: answers with tool_calls"""
+
+    def __init__(self, model, schema):
+        self.model = model
+        self.schema = schema
+        fields = getattr(schema, "model_fields", None) or schema.__fields__
+        self.fields = set(fields)
+        # The tool definition is sent with every call, ahead of the messages
+        self.tool = json.dumps(convert_to_openai_tool(schema))
+
+    def _answer(self, messages):
+        # A repair turn follows the original user message
+        payload = build_payload(next(text for role, text in messages if role == "user"))
+        args = {key: value for key, value in payload.items() if key in self.fields}
+        with self.model._lock:
+            if self.model._random.random() < self.model.invalid_rate:
+                args = {}
+        content = json.dumps(args)
+        return SimpleNamespace(
+            content="",
+            tool_calls=[{"name": self.schema.__name__, "args": args, "id": "call_fake"}],
+            usage_metadata=estimate_usage(messages, content, self.tool)
+        )
+
+    def invoke(self, messages, *args, timeout=None, **kwargs):
+        return self.model._call(messages, timeout, self._answer, self.tool)
+
+    async def ainvoke(self, messages, *args, timeout=None, **kwargs):
+        return await self.model._acall(messages, timeout, self._answer, self.tool)
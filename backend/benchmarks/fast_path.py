@@ -0,0 +1,175 @@
+"""
+Measure the rule-based fast path in front of the task extractors.
+
+1. Parses a corpus of typical chat messages and reports the share handled
+   without the model (the hit rate), the parse time, whether the parsed
+   fields match the expected ones for the messages that have them, and
+   whether the others (questions, edits, status updates, small talk that
+   mentions a time) fall through to the model.
+2. Sends the corpus through POST /chat with a fake model of --latency
+   seconds per call, with and without the fast path, and reports the
+   latency difference and the model calls avoided.
+
+Requires httpx.
+
+    python -m benchmarks.fast_path [--latency 0.5] [--rounds 3]
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import configure_environment, reset_database, seed_tasks
+
+configure_environment()
+
+import httpx  # noqa: E402
+
+from benchmarks.fake_llm import FakeChatModel  # noqa: E402
+from benchmarks.load import percentile  # noqa: E402
+from main import app  # noqa: E402
+from services import task_ai  # noqa: E402
+from services.task_parser import FAST_PATH_MIN_CONFIDENCE, parse_task_message  # noqa: E402
+
+# Fixed clock for the expected values: a Sunday morning
+NOW = datetime(2026, 10, 18, 10, 0)
+
+def day(offset):
+    return (NOW + timedelta(days=offset)).strftime("%Y-%m-%d")
+
+# (message, expected fields or None when the model should handle it)
+CORPUS = [
+    ("dentist tomorrow 3pm-4pm high priority",
+     {"title": "Dentist", "date": day(1), "start_time": "15:00", "end_time": "16:00", "priority": "High"}),
+    ("gym tomorrow at 7am for 90 minutes",
+     {"title": "Gym", "date": day(1), "start_time": "07:00", "end_time": "08:30", "priority": "Normal"}),
+    ("Meeting with Bob on Friday from 9 to 11am",
+     {"title": "Meeting with Bob", "date": day(5), "start_time": "09:00", "end_time": "11:00"}),
+    ("submit report by friday 5pm",
+     {"title": "Submit report", "date": day(5), "start_time": "17:00", "is_due_date": True}),
+    ("Call mom today at 18:30", {"title": "Call mom", "date": day(0), "start_time": "18:30"}),
+    ("team sync 2026-10-21 14:00-15:00",
+     {"title": "Team sync", "date": "2026-10-21", "start_time": "14:00", "end_time": "15:00"}),
+    ("remind me to water plants tonight at 9pm", {"title": "Water plants", "date": day(0), "start_time": "21:00"}),
+    ("doctor in 3 days at 10:15am for half an hour",
+     {"title": "Doctor", "date": day(3), "start_time": "10:15", "end_time": "10:45"}),
+    ("study session tomorrow 11-1pm low priority",
+     {"title": "Study session", "date": day(1), "start_time": "11:00", "end_time": "13:00", "priority": "Low"}),
+    ("pick up kids today 3:15pm", {"title": "Pick up kids", "date": day(0), "start_time": "15:15"}),
+    ("book flights this sunday 2pm", {"title": "Book flights", "date": day(0), "start_time": "14:00"}),
+    ("lunch with Sam on wednesday noon urgent",
+     {"title": "Lunch with Sam", "date": day(3), "start_time": "12:00", "priority": "High"}),
+    ("add gym tomorrow at 7", None),
+    ("dentist tomorrow 3-4", None),
+    ("buy milk", None),
+    ("how busy am I this week?", None),
+    ("move gym to friday", None),
+    ("delete the dentist appointment", None),
+    ("call john at 5 and email sarah at 6", None),
+    ("what should I focus on today?", None),
+    # Look-ups, status changes and small talk that mention a date or time
+    ("show my tasks for tomorrow", None),
+    ("Set gym tomorrow 7pm to high priority", None),
+    ("what's on tomorrow at 3pm", None),
+    ("list my schedule tomorrow", None),
+    ("mark dentist tomorrow at 3pm as done", None),
+    ("make dentist tomorrow 3pm high priority", None),
+    ("swap gym tomorrow at 7pm with yoga", None),
+    ("I am free tomorrow at 3pm", None),
+    ("thanks see you tomorrow at 5pm", None),
+    # Dropping or skipping a task without the usual delete wording
+    ("drop the dentist tomorrow 3pm", None),
+    ("skip gym tomorrow at 6pm", None),
+    ("scrap the team sync on friday at 10am", None),
+    ("dentist tomorrow 3pm is cancelled", None),
+    ("nix lunch with Sam on wednesday noon", None),
+    ("hi! tomorrow 3pm works for me", None),
+    ("tomorrow at 3pm is fine with me", None),
+    ("my day tomorrow at 3pm", None),
+    ("set up meeting with Ann tomorrow 2pm",
+     {"title": "Meeting with Ann", "date": day(1), "start_time": "14:00"}),
+    ("remind me to call my mom today at 6pm", {"title": "Call my mom", "date": day(0), "start_time": "18:00"})
+]
+
+def parse_corpus():
+    hits, matches, checked, timings = 0, 0, 0, []
+    fell_through, not_tasks = 0, 0
+    mismatches = []
+    for message, expected in CORPUS:
+        started = time.perf_counter()
+        parsed = parse_task_message(message, now=NOW)
+        timings.append(time.perf_counter() - started)
+        hit = parsed["confidence"] >= FAST_PATH_MIN_CONFIDENCE
+        hits += hit
+        if expected is None:
+            not_tasks += 1
+            fell_through += not hit
+            if hit:
+                mismatches.append({"message": message, "expected": "model", "parsed": parsed})
+            continue
+        checked += 1
+        wrong = {key: parsed.get(key) for key, value in expected.items() if parsed.get(key) != value}
+        if hit and not wrong:
+            matches += 1
+        else:
+            mismatches.append({"message": message, "confidence": parsed["confidence"], "wrong": wrong})
+    timings.sort()
+    return {
+        "messages": len(CORPUS),
+        "fast_path_hits": hits,
+        "hit_rate": round(hits / len(CORPUS), 3),
+        "expected_fast_path_matched": f"{matches}/{checked}",
+        "expected_model_fell_through": f"{fell_through}/{not_tasks}",
+        "mismatches": mismatches,
+        "parse_us": {
+            "p50": round(percentile(timings, 50) * 1e6, 1),
+            "p99": round(percentile(timings, 99) * 1e6, 1)
+        }
+    }
+
+async def chat_latency(rounds):
+    latencies = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        for _ in range(rounds):
+            task_ai.extraction_cache.clear()
+            for message, _ in CORPUS:
+                started = time.perf_counter()
+                response = await client.post("/chat", json={"message": message, "user_id": 1})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "total_seconds": round(sum(latencies), 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model latency in seconds")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    report = {"parser": parse_corpus()}
+
+    reset_database()
+    seed_tasks(1, 20)
+    task_ai.llm = model = FakeChatModel(latency=args.latency)
+
+    chat = {}
+    task_ai.FAST_PATH_MIN_CONFIDENCE = 2.0
+    chat["model_only"] = asyncio.run(chat_latency(args.rounds))
+    chat["model_only"]["model_calls"] = model.calls
+    model.reset()
+    task_ai.FAST_PATH_MIN_CONFIDENCE = FAST_PATH_MIN_CONFIDENCE
+    chat["fast_path"] = asyncio.run(chat_latency(args.rounds))
+    chat["fast_path"]["model_calls"] = model.calls
+    chat["seconds_saved"] = round(chat["model_only"]["total_seconds"] - chat["fast_path"]["total_seconds"], 3)
+    chat["seconds_saved_metric"] = round(task_ai.FAST_PATH_SECONDS_SAVED.value(stage="classify_message"), 3)
+    report["chat"] = chat
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
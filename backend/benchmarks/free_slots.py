@@ -0,0 +1,93 @@
+"""
+Compare the interval-index free-slot engine with the old get_schedule_gaps loop.
+
+Builds a year of tasks with random starts and durations (some overlapping),
+then times free-slot queries for windows near the start and far into the
+schedule, single-task updates against a full rebuild, and the old linear walk
+(which assumed two hours per task and ignored working hours).
+
+    python -m benchmarks.free_slots [--tasks 5000] [--repeat 200]
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import configure_environment
+
+configure_environment()
+
+from services.scheduling import BusyIndex  # noqa: E402
+from services.task_state import TaskRow  # noqa: E402
+
+def make_tasks(count, start, rng):
+    minutes_in_year = 365 * 24 * 60
+    return [
+        TaskRow(i, f"Task {i}", None, "Normal",
+                start + timedelta(minutes=15 * rng.randrange(minutes_in_year // 15)),
+                rng.choice((15, 30, 45, 60, 90, 120, 240)), rng.random() < 0.05, 1)
+        for i in range(count)
+    ]
+
+def legacy_schedule_gaps(tasks, now):
+    """The previous implementation, over tasks sorted by deadline"""
+    available_slots = []
+    last_task_end = now
+    for task in tasks:
+        task_start = task.deadline - timedelta(hours=2)
+        if task_start > last_task_end:
+            available_slots.append({"start": last_task_end, "end": task_start})
+        last_task_end = task.deadline
+    return available_slots
+
+def per_call_ms(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    start = datetime(2026, 1, 5, 8, 0)
+    tasks = sorted(make_tasks(args.tasks, start, rng), key=TaskRow.sort_key)
+
+    build_ms, index = per_call_ms(lambda: BusyIndex(tasks), 3)
+    near = start + timedelta(days=1)
+    far = start + timedelta(days=300)
+
+    report = {"tasks": args.tasks, "busy_blocks": len(index.blocks()), "build_ms": round(build_ms, 2)}
+    for name, window_start in (("near", near), ("far", far)):
+        window_end = window_start + timedelta(days=7)
+        first_ms, first = per_call_ms(
+            lambda: index.free_slots(window_start, window_end, min_minutes=60, limit=1), args.repeat)
+        week_ms, week = per_call_ms(
+            lambda: index.free_slots(window_start, window_end, min_minutes=30), args.repeat)
+        report[f"{name}_first_slot_ms"] = round(first_ms, 4)
+        report[f"{name}_week_slots_ms"] = round(week_ms, 4)
+        report[f"{name}_week_slots"] = len(week)
+
+    legacy_ms, legacy = per_call_ms(lambda: legacy_schedule_gaps(tasks, near), max(1, args.repeat // 20))
+    report["legacy_all_gaps_ms"] = round(legacy_ms, 2)
+    report["legacy_gaps"] = len(legacy)
+
+    # Move random tasks around: patching the index vs rebuilding it
+    updates = []
+    for _ in range(args.repeat):
+        before = tasks[rng.randrange(len(tasks))]
+        updates.append((before, before._replace(deadline=before.deadline + timedelta(hours=rng.randrange(1, 48)))))
+    started = time.perf_counter()
+    for before, after in updates:
+        index.apply(before, after)
+    report["incremental_update_ms"] = round((time.perf_counter() - started) / len(updates) * 1000, 4)
+    report["rebuild_ms"] = report["build_ms"]
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
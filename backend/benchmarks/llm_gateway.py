@@ -0,0 +1,110 @@
+"""
+Show how the LLM gateway protects interactive chat from a background burst.
+
+A fake provider that slows down once more than --capacity calls are in
+flight receives a burst of --background GET /suggest-task requests, and
+--interactive POST /chat requests arrive while it is busy. The run is done
+twice:
+    unbounded   gateway limits set high enough never to apply
+    gateway     the configured limits (--max-in-flight, --background-max,
+                --background-queue)
+Reports chat latency, how /suggest-task requests were answered (200, or 503
+with Retry-After when shed) and the provider's peak concurrency.
+
+Requires httpx.
+
+    python -m benchmarks.llm_gateway [--latency 0.2] [--capacity 8]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import configure_environment, reset_database, seed_tasks
+
+configure_environment()
+
+import httpx  # noqa: E402
+
+from benchmarks.fake_llm import FakeChatModel  # noqa: E402
+from benchmarks.load import percentile  # noqa: E402
+from main import app  # noqa: E402
+from services import task_ai  # noqa: E402
+from services.llm_gateway import BACKGROUND, INTERACTIVE, gateway  # noqa: E402
+
+def configure_gateway(max_in_flight, background_max, background_queue):
+    gateway.max_in_flight = max_in_flight
+    gateway.max_in_flight_per_user = max_in_flight
+    gateway.background_max_in_flight = background_max
+    gateway.max_queue = {INTERACTIVE: 10000, BACKGROUND: background_queue}
+
+async def run(args):
+    model = FakeChatModel(latency=args.latency, capacity=args.capacity)
+    task_ai.llm = model
+    # Every chat should reach the model
+    task_ai.extraction_cache.clear()
+
+    chat_latencies = []
+    suggest_statuses = {}
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def suggest(i):
+            response = await client.get(f"/suggest-task?user_id={1 + i % 4}")
+            status = str(response.status_code)
+            if response.status_code == 503 and "retry-after" in response.headers:
+                status += " retry-after"
+            suggest_statuses[status] = suggest_statuses.get(status, 0) + 1
+
+        async def chat(i):
+            started = time.perf_counter()
+            response = await client.post("/chat", json={"message": f"how busy am I on day {i}?", "user_id": 1 + i % 4})
+            response.raise_for_status()
+            chat_latencies.append(time.perf_counter() - started)
+
+        async def chats():
+            # Let the burst land first
+            await asyncio.sleep(args.latency / 4)
+            await asyncio.gather(*(chat(i) for i in range(args.interactive)))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(suggest(i) for i in range(args.background)), chats())
+        elapsed = time.perf_counter() - started
+
+    chat_latencies.sort()
+    return {
+        "seconds": round(elapsed, 3),
+        "chat_latency_ms": {
+            "p50": round(percentile(chat_latencies, 50) * 1000, 1),
+            "p95": round(percentile(chat_latencies, 95) * 1000, 1),
+            "max": round(chat_latencies[-1] * 1000, 1)
+        },
+        "suggest_task_statuses": suggest_statuses,
+        "provider_peak_in_flight": model.peak_in_flight,
+        "provider_calls": model.calls
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model latency in seconds at or below capacity")
+    parser.add_argument("--capacity", type=int, default=8, help="calls the fake provider serves at full speed")
+    parser.add_argument("--background", type=int, default=100, help="/suggest-task requests in the burst")
+    parser.add_argument("--interactive", type=int, default=16, help="/chat requests during the burst")
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--background-max", type=int, default=2)
+    parser.add_argument("--background-queue", type=int, default=8)
+    args = parser.parse_args()
+
+    reset_database()
+    for user_id in range(1, 5):
+        seed_tasks(user_id, 20)
+
+    report = {"config": vars(args)}
+    configure_gateway(10000, 10000, 10000)
+    report["unbounded"] = asyncio.run(run(args))
+    configure_gateway(args.max_in_flight, args.background_max, args.background_queue)
+    report["gateway"] = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Load and latency suite for the main API endpoints.
+
+Seeds N users with M tasks each, replaces the model in services.task_ai with
+the deterministic fake from benchmarks.fake_llm, then drives each scenario
+at a fixed concurrency through the in-process app:
+
+    tasks_list      GET /tasks
+    chat            POST /chat
+    suggest_task    GET /suggest-task
+    login           POST /users/login
+    register        POST /users/register
+
+For every scenario it reports throughput, p50/p95/p99 latency, status codes
+and the SQL statements run, as JSON on stdout (or --output), so runs from
+different releases can be diffed. Any non-2xx response counts as an error.
+
+Runs on a throwaway SQLite database unless --database-url points elsewhere,
+e.g. a scratch Postgres database (its tables are dropped and recreated).
+
+Requires httpx.
+
+    python -m benchmarks.load [--users 20] [--tasks 200] [--concurrency 16]
+                              [--requests 200] [--latency 0.05]
+                              [--scenarios chat,login] [--output report.json]
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.common import configure_environment, reset_database, seed_users
+
+PASSWORD = "benchpass1"
+
+CHAT_MESSAGES = [
+    "how busy am I this week?",
+    "add gym tomorrow at 7",
+    "move gym to high priority",
+    "what should I focus on today?",
+    "delete the gym session"
+]
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def scenarios(args, run_id):
+    """Map each scenario name to a function building request i"""
+    def user(i):
+        return 1 + i % args.users
+
+    return {
+        "tasks_list": lambda i: ("GET", f"/tasks?user_id={user(i)}&limit=50", None),
+        "chat": lambda i: ("POST", "/chat", {"message": CHAT_MESSAGES[i % len(CHAT_MESSAGES)], "user_id": user(i)}),
+        "suggest_task": lambda i: ("GET", f"/suggest-task?user_id={user(i)}", None),
+        "login": lambda i: ("POST", "/users/login", {"username": f"bench{user(i)}", "password": PASSWORD}),
+        "register": lambda i: ("POST", "/users/register", {
+            "username": f"load{run_id}n{i}",
+            "email": f"load{run_id}n{i}@example.com",
+            "password": PASSWORD
+        })
+    }
+
+async def run_scenario(client, build_request, total, concurrency, db_queries):
+    """Send `total` requests with exactly `concurrency` workers in flight"""
+    latencies = []
+    status_codes = {}
+    next_index = iter(range(total))
+
+    async def worker():
+        for i in next_index:
+            method, url, body = build_request(i)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            status_codes[status] = status_codes.get(status, 0) + 1
+
+    queries_before = db_queries.value()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    queries = db_queries.value() - queries_before
+
+    latencies.sort()
+    errors = sum(count for status, count in status_codes.items() if not status.startswith("2"))
+    return {
+        "requests": total,
+        "errors": errors,
+        "status_codes": status_codes,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2)
+        },
+        "db_queries": queries,
+        "db_queries_per_request": round(queries / total, 2)
+    }
+
+async def run_all(app, db_queries, args, selected):
+    import httpx
+
+    run_id = int(time.time())
+    builders = scenarios(args, run_id)
+    results = {}
+    # Unhandled app errors come back as 500s rather than raising here
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name in selected:
+            if args.warmup:
+                await run_scenario(client, builders[name], args.warmup, min(args.concurrency, args.warmup), db_queries)
+            results[name] = await run_scenario(client, builders[name], args.requests, args.concurrency, db_queries)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=200, help="tasks per user")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per scenario")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake model latency in seconds")
+    parser.add_argument("--scenarios", default="tasks_list,chat,suggest_task,login,register")
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(selected) - set(scenarios(args, 0))
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    database_url = configure_environment(args.database_url)
+
+    # The app reads its settings at import time
+    from auth import get_password_hash
+    from benchmarks.fake_llm import FakeChatModel
+    from database import DB_QUERIES
+    from main import app
+    from services import task_ai
+
+    reset_database()
+    setup_errors = []
+    try:
+        hashed_password = get_password_hash(PASSWORD)
+    except Exception as e:
+        # Seed anyway; logins will then fail and show up as errors
+        hashed_password = "x"
+        setup_errors.append(f"password hashing failed: {e}")
+    seed_started = time.perf_counter()
+    seed_users(args.users, args.tasks, hashed_password=hashed_password)
+    seed_seconds = time.perf_counter() - seed_started
+
+    task_ai.llm = FakeChatModel(latency=args.latency)
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "database": database_url.split(":", 1)[0]
+        },
+        "config": {
+            "users": args.users,
+            "tasks_per_user": args.tasks,
+            "concurrency": args.concurrency,
+            "requests_per_scenario": args.requests,
+            "warmup_per_scenario": args.warmup,
+            "llm_latency_seconds": args.latency
+        },
+        "seed_seconds": round(seed_seconds, 3),
+        "setup_errors": setup_errors,
+        "scenarios": asyncio.run(run_all(app, DB_QUERIES, args, selected))
+    }
+    report["llm_calls"] = task_ai.llm.calls
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Measure what request logging costs per request.
+
+Runs the same mix of task requests (create, list, update) three ways:
+    echo          engine echo=True, every statement written synchronously
+                  to stdout (the previous default)
+    structured    the queue-backed logger with default settings
+    sql_debug     every request sends the SQL debug header, so all of its
+                  statements are logged too, through the queue
+
+Redirect stdout somewhere realistic (a file or a pipe) when running it,
+since the echo mode's cost is the writing itself.
+
+Requires httpx.
+
+    python -m benchmarks.logging_overhead [--requests 600] > /tmp/bench.log
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import configure_environment, reset_database, seed_tasks
+
+configure_environment()
+
+import httpx  # noqa: E402
+
+from database import async_engine, engine  # noqa: E402
+from main import app  # noqa: E402
+
+async def run(requests, headers, start):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=headers) as client:
+        started = time.perf_counter()
+        for i in range(requests // 3):
+            task = {"title": f"Logged task {i}", "deadline": (start + timedelta(hours=i)).isoformat(), "user_id": 1}
+            created = (await client.post("/tasks?user_id=1", json=task)).json()
+            (await client.get("/tasks?user_id=1&limit=50")).raise_for_status()
+            (await client.put(f"/tasks/{created['id']}?user_id=1", json={"priority": "High"})).raise_for_status()
+        elapsed = time.perf_counter() - started
+    return {
+        "requests": requests // 3 * 3,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests // 3 * 3 / elapsed, 1),
+        "mean_ms": round(elapsed / (requests // 3 * 3) * 1000, 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=600)
+    args = parser.parse_args()
+
+    reset_database()
+    seed_tasks(1, 200)
+    # Scheduled tasks may not overlap, so each run creates its hourly tasks
+    # after the seeded ones and the previous run's
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=201)
+    run_hours = timedelta(hours=args.requests // 3)
+
+    report = {}
+    engine.echo = async_engine.echo = True
+    report["echo"] = asyncio.run(run(args.requests, {}, start))
+    engine.echo = async_engine.echo = False
+    report["structured"] = asyncio.run(run(args.requests, {}, start + run_hours))
+    report["sql_debug"] = asyncio.run(run(args.requests, {"X-Debug-SQL": "1"}, start + 2 * run_hours))
+
+    sys.stdout.flush()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Measure POST /users/login throughput and its effect on other requests.
+
+--requests logins are sent --concurrency at a time while GET / is probed
+every few milliseconds, with password verification run
+    threadpool      in the server's threadpool, like the former sync handler
+    process_pool    in auth's worker process pool (PASSWORD_HASH_WORKERS)
+Reports logins per second, login latency and the probe latency, which shows
+how much hashing holds up the rest of the app.
+
+--scheme selects the passlib scheme; sha256_crypt is there for environments
+whose bcrypt backend does not work with passlib. Requires httpx.
+
+    python -m benchmarks.login_throughput [--requests 200] [--concurrency 16] [--rounds 12]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import configure_environment, reset_database, seed_users
+
+configure_environment()
+
+import httpx  # noqa: E402
+from passlib.context import CryptContext  # noqa: E402
+from starlette.concurrency import run_in_threadpool  # noqa: E402
+
+import auth  # noqa: E402
+from benchmarks.load import percentile  # noqa: E402
+from database import async_engine  # noqa: E402
+from main import app  # noqa: E402
+from routes import users as users_routes  # noqa: E402
+
+PASSWORD = "benchmark-password"
+
+async def threadpool_verify(plain_password, hashed_password):
+    return await run_in_threadpool(auth.verify_and_rehash, plain_password, hashed_password)
+
+async def run(args):
+    login_latencies, probe_latencies = [], []
+    done = asyncio.Event()
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        semaphore = asyncio.Semaphore(args.concurrency)
+        statuses = {}
+
+        async def login(i):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/users/login", json={"username": f"bench{1 + i % args.users}", "password": PASSWORD}
+                )
+                login_latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/")
+                probe_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.005)
+
+        async def logins():
+            await asyncio.gather(*(login(i) for i in range(args.requests)))
+            done.set()
+
+        started = time.perf_counter()
+        await asyncio.gather(logins(), probe())
+        elapsed = time.perf_counter() - started
+    # Pooled async connections belong to this event loop
+    await async_engine.dispose()
+
+    login_latencies.sort()
+    probe_latencies.sort()
+    return {
+        "logins_per_second": round(args.requests / elapsed, 1),
+        "statuses": statuses,
+        "login_ms": {
+            "p50": round(percentile(login_latencies, 50) * 1000, 1),
+            "p95": round(percentile(login_latencies, 95) * 1000, 1)
+        },
+        "probe_ms": {
+            "p50": round(percentile(probe_latencies, 50) * 1000, 1),
+            "p99": round(percentile(probe_latencies, 99) * 1000, 1),
+            "max": round(probe_latencies[-1] * 1000, 1)
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--scheme", default="bcrypt", choices=("bcrypt", "sha256_crypt"))
+    parser.add_argument("--rounds", type=int, default=None, help="hash cost (bcrypt log rounds, or sha256_crypt rounds)")
+    args = parser.parse_args()
+
+    settings = {f"{args.scheme}__rounds": args.rounds} if args.rounds else {}
+    # Set before the worker pool starts, so the workers inherit it
+    auth.pwd_context = CryptContext(schemes=[args.scheme], deprecated="auto", **settings)
+    report = {"config": vars(args), "workers": auth.PASSWORD_HASH_WORKERS}
+    try:
+        hashed_password = auth.get_password_hash(PASSWORD)
+    except Exception as e:
+        report["error"] = f"password hashing failed: {e}"
+        print(json.dumps(report, indent=2))
+        return
+
+    reset_database()
+    seed_users(args.users, 0, hashed_password=hashed_password)
+
+    process_verify = users_routes.averify_and_rehash
+    users_routes.averify_and_rehash = threadpool_verify
+    report["threadpool"] = asyncio.run(run(args))
+    users_routes.averify_and_rehash = process_verify
+    report["process_pool"] = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Measure how much of each prompt the provider's prefix cache can serve.
+
+--users users with --tasks tasks each send --rounds messages apiece, one
+user after another with the clock advancing one minute per message, through
+the intent router and the edit and delete extractors. The fake model
+simulates OpenAI's prompt cache (1024-token minimum, 128-token steps) and
+answers cached prompt tokens faster (--cache-speedup).
+
+Two prompt layouts are compared:
+    dynamic_first   the current time, date and task list ahead of the
+                    instructions, as the f-string prompts used to be built
+    stable_prefix   services.prompts.build_messages: instructions first,
+                    then date, task list and current time
+
+Reports, per stage, the prompt tokens, the cached share and the mean model
+latency. With the default task lists only the router's prompt reaches the
+1024-token minimum; the edit and delete stages report a cached share of 0
+under both layouts.
+
+    python -m benchmarks.prompt_cache [--users 8] [--tasks 25] [--rounds 5]
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import configure_environment, reset_database, seed_tasks
+
+configure_environment()
+
+from benchmarks.fake_llm import FakeChatModel  # noqa: E402
+from services import prompts, task_ai  # noqa: E402
+
+STAGES = {
+    "classify_message": lambda message, user_id: task_ai.classify_message(message, user_id),
+    "extract_task_edit_request": lambda message, user_id: task_ai.extract_task_edit_request(message, user_id),
+    "extract_task_deletion_request": lambda message, user_id: task_ai.extract_task_deletion_request(message, user_id)
+}
+
+# Simulated wall clock, advanced one minute per message
+clock = {"now": datetime(2026, 10, 19, 9, 0)}
+
+def stable_prefix(instructions, message, task_summary=None, now=None):
+    return prompts.build_messages(instructions, message, task_summary, clock["now"])
+
+def dynamic_first(instructions, message, task_summary=None, now=None):
+    now = clock["now"]
+    parts = [f"CURRENT TIME: {now:%H:%M}", prompts.date_context(now.date())]
+    if task_summary is not None:
+        parts.append(f"CURRENT TASKS:\n{task_summary}")
+    return [("system", "\n\n".join(parts + [instructions])), ("user", message)]
+
+def token_counts():
+    return {
+        (stage, kind): task_ai.LLM_TOKENS.value(stage=stage, kind=kind)
+        for stage in STAGES for kind in ("prompt", "cached_prompt")
+    }
+
+def run(layout, args):
+    task_ai.build_messages = layout
+    task_ai.llm = FakeChatModel(latency=args.latency, prompt_cache=True, cache_speedup=args.cache_speedup)
+    clock["now"] = datetime(2026, 10, 19, 9, 0)
+    before = token_counts()
+    seconds = {stage: 0.0 for stage in STAGES}
+    messages = 0
+    for round_ in range(args.rounds):
+        for user_id in range(1, args.users + 1):
+            clock["now"] += timedelta(minutes=1)
+            message = f"move task {user_id}-{round_} to high priority"
+            for stage, call in STAGES.items():
+                started = time.perf_counter()
+                call(message, user_id)
+                seconds[stage] += time.perf_counter() - started
+            messages += 1
+
+    after = token_counts()
+    report = {}
+    for stage in STAGES:
+        prompt = after[(stage, "prompt")] - before[(stage, "prompt")]
+        cached = after[(stage, "cached_prompt")] - before[(stage, "cached_prompt")]
+        report[stage] = {
+            "prompt_tokens_per_call": round(prompt / messages),
+            "cached_share": round(cached / prompt, 3) if prompt else 0.0,
+            "mean_latency_ms": round(seconds[stage] / messages * 1000, 1)
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--tasks", type=int, default=25, help="tasks per user; 25 fill the default task context")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model latency in seconds without caching")
+    parser.add_argument("--cache-speedup", type=float, default=0.5,
+                        help="latency saved on a fully cached prompt, as a fraction")
+    args = parser.parse_args()
+
+    reset_database()
+    for user_id in range(1, args.users + 1):
+        seed_tasks(user_id, args.tasks)
+    # Every message goes to the model
+    task_ai.extraction_cache.maxsize = 0
+    task_ai.FAST_PATH_MIN_CONFIDENCE = 2.0
+
+    report = {"config": vars(args)}
+    report["dynamic_first"] = run(dynamic_first, args)
+    report["stable_prefix"] = run(stable_prefix, args)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
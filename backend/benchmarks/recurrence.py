@@ -0,0 +1,158 @@
+"""
+Compare recurring tasks stored as rules with materialized copies.
+
+Every user gets --tasks one-off tasks and four routines (a daily workout, a
+weekday standup, a weekly review and a monthly report). Users 1..--users
+store the routines as one Task row per occurrence for the next --days days,
+as clients had to before; the next --users users store them as
+TaskRecurrence rules. Reports
+    storage   rows, and bytes of row and index data including the title
+              search index (SQLite dbstat), added for the routines
+    queries   mean time per user, cold (caches cleared) and warm, of the
+              first page of GET /tasks for the coming week, a week of free
+              slots and the chat task summary
+
+    python -m benchmarks.recurrence [--users 50] [--days 365] [--tasks 20]
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import configure_environment, reset_database
+
+configure_environment()
+
+from sqlalchemy import insert, text  # noqa: E402
+
+from crud import get_tasks_page  # noqa: E402
+from database import SessionLocal, engine  # noqa: E402
+from models import Task, TaskRecurrence, User  # noqa: E402
+from services.recurrence import iter_occurrences, last_occurrence, parse_rrule, recurrence_cache  # noqa: E402
+from services.scheduling import busy_index_cache, find_free_slots  # noqa: E402
+from services.task_ai import get_task_summary  # noqa: E402
+from services.task_state import snapshot_cache  # noqa: E402
+
+# (title, first occurrence offset from midnight, duration, RRULE)
+ROUTINES = [
+    ("Workout", timedelta(hours=7), 45, "FREQ=DAILY"),
+    ("Standup", timedelta(hours=9, minutes=30), 15, "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR"),
+    ("Weekly review", timedelta(days=4, hours=16), 60, "FREQ=WEEKLY"),
+    ("Monthly report", timedelta(hours=14), 120, "FREQ=MONTHLY"),
+]
+
+def database_bytes():
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT SUM(payload) FROM dbstat")).scalar()
+
+def routine_rows(user_id, start, days):
+    """The routines as Task rows, one per occurrence within `days` days"""
+    rows = []
+    for title, offset, duration, rrule in ROUTINES:
+        for moment in iter_occurrences(parse_rrule(rrule), start + offset, end=start + timedelta(days=days)):
+            rows.append({
+                "title": title, "description": "routine", "priority": "Normal",
+                "deadline": moment, "duration": duration, "is_due_date": False, "user_id": user_id
+            })
+    return rows
+
+def recurrence_rows(user_id, start):
+    return [
+        {
+            "title": title, "description": "routine", "priority": "Normal", "duration": duration,
+            "is_due_date": False, "user_id": user_id, "dtstart": start + offset, "rrule": rrule,
+            "until": last_occurrence(parse_rrule(rrule), start + offset)
+        }
+        for title, offset, duration, rrule in ROUTINES
+    ]
+
+def add_users(first, last, tasks, start):
+    """
+    Users first..last with `tasks` one-off tasks, one each evening from
+    `start`, clear of the routines since scheduled tasks may not overlap
+    """
+    db = SessionLocal()
+    try:
+        db.execute(insert(User), [
+            {"id": user_id, "username": f"bench{user_id}", "hashed_password": "x", "created_at": datetime.now()}
+            for user_id in range(first, last + 1)
+        ])
+        db.execute(insert(Task), [
+            {
+                "title": f"Task {user_id}-{i}", "description": "seeded by benchmark", "priority": "Normal",
+                "deadline": start + timedelta(days=i, hours=18), "duration": 60, "is_due_date": False, "user_id": user_id
+            }
+            for user_id in range(first, last + 1) for i in range(tasks)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+def store(table, rows):
+    before = database_bytes()
+    db = SessionLocal()
+    try:
+        db.execute(insert(table), rows)
+        db.commit()
+    finally:
+        db.close()
+    return {"rows": len(rows), "bytes": database_bytes() - before}
+
+def clear_caches():
+    snapshot_cache.clear()
+    busy_index_cache.clear()
+    recurrence_cache.clear()
+
+QUERIES = {
+    "tasks_page": lambda db, user_id, start: get_tasks_page(
+        db, user_id, limit=200, deadline_from=start, deadline_to=start + timedelta(days=7)
+    ),
+    "free_slots": lambda db, user_id, start: find_free_slots(user_id, start=start, end=start + timedelta(days=7), db=db),
+    "task_summary": lambda db, user_id, start: get_task_summary(user_id, db=db),
+}
+
+def time_queries(user_ids, start):
+    report = {}
+    for name, query in QUERIES.items():
+        timings = {"cold": 0.0, "warm": 0.0}
+        for user_id in user_ids:
+            db = SessionLocal()
+            try:
+                for mode in ("cold", "warm"):
+                    if mode == "cold":
+                        clear_caches()
+                    started = time.perf_counter()
+                    query(db, user_id, start)
+                    timings[mode] += time.perf_counter() - started
+            finally:
+                db.close()
+        report[name] = {mode: round(seconds / len(user_ids) * 1000, 3) for mode, seconds in timings.items()}
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--days", type=int, default=365, help="days of routines materialized as Task rows")
+    parser.add_argument("--tasks", type=int, default=20, help="one-off tasks per user")
+    args = parser.parse_args()
+
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    materialized = range(1, args.users + 1)
+    rules = range(args.users + 1, 2 * args.users + 1)
+
+    reset_database()
+    add_users(1, 2 * args.users, args.tasks, start)
+
+    report = {"config": vars(args)}
+    report["storage"] = {
+        "materialized": store(Task, [row for user_id in materialized for row in routine_rows(user_id, start, args.days)]),
+        "rules": store(TaskRecurrence, [row for user_id in rules for row in recurrence_rows(user_id, start)])
+    }
+    report["queries_ms"] = {
+        "materialized": time_queries(materialized, start),
+        "rules": time_queries(rules, start)
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
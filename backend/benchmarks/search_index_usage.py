@@ -0,0 +1,113 @@
+"""
+Check that search_tasks_by_criteria date/time predicates use an index.
+
+Seeds a large tasks table (1M rows by default), then runs EXPLAIN on the
+queries built by build_task_search_query for each kind of date and time
+reference. Exits non-zero if any plan falls back to a full table scan.
+
+    python -m benchmarks.search_index_usage [--tasks 1000000] [--users 1000]
+    DATABASE_URL=postgresql://... python -m benchmarks.search_index_usage --database-url-from-env
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import configure_environment, reset_database
+
+if "--database-url-from-env" in sys.argv:
+    configure_environment(os.environ["DATABASE_URL"])
+else:
+    configure_environment()
+
+from sqlalchemy import insert, text  # noqa: E402
+
+from database import SessionLocal, engine  # noqa: E402
+from models import Task, User  # noqa: E402
+from services.task_ai import build_task_search_query  # noqa: E402
+
+CASES = {
+    "tomorrow": {"date_reference": "tomorrow"},
+    "next_week": {"date_reference": "next week"},
+    "exact_date": {"date_reference": (datetime.now() + timedelta(days=3)).strftime("%Y-%m-%d")},
+    "morning": {"time_reference": "morning"},
+    "exact_time": {"time_reference": "3pm"},
+    "tomorrow_afternoon": {"date_reference": "tomorrow", "time_reference": "afternoon"}
+}
+
+def seed(task_count, user_count, batch_size=50000):
+    """Bulk insert users and tasks spread over a year of hourly slots"""
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=180)
+    db = SessionLocal()
+    try:
+        db.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com",
+             "hashed_password": "x", "created_at": datetime.now()}
+            for i in range(1, user_count + 1)
+        ])
+        for offset in range(0, task_count, batch_size):
+            db.execute(insert(Task), [
+                {"title": f"Task {i}", "priority": "Normal", "duration": 60, "is_due_date": False,
+                 "user_id": 1 + i % user_count,
+                 # Spread over the year, with distinct hours per user since scheduled tasks may not overlap
+                 "deadline": start + timedelta(hours=(i // user_count * 7919 + i % user_count) % (24 * 365))}
+                for i in range(offset, min(offset + batch_size, task_count))
+            ])
+        db.commit()
+    finally:
+        db.close()
+
+def explain(db, query):
+    """Return the plan lines for a query on SQLite or Postgres"""
+    statement = query.statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    rows = db.execute(text(prefix + str(statement))).fetchall()
+    return [str(row[-1]) if engine.dialect.name == "sqlite" else str(row[0]) for row in rows]
+
+def uses_index(plan):
+    if engine.dialect.name == "sqlite":
+        return any("USING" in line and "INDEX" in line for line in plan) and not any(line.startswith("SCAN tasks") for line in plan)
+    return not any("Seq Scan on tasks" in line for line in plan)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--database-url-from-env", action="store_true")
+    args = parser.parse_args()
+
+    reset_database()
+    started = time.perf_counter()
+    seed(args.tasks, args.users)
+    seed_seconds = time.perf_counter() - started
+
+    db = SessionLocal()
+    try:
+        db.execute(text("ANALYZE"))
+        report = {"tasks": args.tasks, "seed_seconds": round(seed_seconds, 1), "cases": {}}
+        failures = []
+        for name, identifiers in CASES.items():
+            query = build_task_search_query(db, identifiers, user_id=42)
+            plan = explain(db, query)
+            started = time.perf_counter()
+            matches = len(query.all())
+            report["cases"][name] = {
+                "uses_index": uses_index(plan),
+                "matches": matches,
+                "query_ms": round((time.perf_counter() - started) * 1000, 2),
+                "plan": plan
+            }
+            if not uses_index(plan):
+                failures.append(name)
+    finally:
+        db.close()
+
+    print(json.dumps(report, indent=2))
+    if failures:
+        print(f"Full table scan in: {', '.join(failures)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Compare ways of turning a user's tasks into a JSON response body.
+
+Seeds one user with --tasks tasks, then, --repeat times each, loads them all
+and encodes them as
+    orm_jsonable      Task instances through jsonable_encoder and json.dumps,
+                      as FastAPI did when POST/PUT /tasks returned a Task
+    mapping_jsonable  column rows turned into dicts through row._mapping, then
+                      jsonable_encoder and json.dumps, the former GET /tasks path
+    tuples_orjson     column tuples zipped into dicts and encoded with
+                      services.responses.dumps (orjson), the current path
+Reports the median time to load the rows and to build and encode the body,
+and checks that every variant produces the same task fields (Task instances
+also carry the internal deadline_hour column).
+
+    python -m benchmarks.serialization [--tasks 10000] [--repeat 7]
+"""
+import argparse
+import json
+import statistics
+import time
+
+from benchmarks.common import configure_environment, reset_database, seed_users
+
+configure_environment()
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+from crud import TASK_FIELDS  # noqa: E402
+from database import SessionLocal  # noqa: E402
+from models import Task  # noqa: E402
+from services import responses  # noqa: E402
+
+COLUMNS = [getattr(Task, name) for name in TASK_FIELDS]
+
+def render(content):
+    """What FastAPI does with a plain return value and no response model"""
+    return JSONResponse(content=jsonable_encoder(content)).body
+
+def orm_jsonable(db):
+    tasks = db.query(Task).filter(Task.user_id == 1).order_by(Task.deadline, Task.id).all()
+    loaded = time.perf_counter()
+    return loaded, render(tasks)
+
+def mapping_jsonable(db):
+    rows = db.query(*COLUMNS).filter(Task.user_id == 1).order_by(Task.deadline, Task.id).all()
+    loaded = time.perf_counter()
+    return loaded, render([{name: row._mapping[name] for name in TASK_FIELDS} for row in rows])
+
+def tuples_orjson(db):
+    rows = db.query(*COLUMNS).filter(Task.user_id == 1).order_by(Task.deadline, Task.id).all()
+    loaded = time.perf_counter()
+    return loaded, responses.dumps(responses.rows_to_dicts(TASK_FIELDS, rows))
+
+VARIANTS = {
+    "orm_jsonable": orm_jsonable,
+    "mapping_jsonable": mapping_jsonable,
+    "tuples_orjson": tuples_orjson
+}
+
+def measure(variant, repeat):
+    load_times, encode_times = [], []
+    body = None
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            loaded, body = variant(db)
+            finished = time.perf_counter()
+        finally:
+            db.close()
+        load_times.append(loaded - started)
+        encode_times.append(finished - loaded)
+    load_ms = statistics.median(load_times) * 1000
+    encode_ms = statistics.median(encode_times) * 1000
+    return body, {
+        "load_ms": round(load_ms, 2),
+        "encode_ms": round(encode_ms, 2),
+        "total_ms": round(load_ms + encode_ms, 2),
+        "body_bytes": len(body)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    reset_database()
+    seed_users(1, args.tasks)
+
+    report = {"config": vars(args), "orjson": responses.orjson is not None}
+    payloads = {}
+    for name, variant in VARIANTS.items():
+        body, report[name] = measure(variant, args.repeat)
+        payloads[name] = [{field: task[field] for field in TASK_FIELDS} for task in json.loads(body)]
+    report["same_payload"] = all(payload == payloads["tuples_orjson"] for payload in payloads.values())
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
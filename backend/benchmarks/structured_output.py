@@ -0,0 +1,84 @@
+"""
+Measure the schema-bound (tool-calling) model calls in services.task_ai.
+
+1. Runs each extractor and the intent router once against the fake model
+   and reports the estimated prompt tokens (messages plus the tool
+   definition) and completion tokens per call.
+2. Sends --calls router calls through a fake whose answers are invalid with
+   probability --invalid-rate and reports the validation failures by
+   attempt, how many calls were rescued by the single repair retry and the
+   model calls spent per message.
+
+    python -m benchmarks.structured_output [--calls 200] [--invalid-rate 0.2]
+"""
+import argparse
+import json
+
+from benchmarks.common import configure_environment, reset_database, seed_tasks
+
+configure_environment()
+
+from benchmarks.fake_llm import FakeChatModel  # noqa: E402
+from services import task_ai  # noqa: E402
+
+STAGES = {
+    "extract_task_from_message": lambda: task_ai.extract_task_from_message("add dentist tomorrow at 3"),
+    "extract_task_edit_request": lambda: task_ai.extract_task_edit_request("move gym to high priority", 1),
+    "extract_task_deletion_request": lambda: task_ai.extract_task_deletion_request("delete the gym session", 1),
+    "classify_message": lambda: task_ai.classify_message("move gym to high priority", 1)
+}
+
+def token_usage():
+    usage = {}
+    for stage, call in STAGES.items():
+        before = {kind: task_ai.LLM_TOKENS.value(stage=stage, kind=kind) for kind in ("prompt", "completion")}
+        call()
+        usage[stage] = {
+            kind: task_ai.LLM_TOKENS.value(stage=stage, kind=kind) - before[kind]
+            for kind in ("prompt", "completion")
+        }
+    return usage
+
+def repair(calls, invalid_rate):
+    model = FakeChatModel(invalid_rate=invalid_rate, seed=1)
+    task_ai.llm = model
+    failures = task_ai.STRUCTURED_OUTPUT_FAILURES
+    before = {attempt: failures.value(stage="classify_message", attempt=attempt) for attempt in ("initial", "repair")}
+    routed = 0
+    for i in range(calls):
+        intent = task_ai.classify_message(f"move gym {i} to high priority", 1)
+        routed += intent["intent"] == "edit"
+    failed = {
+        attempt: failures.value(stage="classify_message", attempt=attempt) - before[attempt]
+        for attempt in ("initial", "repair")
+    }
+    return {
+        "calls": calls,
+        "invalid_rate": invalid_rate,
+        "validation_failures": failed,
+        "rescued_by_repair": failed["initial"] - failed["repair"],
+        "routed_correctly": routed,
+        "model_calls_per_message": round(model.calls / calls, 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--invalid-rate", type=float, default=0.2)
+    args = parser.parse_args()
+
+    reset_database()
+    seed_tasks(1, 20)
+    task_ai.extraction_cache.maxsize = 0
+    # Route every message to the model
+    task_ai.FAST_PATH_MIN_CONFIDENCE = 2.0
+    task_ai.llm = FakeChatModel()
+
+    report = {
+        "tokens_per_call": token_usage(),
+        "repair": repair(args.calls, args.invalid_rate)
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
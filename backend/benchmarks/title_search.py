@@ -0,0 +1,103 @@
+"""
+Compare ranked title search against the previous ILIKE scan.
+
+Seeds tasks with titles drawn from a small vocabulary, then times the
+keyword lookup used by search_tasks_by_criteria (trigram index on Postgres,
+ranked ILIKE elsewhere) against the old OR-ed ILIKE filter, both for one user
+and across all users.
+
+    python -m benchmarks.title_search [--tasks 200000] [--users 200] [--repeat 20]
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import configure_environment, reset_database
+
+configure_environment()
+
+from sqlalchemy import insert, or_  # noqa: E402
+
+from database import SessionLocal  # noqa: E402
+from models import Task, User  # noqa: E402
+from services.task_search import apply_title_search, title_search_backend  # noqa: E402
+
+WORDS = [
+    "gym", "dentist", "standup", "review", "lunch", "report", "call", "groceries",
+    "yoga", "meeting", "deploy", "planning", "invoice", "laundry", "doctor", "study"
+]
+
+QUERIES = [["dentist"], ["gym", "yoga"], ["standup"], ["report", "invoice"]]
+
+def seed(task_count, user_count, batch_size=50000):
+    rng = random.Random(7)
+    start = datetime.now() - timedelta(days=30)
+    db = SessionLocal()
+    try:
+        db.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "hashed_password": "x", "created_at": datetime.now()}
+            for i in range(1, user_count + 1)
+        ])
+        for offset in range(0, task_count, batch_size):
+            db.execute(insert(Task), [
+                {"title": " ".join(rng.sample(WORDS, 3)).capitalize(), "user_id": 1 + i % user_count,
+                 "deadline": start + timedelta(minutes=37 * i)}
+                for i in range(offset, min(offset + batch_size, task_count))
+            ])
+        db.commit()
+    finally:
+        db.close()
+
+def ilike_query(db, keywords, user_id):
+    query = db.query(Task)
+    if user_id is not None:
+        query = query.filter(Task.user_id == user_id)
+    return query.filter(or_(*[Task.title.ilike(f"%{keyword}%") for keyword in keywords]))
+
+def indexed_query(db, keywords, user_id):
+    query = db.query(Task)
+    if user_id is not None:
+        query = query.filter(Task.user_id == user_id)
+    return apply_title_search(query, db, keywords)
+
+def timed(build, db, keywords, user_id, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        rows = build(db, keywords, user_id).all()
+    return (time.perf_counter() - started) / repeat * 1000, rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    reset_database()
+    seed(args.tasks, args.users)
+
+    db = SessionLocal()
+    try:
+        report = {"backend": title_search_backend(db), "tasks": args.tasks, "results": []}
+        for user_id in (7, None):
+            for keywords in QUERIES:
+                ilike_ms, ilike_rows = timed(ilike_query, db, keywords, user_id, args.repeat)
+                indexed_ms, indexed_rows = timed(indexed_query, db, keywords, user_id, args.repeat)
+                report["results"].append({
+                    "keywords": keywords,
+                    "user_id": user_id,
+                    "matches": len(indexed_rows),
+                    "same_matches": {t.id for t in ilike_rows} == {t.id for t in indexed_rows},
+                    "ilike_ms": round(ilike_ms, 2),
+                    "indexed_ms": round(indexed_ms, 2),
+                    "best_match": indexed_rows[0].title if indexed_rows else None
+                })
+    finally:
+        db.close()
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,22 @@
+from sqlalchemy import case, delete, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from models import Task, User
+from models import Task, TaskRecurrence, User
 from datetime import datetime
+import base64
+import csv
+import heapq
+import io
+from itertools import islice
+from services.recurrence import (
+    format_exdates, get_recurrence_snapshot, is_occurrence, iter_recurrence_occurrences,
+    last_occurrence, parse_exdates, parse_rrule
+)
+from services.responses import rows_to_dicts
+from services.task_conflicts import (
+    TaskConflictError, conflict_error, find_conflicts, find_overlapping_pairs, is_conflict_error, task_slot
+)
+from services.task_state import TaskRow, bump_version, record_task_write
 
 def get_tasks(db: Session, user_id: int = None):
     """Get tasks, optionally filtered by user_id"""
@@ -8,6 +24,116 @@ def get_tasks(db: Session, user_id: int = None):
         return db.query(Task).filter(Task.user_id == user_id).all()
     return db.query(Task).all()
 
+# Columns that can be requested through GET /tasks?fields=
+TASK_FIELDS = ("id", "title", "description", "priority", "deadline", "duration", "is_due_date", "user_id")
+
+def encode_task_cursor(deadline: datetime, task_id: int = None, recurrence_id: int = None) -> str:
+    """
+    Encode the position after which the next page starts: a task's
+    (deadline, id), or an occurrence's deadline and recurrence id
+    """
+    position = task_id if recurrence_id is None else f"r{recurrence_id}"
+    raw = f"{deadline.isoformat()}|{position}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_task_cursor(cursor: str):
+    """
+    Decode a cursor from encode_task_cursor into (deadline, task_id,
+    recurrence_id), one of the ids being None; raises ValueError if malformed
+    """
+    try:
+        deadline, position = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        if position.startswith("r"):
+            return datetime.fromisoformat(deadline), None, int(position[1:])
+        return datetime.fromisoformat(deadline), int(position), None
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _row_sort_key(row):
+    # Same order as TaskRow.sort_key: tasks before occurrences at a deadline
+    return (row.deadline, False, row.id)
+
+def get_tasks_page(db: Session, user_id: int = None, limit: int = 100, cursor: str = None,
+                   deadline_from: datetime = None, deadline_to: datetime = None, fields=None):
+    """
+    Get one page of tasks ordered by (deadline, id) using keyset pagination
+    Occurrences of recurring tasks are expanded lazily from the page position
+    and merged in, as rows with a null id and their recurrence_id.
+    Returns (rows, next_cursor) where rows are dicts holding only `fields`
+    and next_cursor is None on the last page
+    """
+    fields = list(fields or TASK_FIELDS)
+    # deadline and id are always selected since they make up the cursor;
+    # they come after `fields`, so zipping a row with `fields` drops them
+    columns = [getattr(Task, name) for name in dict.fromkeys(fields + ["deadline", "id"])]
+
+    query = db.query(*columns)
+    if user_id:
+        query = query.filter(Task.user_id == user_id)
+    if deadline_from:
+        query = query.filter(Task.deadline >= deadline_from)
+    if deadline_to:
+        query = query.filter(Task.deadline < deadline_to)
+    after = None
+    if cursor:
+        after_deadline, after_id, after_recurrence = decode_task_cursor(cursor)
+        if after_recurrence is None:
+            query = query.filter(tuple_(Task.deadline, Task.id) > tuple_(after_deadline, after_id))
+            after = (after_deadline, False, after_id)
+        else:
+            query = query.filter(Task.deadline > after_deadline)
+            after = (after_deadline, True, after_recurrence)
+
+    # Fetch one extra row to know whether another page follows
+    rows = query.order_by(Task.deadline, Task.id).limit(limit + 1).all()
+
+    recurrences = get_recurrence_snapshot(user_id, db=db)
+    if not recurrences:
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_task_cursor(rows[-1].deadline, rows[-1].id)
+        return rows_to_dicts(fields, rows), next_cursor
+
+    start = deadline_from
+    if after is not None and (start is None or after[0] > start):
+        start = after[0]
+    occurrences = (
+        occurrence for occurrence in iter_recurrence_occurrences(recurrences, start, deadline_to)
+        if after is None or occurrence.sort_key() > after
+    )
+    occurrences = list(islice(occurrences, limit + 1))
+    merged = list(islice(heapq.merge(
+        ((_row_sort_key(row), row) for row in rows),
+        ((occurrence.sort_key(), occurrence) for occurrence in occurrences),
+        key=lambda item: item[0]
+    ), limit + 1))
+
+    next_cursor = None
+    if len(merged) > limit:
+        merged = merged[:limit]
+        last = merged[-1][1]
+        next_cursor = encode_task_cursor(last.deadline, last.id, getattr(last, "recurrence_id", None))
+
+    page = []
+    for _, row in merged:
+        if getattr(row, "recurrence_id", None) is None:
+            page.append(dict(zip(fields, row)))
+        else:
+            page.append(dict({name: getattr(row, name) for name in fields}, recurrence_id=row.recurrence_id))
+    return page, next_cursor
+
+def _commit_task_write(db: Session, written: TaskRow, exclude_id: int = None):
+    """Commit a task write, turning an overlap rejected by the database into TaskConflictError"""
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        conflict = conflict_error(db, e, written, exclude_id)
+        if conflict is None:
+            raise
+        raise conflict from e
+
 def create_task(db: Session, task_data, user_id: int = None):
     # Make sure task_data is properly formatted
     if isinstance(task_data, dict) and 'deadline' in task_data:
@@ -26,8 +152,9 @@ def create_task(db: Session, task_data, user_id: int = None):
     
     new_task = Task(**task_data)
     db.add(new_task)
-    db.commit()
+    _commit_task_write(db, TaskRow.from_task(new_task))
     db.refresh(new_task)
+    record_task_write(after=new_task)
     return new_task
 
 def delete_task(db: Session, task_id: int, user_id: int = None):
@@ -41,6 +168,7 @@ def delete_task(db: Session, task_id: int, user_id: int = None):
     if task:
         db.delete(task)
         db.commit()
+        record_task_write(before=task)
     return task
 
 def update_task(db: Session, task_id: int, task_data: dict, user_id: int = None):
@@ -55,6 +183,7 @@ def update_task(db: Session, task_id: int, task_data: dict, user_id: int = None)
     
     if not task:
         return None
+    before = TaskRow.from_task(task)
         
     # Update task fields
     if "title" in task_data:
@@ -73,12 +202,331 @@ def update_task(db: Session, task_id: int, task_data: dict, user_id: int = None)
         task.duration = task_data["duration"]
     if "is_due_date" in task_data:
         task.is_due_date = task_data["is_due_date"]
-    if "user_id" in task_data:
-        task.user_id = task_data["user_id"]
+    # A task stays with its owner; user_id in the body is ignored
     
-    db.commit()
+    _commit_task_write(db, TaskRow.from_task(task), exclude_id=task_id)
     db.refresh(task)
+    record_task_write(before=before, after=task)
     
     return task
 
+# Task columns that creates and updates may set
+IMPORT_FIELDS = ("title", "description", "priority", "deadline", "duration", "is_due_date", "user_id")
+# Columns a batch update may change; a task stays with its owner
+CHANGE_FIELDS = tuple(name for name in IMPORT_FIELDS if name != "user_id")
+
+# Columns written by bulk imports, in COPY order
+IMPORT_COLUMNS = IMPORT_FIELDS + ("deadline_hour",)
+
+def _copy_task_rows(db: Session, rows):
+    """Load rows with COPY FROM STDIN (psycopg2 only), inside the session's transaction"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    for values in rows:
+        values = dict(values, deadline_hour=values["deadline"].hour)
+        writer.writerow([
+            values[name].isoformat() if isinstance(values[name], datetime) else ("" if values[name] is None else values[name])
+            for name in IMPORT_COLUMNS
+        ])
+    buffer.seek(0)
+    cursor = db.connection().connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY tasks ({', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+def insert_task_batch(db: Session, rows):
+    """
+    Insert a batch of validated task values, given as (row_number, values) pairs
+    The batch is written with one COPY (Postgres) or executemany INSERT and
+    committed. If it fails, rows are retried one at a time in savepoints so only
+    the offending rows are rejected. Returns (inserted, [(row_number, error)])
+    """
+    if not rows:
+        return 0, []
+
+    values = [row for _, row in rows]
+    try:
+        if db.get_bind().dialect.driver == "psycopg2":
+            _copy_task_rows(db, values)
+        else:
+            db.execute(insert(Task), values)
+        db.commit()
+        inserted, errors = len(rows), []
+    except Exception:
+        db.rollback()
+        inserted, errors = 0, []
+        for row_number, row in rows:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(Task), [row])
+                inserted += 1
+            except Exception as e:
+                if is_conflict_error(e):
+                    errors.append((row_number, "Overlaps another scheduled task"))
+                else:
+                    errors.append((row_number, str(getattr(e, "orig", e))))
+        db.commit()
+
+    # Bulk writes bypass record_task_write, so invalidate the affected users
+    for user_id in {row["user_id"] for row in values}:
+        bump_version(user_id)
+    return inserted, errors
+
+def iter_tasks_for_export(db: Session, user_id: int = None, batch_size: int = 1000):
+    """
+    Yield task rows (mappings of TASK_FIELDS) ordered by (deadline, id)
+    Rows are fetched batch_size at a time through a server-side cursor where
+    the driver supports one, so memory stays constant however many tasks exist
+    """
+    query = select(*[getattr(Task, name) for name in TASK_FIELDS]).order_by(Task.deadline, Task.id)
+    if user_id:
+        query = query.where(Task.user_id == user_id)
+    result = db.execute(query.execution_options(stream_results=True, yield_per=batch_size))
+    for row in result.mappings():
+        yield row
+
+def _task_result(row):
+    return {name: getattr(row, name) for name in TASK_FIELDS}
+
+def _batch_conflicts(db: Session, before, creates, updates, deleted_ids):
+    """
+    The tasks a rejected batch runs into, and the error message
+    First the overlaps of the batch's result: its created and updated rows
+    against the stored tasks it leaves alone and against each other. When
+    there are none, the batch was only invalid part-way through: SQLite's
+    triggers check each row against the tasks as they stand mid-statement,
+    so e.g. swapping two tasks' times is rejected there. The stored tasks
+    the rows ran into are reported instead
+    """
+    written = [
+        TaskRow(None, values["title"], values.get("description"), values.get("priority"), values["deadline"],
+                values.get("duration"), values.get("is_due_date"), values.get("user_id"))
+        for values in creates.values()
+    ]
+    written.extend(
+        before[task_id]._replace(**{name: value for name, value in changes.items() if name in TaskRow._fields})
+        for task_id, changes in updates.values()
+    )
+    written = [row for row in written if task_slot(row)]
+    changed_ids = deleted_ids | {row.id for row in written}
+
+    conflicts = {}
+    for row in written:
+        for conflict in find_conflicts(db, row.user_id, *task_slot(row)):
+            if conflict.id not in changed_ids:
+                conflicts[conflict.id] = conflict
+    for first, second in find_overlapping_pairs(written):
+        if first.user_id == second.user_id:
+            for row in (first, second):
+                conflicts[row.id if row.id is not None else row] = row
+    if conflicts:
+        return sorted(conflicts.values(), key=TaskRow.sort_key), "The batch would make scheduled tasks overlap"
+
+    for row in written:
+        for conflict in find_conflicts(db, row.user_id, *task_slot(row), exclude_id=row.id):
+            if conflict.id not in deleted_ids:
+                conflicts[conflict.id] = conflict
+    return sorted(conflicts.values(), key=TaskRow.sort_key), (
+        "The batch moves tasks into slots that other tasks of the batch still hold, and this database "
+        "checks each row as it is written; move one of them to a free slot first"
+    )
+
+def apply_task_batch(db: Session, operations, user_id: int = None):
+    """
+    Apply create/update/delete operations in one transaction
+    Each operation is a dict with "op" and, depending on it, "id", "task"
+    (create) or "changes" (update). Creates, updates and deletes each run as
+    a single set-based statement with RETURNING. Nothing is written unless
+    every operation is valid and every targeted task exists.
+    Overlaps raise TaskConflictError. Postgres checks them at the end of each
+    statement, SQLite row by row, so there a batch that trades slots between
+    its own tasks is rejected too.
+    Returns (applied, results) with one result per operation, in order
+    """
+    from services.task_transfer import parse_task_changes, parse_task_record
+
+    errors = {}
+    creates, updates, deletes = {}, {}, {}
+    seen_ids = {}
+    for index, operation in enumerate(operations):
+        op = operation.get("op")
+        try:
+            if op == "create":
+                creates[index] = parse_task_record(operation.get("task") or {}, user_id)
+                continue
+            if op not in ("update", "delete"):
+                raise ValueError(f"Unknown operation: {op}")
+            task_id = operation.get("id")
+            if task_id is None:
+                raise ValueError("Missing id")
+            if task_id in seen_ids:
+                raise ValueError(f"Task {task_id} is already changed by operation {seen_ids[task_id]}")
+            seen_ids[task_id] = index
+            if op == "update":
+                updates[index] = (task_id, parse_task_changes(operation.get("changes")))
+            else:
+                deletes[index] = task_id
+        except ValueError as e:
+            errors[index] = str(e)
+
+    def rejected(status):
+        return False, [
+            {"index": index, "op": operation.get("op"), "status": status if index in errors else "skipped",
+             "error": errors.get(index)}
+            for index, operation in enumerate(operations)
+        ]
+
+    if errors:
+        return rejected("invalid")
+
+    columns = [getattr(Task, name) for name in TASK_FIELDS]
+    try:
+        # Lock the targeted rows and keep their current state for the snapshots
+        before = {}
+        if seen_ids:
+            query = select(*columns).where(Task.id.in_(seen_ids)).with_for_update()
+            if user_id:
+                query = query.where(Task.user_id == user_id)
+            before = {row.id: TaskRow(*row) for row in db.execute(query)}
+        for task_id, index in seen_ids.items():
+            if task_id not in before:
+                errors[index] = f"Task with ID {task_id} not found"
+        if errors:
+            db.rollback()
+            return rejected("not_found")
+
+        results = {}
+        if deletes:
+            db.execute(
+                delete(Task).where(Task.id.in_(deletes.values())),
+                execution_options={"synchronize_session": False}
+            )
+            for index, task_id in deletes.items():
+                results[index] = {"status": "deleted", "before": before[task_id], "after": None}
+
+        if updates:
+            # One UPDATE ... SET column = CASE id WHEN ... END per changed column
+            values = {}
+            for name in CHANGE_FIELDS:
+                mapping = {task_id: changes[name] for task_id, changes in updates.values() if name in changes}
+                if mapping:
+                    values[name] = case(mapping, value=Task.id, else_=getattr(Task, name))
+                    if name == "deadline":
+                        hours = {task_id: deadline.hour for task_id, deadline in mapping.items()}
+                        values["deadline_hour"] = case(hours, value=Task.id, else_=Task.deadline_hour)
+            statement = (
+                update(Task)
+                .where(Task.id.in_([task_id for task_id, _ in updates.values()]))
+                .values(**values)
+                .returning(*columns)
+            )
+            after = {row.id: TaskRow(*row) for row in db.execute(statement, execution_options={"synchronize_session": False})}
+            for index, (task_id, _) in updates.items():
+                results[index] = {"status": "updated", "before": before[task_id], "after": after[task_id]}
+
+        if creates:
+            if db.get_bind().dialect.name == "sqlite":
+                # Ordered RETURNING would fall back to one INSERT per row on
+                # SQLite; rowids are assigned in VALUES order, so sort by id
+                statement = insert(Task).returning(*columns)
+                created = sorted(db.execute(statement, list(creates.values())).all(), key=lambda row: row.id)
+            else:
+                statement = insert(Task).returning(*columns, sort_by_parameter_order=True)
+                created = db.execute(statement, list(creates.values())).all()
+            for index, row in zip(creates, created):
+                results[index] = {"status": "created", "before": None, "after": TaskRow(*row)}
+
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        if is_conflict_error(e):
+            conflicts, message = _batch_conflicts(db, before, creates, updates, set(deletes.values()))
+            raise TaskConflictError(conflicts, message) from e
+        raise
+
+    for result in results.values():
+        record_task_write(before=result["before"], after=result["after"])
+
+    return True, [
+        {"index": index, "op": operation["op"], "status": results[index]["status"],
+         "task": _task_result(results[index]["after"] or results[index]["before"])}
+        for index, operation in enumerate(operations)
+    ]
+
+# Columns of a recurring task returned by the /recurrences routes
+RECURRENCE_FIELDS = (
+    "id", "title", "description", "priority", "duration", "is_due_date", "user_id",
+    "dtstart", "rrule", "until"
+)
+
+def recurrence_result(recurrence):
+    result = {name: getattr(recurrence, name) for name in RECURRENCE_FIELDS}
+    result["exdates"] = sorted(parse_exdates(recurrence.exdates))
+    return result
+
+def get_recurrences(db: Session, user_id: int = None):
+    """Get recurring tasks, optionally filtered by user_id"""
+    query = db.query(TaskRecurrence)
+    if user_id:
+        query = query.filter(TaskRecurrence.user_id == user_id)
+    return query.order_by(TaskRecurrence.id).all()
+
+def create_recurrence(db: Session, data: dict, user_id: int = None):
+    """
+    Store a recurring task
+    `data` holds the Task fields other than deadline, plus dtstart (the first
+    occurrence), rrule and optional exdates. Raises ValueError for a bad rule
+    """
+    rule = parse_rrule(data["rrule"])
+    recurrence = TaskRecurrence(
+        title=data["title"],
+        description=data.get("description"),
+        priority=data.get("priority") or "Normal",
+        duration=data.get("duration") or 60,
+        is_due_date=bool(data.get("is_due_date")),
+        user_id=user_id or data.get("user_id"),
+        dtstart=data["dtstart"],
+        rrule=data["rrule"].strip(),
+        until=last_occurrence(rule, data["dtstart"]),
+        exdates=format_exdates(data.get("exdates") or ())
+    )
+    db.add(recurrence)
+    db.commit()
+    db.refresh(recurrence)
+    # Occurrences show up in every cached view of the user's tasks
+    bump_version(recurrence.user_id)
+    return recurrence
+
+def _get_recurrence(db: Session, recurrence_id: int, user_id: int = None):
+    query = db.query(TaskRecurrence).filter(TaskRecurrence.id == recurrence_id)
+    if user_id:
+        query = query.filter(TaskRecurrence.user_id == user_id)
+    return query.first()
+
+def delete_recurrence(db: Session, recurrence_id: int, user_id: int = None):
+    """Delete a recurring task and all its occurrences"""
+    recurrence = _get_recurrence(db, recurrence_id, user_id)
+    if recurrence:
+        db.delete(recurrence)
+        db.commit()
+        bump_version(recurrence.user_id)
+    return recurrence
+
+def add_recurrence_exception(db: Session, recurrence_id: int, occurrence: datetime, user_id: int = None):
+    """
+    Skip one occurrence of a recurring task, e.g. before creating a regular
+    task in its place. Raises ValueError if the rule has no such occurrence
+    """
+    recurrence = _get_recurrence(db, recurrence_id, user_id)
+    if not recurrence:
+        return None
+    if not is_occurrence(parse_rrule(recurrence.rrule), recurrence.dtstart, occurrence):
+        raise ValueError(f"{occurrence.isoformat()} is not an occurrence of recurring task {recurrence_id}")
+    recurrence.exdates = format_exdates(parse_exdates(recurrence.exdates) | {occurrence})
+    db.commit()
+    db.refresh(recurrence)
+    bump_version(recurrence.user_id)
+    return recurrence
+
 # User functions could be added here or kept in auth.py
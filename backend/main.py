@@ -1,12 +1,23 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+from services.log import setup_logging
 from database import init_db
+from middleware import PoolCheckoutMiddleware, RequestContextMiddleware, RequestMetricsMiddleware
 from routes import tasks, users
+from services.llm_gateway import LLMGatewayError
+from services.metrics import CONTENT_TYPE, render_prometheus
+from services.responses import TaskJSONResponse, task_to_dict
+from services.task_conflicts import TaskConflictError
+from crud import TASK_FIELDS
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Structured logs are written from a background thread
+setup_logging()
+
 app = FastAPI()
 
 # Add CORS middleware with more permissive settings
@@ -18,6 +29,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Count pooled DB connections checked out per request
+app.add_middleware(PoolCheckoutMiddleware)
+# Per-route latency and DB query metrics
+app.add_middleware(RequestMetricsMiddleware)
+# Request IDs and access logs; added last so it wraps everything else
+app.add_middleware(RequestContextMiddleware)
+
 # Initialize database tables
 init_db()
 
@@ -25,6 +43,23 @@ init_db()
 app.include_router(tasks.router)
 app.include_router(users.router, prefix="/users", tags=["users"])
 
+@app.exception_handler(LLMGatewayError)
+async def llm_gateway_error_handler(request: Request, exc: LLMGatewayError):
+    """Shed or timed-out model calls: 503 (or 504) with a Retry-After hint"""
+    headers = {"Retry-After": str(exc.retry_after)} if exc.retry_after else None
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)}, headers=headers)
+
+@app.exception_handler(TaskConflictError)
+async def task_conflict_handler(request: Request, exc: TaskConflictError):
+    """Overlapping scheduled tasks: 409 listing the tasks in the way"""
+    conflicts = [task_to_dict(task, TASK_FIELDS) for task in exc.conflicts]
+    return TaskJSONResponse(status_code=409, content={"detail": str(exc), "conflicts": conflicts})
+
 @app.get("/")
 def read_root():
     return {"message": "Task Manager API is running!"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(render_prometheus(), media_type=CONTENT_TYPE)
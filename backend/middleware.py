@@ -0,0 +1,138 @@
+"""
+ASGI middleware shared by the app.
+
+Written as plain ASGI callables rather than BaseHTTPMiddleware so that work
+done while a streaming body is being sent is still attributed to the request.
+"""
+import os
+import time
+import uuid
+
+from database import track_db_queries, track_pool_checkouts
+from services.log import LOG_SAMPLE_RATE, get_logger, log_event, request_id_var, sql_debug_var
+from services.metrics import Histogram
+
+# Request header that turns on verbose SQL logging for one request; set the
+# variable to an empty string to disable it
+SQL_DEBUG_HEADER = os.getenv("SQL_DEBUG_HEADER", "X-Debug-SQL").lower().encode()
+
+access_logger = get_logger("access")
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to serve a request, including sending a streamed body",
+    ("method", "route", "status")
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "SQL statements run while serving one request",
+    ("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250)
+)
+DB_QUERY_SECONDS_PER_REQUEST = Histogram(
+    "db_query_seconds_per_request",
+    "Time spent in SQL statements while serving one request",
+    ("route",),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+def _header(scope, name):
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+class RequestContextMiddleware:
+    """
+    Give each request an ID (X-Request-ID, generated when missing) for its
+    log records, honor the SQL debug header, and write a sampled access log
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _header(scope, b"x-request-id")
+        if not request_id or len(request_id) > 128:
+            request_id = uuid.uuid4().hex
+        sql_debug = bool(SQL_DEBUG_HEADER) and (_header(scope, SQL_DEBUG_HEADER) or "").lower() in ("1", "true", "yes")
+
+        request_token = request_id_var.set(request_id)
+        sql_token = sql_debug_var.set(sql_debug)
+        status = {"code": 500}
+        started = time.perf_counter()
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            # Errors and debugged requests are always logged, the rest sampled
+            always = status["code"] >= 500 or sql_debug
+            log_event(
+                access_logger, "http.request",
+                sample_rate=1.0 if always else LOG_SAMPLE_RATE,
+                method=scope["method"],
+                path=scope["path"],
+                status=status["code"],
+                duration_ms=round((time.perf_counter() - started) * 1000, 2)
+            )
+            sql_debug_var.reset(sql_token)
+            request_id_var.reset(request_token)
+
+class PoolCheckoutMiddleware:
+    """Record how many pooled DB connections each HTTP request checks out"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with track_pool_checkouts():
+            await self.app(scope, receive, send)
+
+class RequestMetricsMiddleware:
+    """
+    Record latency and DB query count/time per request, labeled by the
+    matched route's path template so IDs in URLs don't multiply the series
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        with track_db_queries() as stats:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # The router stores the matched route in the shared scope
+                route = scope.get("route")
+                route = getattr(route, "path", None) or "unmatched"
+                HTTP_REQUEST_DURATION.observe(
+                    time.perf_counter() - started,
+                    method=scope["method"], route=route, status=status["code"]
+                )
+                DB_QUERIES_PER_REQUEST.observe(stats["queries"], route=route)
+                DB_QUERY_SECONDS_PER_REQUEST.observe(stats["seconds"], route=route)
@@ -1,6 +1,7 @@
 from sqlalchemy import Column, Integer, ForeignKey
 from sqlalchemy.sql import text
 from database import engine, init_db
+from models import POSTGRES_TASK_OVERLAP_CONSTRAINT, POSTGRES_TASK_SLOT_DDL, POSTGRES_TITLE_SEARCH_DDL
 import sys
 
 def add_user_id_to_tasks():
@@ -28,6 +29,79 @@ def add_user_id_to_tasks():
         print(f"Error adding user_id column to tasks table: {str(e)}")
         return False
 
+def add_task_indexes():
+    """Create the composite index used for paginated task listing"""
+    try:
+        print("Creating task indexes...")
+        with engine.connect() as conn:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_user_deadline_id ON tasks (user_id, deadline, id)"))
+            conn.commit()
+            print("Successfully created task indexes.")
+            return True
+    except Exception as e:
+        print(f"Error creating task indexes: {str(e)}")
+        return False
+
+def add_deadline_hour_column():
+    """Add and backfill tasks.deadline_hour, the indexed hour-of-day of the deadline"""
+    try:
+        print("Adding deadline_hour column to tasks table...")
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS deadline_hour SMALLINT"))
+            conn.execute(text("UPDATE tasks SET deadline_hour = EXTRACT(HOUR FROM deadline) WHERE deadline_hour IS NULL"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_user_hour_deadline ON tasks (user_id, deadline_hour, deadline)"))
+            conn.commit()
+            print("Successfully added deadline_hour column to tasks table.")
+            return True
+    except Exception as e:
+        print(f"Error adding deadline_hour column to tasks table: {str(e)}")
+        return False
+
+def add_title_search_index():
+    """Enable pg_trgm and create the GIN index used for ranked title search"""
+    try:
+        print("Creating title search index...")
+        with engine.connect() as conn:
+            for statement in POSTGRES_TITLE_SEARCH_DDL:
+                conn.execute(text(statement))
+            conn.commit()
+            print("Successfully created title search index.")
+            return True
+    except Exception as e:
+        print(f"Error creating title search index: {str(e)}")
+        return False
+
+def add_task_overlap_constraint():
+    """Add tasks.slot and the exclusion constraint that keeps a user's scheduled tasks from overlapping"""
+    try:
+        print("Adding task overlap constraint...")
+        with engine.connect() as conn:
+            for statement in POSTGRES_TASK_SLOT_DDL:
+                conn.execute(text(statement))
+            conn.commit()
+            if conn.execute(text("SELECT 1 FROM pg_constraint WHERE conname = 'tasks_no_overlap'")).fetchone():
+                print("Constraint tasks_no_overlap already exists.")
+                return True
+            try:
+                conn.execute(text(POSTGRES_TASK_OVERLAP_CONSTRAINT))
+                conn.commit()
+            except Exception as e:
+                # Existing overlaps block the constraint; index the slots so
+                # GET /tasks/conflicts can still list them
+                conn.rollback()
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_user_slot ON tasks USING gist (user_id, slot)"))
+                conn.commit()
+                print(f"Could not add tasks_no_overlap, probably because tasks already overlap: {str(e)}")
+                print("Resolve the overlaps listed by GET /tasks/conflicts and run this again.")
+                return False
+            conn.execute(text("DROP INDEX IF EXISTS ix_tasks_user_slot"))
+            conn.commit()
+            print("Successfully added task overlap constraint.")
+            return True
+    except Exception as e:
+        print(f"Error adding task overlap constraint: {str(e)}")
+        return False
+
 def create_users_table():
     """Create users table if it doesn't exist"""
     try:
@@ -55,3 +129,7 @@ if __name__ == "__main__":
         if create_users_table():
             # Then add user_id column to tasks table
             add_user_id_to_tasks()
+            add_task_indexes()
+            add_deadline_hour_column()
+            add_title_search_index()
+            add_task_overlap_constraint()
@@ -1,6 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
+from datetime import datetime
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, Boolean, ForeignKey, Index, Text, event, text
+from sqlalchemy.orm import relationship, validates
 from database import Base
+from services.log import get_logger
+
+logger = get_logger("models")
+
+def _deadline_hour_default(context):
+    """Fill deadline_hour for Core inserts that bypass the ORM validator"""
+    deadline = context.get_current_parameters().get("deadline")
+    return deadline.hour if isinstance(deadline, datetime) else None
 
 class User(Base):
     __tablename__ = "users"
@@ -27,6 +36,151 @@ class Task(Base):
     is_due_date = Column(Boolean, default=False)
     # Add user_id foreign key
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # Hour of day of the deadline, kept in sync with deadline so hour-of-day
+    # searches can use an index instead of EXTRACT(hour FROM deadline)
+    deadline_hour = Column(SmallInteger, nullable=True, default=_deadline_hour_default)
     
     # Create relationship to user
     user = relationship("User", back_populates="tasks")
+
+    __table_args__ = (
+        # Serves per-user listing ordered and paginated by (deadline, id)
+        Index("ix_tasks_user_deadline_id", "user_id", "deadline", "id"),
+        # Serves "morning"/"3pm" style lookups in search_tasks_by_criteria
+        Index("ix_tasks_user_hour_deadline", "user_id", "deadline_hour", "deadline"),
+    )
+
+    @validates("deadline")
+    def _sync_deadline_hour(self, key, deadline):
+        if isinstance(deadline, datetime):
+            self.deadline_hour = deadline.hour
+        return deadline
+
+class TaskRecurrence(Base):
+    """
+    A repeating task, stored once and expanded into occurrences only for the
+    window a query asks for (see services/recurrence.py)
+    """
+    __tablename__ = "task_recurrences"
+
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String, nullable=False)
+    description = Column(String, nullable=True)
+    priority = Column(String, default="Normal")
+    duration = Column(Integer, default=60)  # Duration of each occurrence in minutes
+    is_due_date = Column(Boolean, default=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # Start of the first occurrence; later ones keep its time of day
+    dtstart = Column(DateTime, nullable=False)
+    # RRULE subset, e.g. "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;COUNT=10"
+    rrule = Column(String, nullable=False)
+    # No occurrence starts after this; derived from COUNT/UNTIL, None if endless
+    until = Column(DateTime, nullable=True)
+    # Skipped occurrence starts, as comma-separated ISO datetimes
+    exdates = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("ix_task_recurrences_user_start", "user_id", "dtstart"),
+    )
+
+
+# Title search indexes, queried by services/task_search.py
+POSTGRES_TITLE_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_title_trgm ON tasks USING gin (title gin_trgm_ops)",
+]
+
+@event.listens_for(Task.__table__, "after_create")
+def create_title_search_index(target, connection, **kw):
+    """Create the trigram title index on Postgres"""
+    if connection.dialect.name != "postgresql":
+        return
+
+    try:
+        with connection.begin_nested():
+            for statement in POSTGRES_TITLE_SEARCH_DDL:
+                connection.execute(text(statement))
+    except Exception as e:
+        # Title search falls back to ILIKE without the index
+        logger.warning("Could not create title search index: %s", e)
+
+
+# No overlapping scheduled tasks per user, checked by services/task_conflicts.py.
+# A task books [deadline, deadline + duration), 60 minutes without a duration,
+# unless it is a due date or has no user
+_SLOT_MINUTES = "CASE WHEN {row}duration > 0 THEN {row}duration ELSE 60 END"
+
+POSTGRES_TASK_SLOT_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS slot tsrange GENERATED ALWAYS AS ("
+    "CASE WHEN COALESCE(is_due_date, false) OR user_id IS NULL THEN NULL "
+    f"ELSE tsrange(deadline, deadline + ({_SLOT_MINUTES.format(row='')}) * interval '1 minute') END"
+    ") STORED",
+]
+
+# DEFERRABLE so a multi-row UPDATE is checked at the end of the statement,
+# letting a batch swap two tasks
+POSTGRES_TASK_OVERLAP_CONSTRAINT = (
+    "ALTER TABLE tasks ADD CONSTRAINT tasks_no_overlap EXCLUDE USING gist (user_id WITH =, slot WITH &&) "
+    "DEFERRABLE INITIALLY IMMEDIATE"
+)
+
+def _sqlite_slot(row):
+    """Start and end of a row's slot in epoch seconds"""
+    start = f"CAST(strftime('%s', {row}.deadline) AS INTEGER)"
+    return start, f"({start} + 60 * ({_SLOT_MINUTES.format(row=row + '.')}))"
+
+_NEW_START, _NEW_END = _sqlite_slot("new")
+_OLD_START, _OLD_END = _sqlite_slot("t")
+_NEW_IS_SCHEDULED = "new.user_id IS NOT NULL AND NOT COALESCE(new.is_due_date, 0)"
+# R*Tree boxes (user_id, user_id, start, end) in whole minutes, rounded outwards
+_NEW_BOX = f"new.id, new.user_id, new.user_id, {_NEW_START} / 60, ({_NEW_END} + 59) / 60"
+_OVERLAP_CHECK = (
+    "SELECT RAISE(ABORT, 'tasks_no_overlap') WHERE EXISTS ("
+    "SELECT 1 FROM tasks_slots s JOIN tasks t ON t.id = s.id "
+    "WHERE s.user_min <= new.user_id AND s.user_max >= new.user_id "
+    f"AND s.start_min < ({_NEW_END} + 59) / 60 AND s.end_max > {_NEW_START} / 60 "
+    # The boxes pin user_id, so the R*Tree drives the search and tasks is only
+    # read by id for the exact check
+    f"AND {_OLD_START} < {_NEW_END} AND {_OLD_END} > {_NEW_START}"
+    "{exclude_self}); "
+)
+_SLOT_COLUMNS = "deadline, duration, is_due_date, user_id"
+
+SQLITE_TASK_SLOT_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_slots USING rtree_i32(id, user_min, user_max, start_min, end_max)",
+    f"CREATE TRIGGER IF NOT EXISTS tasks_no_overlap_bi BEFORE INSERT ON tasks WHEN {_NEW_IS_SCHEDULED} BEGIN "
+    + _OVERLAP_CHECK.format(exclude_self="") + "END",
+    f"CREATE TRIGGER IF NOT EXISTS tasks_no_overlap_bu BEFORE UPDATE OF {_SLOT_COLUMNS} ON tasks "
+    f"WHEN {_NEW_IS_SCHEDULED} BEGIN " + _OVERLAP_CHECK.format(exclude_self=" AND t.id != new.id") + "END",
+    f"CREATE TRIGGER IF NOT EXISTS tasks_slots_ai AFTER INSERT ON tasks WHEN {_NEW_IS_SCHEDULED} BEGIN "
+    f"INSERT INTO tasks_slots VALUES ({_NEW_BOX}); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_slots_ad AFTER DELETE ON tasks BEGIN "
+    "DELETE FROM tasks_slots WHERE id = old.id; END",
+    f"CREATE TRIGGER IF NOT EXISTS tasks_slots_au AFTER UPDATE OF {_SLOT_COLUMNS} ON tasks BEGIN "
+    "DELETE FROM tasks_slots WHERE id = old.id; "
+    f"INSERT INTO tasks_slots SELECT {_NEW_BOX} WHERE {_NEW_IS_SCHEDULED}; END",
+]
+
+@event.listens_for(Task.__table__, "after_create")
+def create_task_overlap_constraint(target, connection, **kw):
+    """Create the exclusion constraint (Postgres) or R*Tree and triggers (SQLite)"""
+    if connection.dialect.name == "postgresql":
+        statements = POSTGRES_TASK_SLOT_DDL + [POSTGRES_TASK_OVERLAP_CONSTRAINT]
+    elif connection.dialect.name == "sqlite":
+        statements = SQLITE_TASK_SLOT_DDL
+    else:
+        return
+
+    try:
+        with connection.begin_nested():
+            for statement in statements:
+                connection.execute(text(statement))
+    except Exception as e:
+        # Overlaps are then only found by GET /tasks/conflicts, with a scan
+        logger.warning("Could not create task overlap constraint: %s", e)
+
+@event.listens_for(Task.__table__, "before_drop")
+def drop_task_slot_index(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("DROP TABLE IF EXISTS tasks_slots"))
@@ -1,14 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import get_db
-from crud import get_tasks, create_task, delete_task, update_task
-from services.task_ai import suggest_task, chat_with_ai
+from auth import get_request_user_id, get_token_claims, resolve_user_id
+from database import get_async_db, get_db, session_scope
+from crud import TASK_FIELDS, get_tasks_page, create_task, delete_task, update_task, insert_task_batch, iter_tasks_for_export, apply_task_batch
+from crud import get_recurrences, create_recurrence, delete_recurrence, add_recurrence_exception, recurrence_result
+from services.task_ai import suggest_task, achat_with_ai, astream_chat_with_ai
+from services.llm_gateway import LLMGatewayError
+from services.log import LOG_SAMPLE_RATE, get_logger, log_event
+from services.metrics import Histogram
+from services.responses import TaskJSONResponse, task_to_dict
+from services.task_conflicts import TaskConflictError, find_conflicting_pairs, find_conflicts
+from services.task_transfer import aiter_records, detect_format, iter_encoded, parse_task_record
 from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional
-from fastapi.responses import JSONResponse
+from datetime import datetime, timedelta
+from typing import List, Literal, Optional
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import bisect
+import json
+import logging
+import time
 
 router = APIRouter()
+logger = get_logger("routes.tasks")
+
+# Page size limits for GET /tasks
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 500
+
+# Rows per insert batch for POST /tasks/import, and how many row errors to return
+IMPORT_BATCH_SIZE = 1000
+MAX_IMPORT_ERRORS = 1000
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Most operations accepted by one POST /tasks/batch
+MAX_BATCH_OPERATIONS = 1000
+
+CHAT_STREAM_TTFB = Histogram(
+    "chat_stream_ttfb_seconds",
+    "Time from receiving a /chat/stream request to sending its first chunk"
+)
+CHAT_STREAM_DURATION = Histogram(
+    "chat_stream_duration_seconds",
+    "Total time spent streaming a /chat/stream response"
+)
 
 # Define a Pydantic model for task validation
 class TaskCreate(BaseModel):
@@ -24,66 +61,341 @@ class TaskCreate(BaseModel):
         # Allow extra fields
         extra = "allow"
 
+# Task as returned by GET/POST/PUT /tasks; GET /tasks?fields= returns a subset.
+# Occurrences of recurring tasks in GET /tasks have a null id and their recurrence_id
+class TaskResponse(BaseModel):
+    id: Optional[int] = None
+    title: str
+    description: Optional[str] = None
+    priority: Optional[str] = None
+    deadline: datetime
+    duration: Optional[int] = None
+    is_due_date: Optional[bool] = None
+    user_id: Optional[int] = None
+    recurrence_id: Optional[int] = None
+
+# A task repeating from dtstart by an RRULE, e.g. "FREQ=WEEKLY;BYDAY=MO,WE"
+class RecurrenceCreate(BaseModel):
+    title: str
+    description: Optional[str] = None
+    priority: Optional[str] = "Normal"
+    dtstart: datetime
+    duration: Optional[int] = 60
+    is_due_date: Optional[bool] = False
+    user_id: Optional[int] = None
+    rrule: str
+    exdates: List[datetime] = []
+
+class RecurrenceException(BaseModel):
+    occurrence: datetime
+
+# One create/update/delete in a POST /tasks/batch request
+class TaskOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[int] = None
+    task: Optional[dict] = None
+    changes: Optional[dict] = None
+
+class TaskBatch(BaseModel):
+    operations: List[TaskOperation]
+
 # Define a model for chat messages with user_id
 class ChatMessage(BaseModel):
     message: str
     user_id: Optional[int] = None
 
 # Existing CRUD routes - updated to support user_id
-@router.get("/tasks")
-def fetch_tasks(db: Session = Depends(get_db), user_id: Optional[int] = None):
-    # In a real app, user_id would come from auth token
-    return get_tasks(db, user_id)
+@router.get("/tasks", response_model=List[TaskResponse])
+def fetch_tasks(
+    db: Session = Depends(get_db),
+    user_id: Optional[int] = Depends(get_request_user_id),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    deadline_from: Optional[datetime] = Query(None, alias="from"),
+    deadline_to: Optional[datetime] = Query(None, alias="to"),
+    fields: Optional[str] = None
+):
+    """
+    List tasks ordered by deadline, one page at a time
+    The cursor for the next page is returned in the X-Next-Cursor header
+    """
+    selected_fields = None
+    if fields:
+        selected_fields = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in selected_fields if field not in TASK_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    try:
+        tasks, next_cursor = get_tasks_page(
+            db, user_id, limit=limit, cursor=cursor,
+            deadline_from=deadline_from, deadline_to=deadline_to, fields=selected_fields
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/tasks")
-async def add_task(request: Request, db: Session = Depends(get_db), user_id: Optional[int] = None):
+    # Returned as a response so FastAPI does not run the rows through
+    # jsonable_encoder; the response model only documents the shape
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return TaskJSONResponse(tasks, headers=headers)
+
+@router.post("/tasks", response_model=TaskResponse)
+async def add_task(request: Request, db: Session = Depends(get_db), user_id: Optional[int] = Depends(get_request_user_id)):
     try:
         # Get raw JSON data
         task_data = await request.json()
-        print(f"Received task data: {task_data}")
+        log_event(logger, "task.create.received", level=logging.DEBUG, sample_rate=LOG_SAMPLE_RATE, fields=sorted(task_data))
         
         # Process the task data
         result = create_task(db, task_data, user_id)
-        return result
+        return TaskJSONResponse(task_to_dict(result, TASK_FIELDS))
+    except TaskConflictError:
+        # Turned into 409 with the conflicting tasks by the app's exception handler
+        raise
     except Exception as e:
-        print(f"Error creating task: {str(e)}")
+        logger.exception("Error creating task")
         raise HTTPException(status_code=500, detail=f"Failed to create task: {str(e)}")
 
+@router.get("/tasks/conflicts")
+def fetch_conflicts(
+    db: Session = Depends(get_db),
+    user_id: Optional[int] = Depends(get_request_user_id),
+    start: Optional[datetime] = None,
+    duration: int = Query(60, ge=1),
+    exclude_id: Optional[int] = None
+):
+    """
+    With start: the scheduled tasks a task booked from start for duration
+    minutes would overlap (exclude_id leaves out the task being moved).
+    Without: every pair of the user's scheduled tasks that overlap
+    """
+    if start is not None:
+        conflicts = find_conflicts(db, user_id, start, start + timedelta(minutes=duration), exclude_id=exclude_id)
+        return TaskJSONResponse({"conflicts": [task_to_dict(task, TASK_FIELDS) for task in conflicts]})
+    pairs = find_conflicting_pairs(db, user_id)
+    return TaskJSONResponse({"pairs": [[task_to_dict(task, TASK_FIELDS) for task in pair] for pair in pairs]})
+
+@router.post("/tasks/import")
+async def import_tasks(
+    request: Request,
+    db: Session = Depends(get_db),
+    user_id: Optional[int] = Depends(get_request_user_id),
+    format: Optional[str] = None
+):
+    """
+    Bulk create tasks from an NDJSON or CSV body (format= or Content-Type)
+    The body is read as a stream and inserted in batches; rows that fail
+    validation or insertion are reported by row number and skipped
+    """
+    try:
+        fmt = detect_format(request.headers.get("content-type"), format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    imported = 0
+    failed = 0
+    errors = []
+    batch = []
+
+    def record_error(row_number, error):
+        # Insert errors of a batch come in after the validation errors of its
+        # later rows, so keep the list in row order and drop the last rows
+        nonlocal failed
+        failed += 1
+        bisect.insort(errors, (row_number, error))
+        if len(errors) > MAX_IMPORT_ERRORS:
+            errors.pop()
+
+    async def flush():
+        nonlocal imported
+        inserted, batch_errors = await run_in_threadpool(insert_task_batch, db, batch)
+        imported += inserted
+        for row_number, error in batch_errors:
+            record_error(row_number, error)
+        batch.clear()
+
+    async for row_number, record, error in aiter_records(request.stream(), fmt):
+        if error is None:
+            try:
+                batch.append((row_number, parse_task_record(record, user_id)))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            record_error(row_number, error)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush()
+    await flush()
+
+    return {"imported": imported, "failed": failed, "errors": [{"row": row, "error": error} for row, error in errors]}
+
+@router.get("/tasks/export")
+def export_tasks(user_id: Optional[int] = Depends(get_request_user_id), format: str = "ndjson"):
+    """Stream all tasks (optionally one user's) as NDJSON or CSV, ordered by deadline"""
+    try:
+        fmt = detect_format(requested=format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def generate():
+        # The response outlives request-scoped dependencies, so the
+        # generator owns its session
+        with session_scope() as db:
+            yield from iter_encoded(iter_tasks_for_export(db, user_id), fmt)
+
+    return StreamingResponse(
+        generate(),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="tasks.{fmt}"'}
+    )
+
+@router.post("/tasks/batch")
+def apply_batch(batch: TaskBatch, db: Session = Depends(get_db), user_id: Optional[int] = Depends(get_request_user_id)):
+    """
+    Apply many task creates, updates and deletes in one transaction
+    Either every operation is applied or none is; the response holds one
+    result per operation, in request order
+    """
+    if len(batch.operations) > MAX_BATCH_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_OPERATIONS} operations per batch")
+
+    operations = [
+        {"op": operation.op, "id": operation.id, "task": operation.task, "changes": operation.changes}
+        for operation in batch.operations
+    ]
+    try:
+        applied, results = apply_task_batch(db, operations, user_id)
+    except TaskConflictError:
+        raise
+    except Exception as e:
+        logger.exception("Error applying task batch")
+        raise HTTPException(status_code=500, detail=f"Failed to apply task batch: {str(e)}")
+
+    if not applied:
+        not_found = any(result["status"] == "not_found" for result in results)
+        return JSONResponse(status_code=404 if not_found else 400, content={"applied": False, "results": results})
+    return {"applied": True, "results": results}
+
 @router.delete("/tasks/{task_id}")
-def remove_task(task_id: int, db: Session = Depends(get_db), user_id: Optional[int] = None):
+def remove_task(task_id: int, db: Session = Depends(get_db), user_id: Optional[int] = Depends(get_request_user_id)):
     task = delete_task(db, task_id, user_id)
     if not task:
         raise HTTPException(status_code=404, detail=f"Task with ID {task_id} not found")
     return {"message": f"Task {task_id} deleted successfully"}
 
-@router.put("/tasks/{task_id}")
-async def update_task_endpoint(task_id: int, request: Request, db: Session = Depends(get_db), user_id: Optional[int] = None):
+@router.put("/tasks/{task_id}", response_model=TaskResponse)
+async def update_task_endpoint(task_id: int, request: Request, db: Session = Depends(get_db), user_id: Optional[int] = Depends(get_request_user_id)):
     try:
         # Get raw JSON data
         task_data = await request.json()
-        print(f"Received updated task data: {task_data}")
+        log_event(logger, "task.update.received", level=logging.DEBUG, sample_rate=LOG_SAMPLE_RATE, task_id=task_id, fields=sorted(task_data))
         
         # Process the task data
         result = update_task(db, task_id, task_data, user_id)
         if not result:
             raise HTTPException(status_code=404, detail=f"Task with ID {task_id} not found")
-        return result
+        return TaskJSONResponse(task_to_dict(result, TASK_FIELDS))
+    except TaskConflictError:
+        raise
     except Exception as e:
-        print(f"Error updating task: {str(e)}")
+        logger.exception("Error updating task")
         raise HTTPException(status_code=500, detail=f"Failed to update task: {str(e)}")
 
+@router.get("/recurrences")
+def fetch_recurrences(db: Session = Depends(get_db), user_id: Optional[int] = Depends(get_request_user_id)):
+    return [recurrence_result(recurrence) for recurrence in get_recurrences(db, user_id)]
+
+@router.post("/recurrences")
+def add_recurrence(recurrence: RecurrenceCreate, db: Session = Depends(get_db), user_id: Optional[int] = Depends(get_request_user_id)):
+    """
+    Store a recurring task once; its occurrences are expanded on read by
+    GET /tasks, the free-slot search and the chat
+    """
+    try:
+        dump = getattr(recurrence, "model_dump", None) or recurrence.dict
+        return recurrence_result(create_recurrence(db, dump(), user_id))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/recurrences/{recurrence_id}")
+def remove_recurrence(recurrence_id: int, db: Session = Depends(get_db), user_id: Optional[int] = Depends(get_request_user_id)):
+    if not delete_recurrence(db, recurrence_id, user_id):
+        raise HTTPException(status_code=404, detail=f"Recurring task with ID {recurrence_id} not found")
+    return {"message": f"Recurring task {recurrence_id} deleted successfully"}
+
+@router.post("/recurrences/{recurrence_id}/exceptions")
+def skip_occurrence(
+    recurrence_id: int,
+    exception: RecurrenceException,
+    db: Session = Depends(get_db),
+    user_id: Optional[int] = Depends(get_request_user_id)
+):
+    """Skip one occurrence; to move it, create a regular task in its place"""
+    try:
+        recurrence = add_recurrence_exception(db, recurrence_id, exception.occurrence, user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not recurrence:
+        raise HTTPException(status_code=404, detail=f"Recurring task with ID {recurrence_id} not found")
+    return recurrence_result(recurrence)
+
 # AI Task Suggestion Route
 @router.get("/suggest-task")
-def get_ai_task_suggestion():
-    return {"suggested_task": suggest_task()}
+def get_ai_task_suggestion(
+    min_minutes: Optional[int] = Query(None, ge=1),
+    user_id: Optional[int] = Depends(get_request_user_id)
+):
+    return {"suggested_task": suggest_task(user_id, min_minutes=min_minutes)}
 
 # Chat Endpoint
 @router.post("/chat")
-async def chat(chat_message: ChatMessage):
+async def chat(
+    chat_message: ChatMessage,
+    session: AsyncSession = Depends(get_async_db),
+    claims: Optional[dict] = Depends(get_token_claims)
+):
+    user_id = resolve_user_id(claims, chat_message.user_id)
     try:
-        # Pass user_id to filter tasks by the current user
-        response = chat_with_ai(chat_message.message, chat_message.user_id)
+        # Pass user_id to filter tasks by the current user; the whole turn
+        # runs on the injected session
+        response = await achat_with_ai(chat_message.message, user_id, session=session)
         return {"response": response}
+    except LLMGatewayError:
+        # Turned into 503/504 with Retry-After by the app's exception handler
+        raise
     except Exception as e:
-        print(f"Error in chat: {str(e)}")
+        logger.exception("Error in chat")
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
+
+def _sse_event(event, data):
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Streaming Chat Endpoint (server-sent events)
+@router.post("/chat/stream")
+async def chat_stream(chat_message: ChatMessage, claims: Optional[dict] = Depends(get_token_claims)):
+    started = time.perf_counter()
+    user_id = resolve_user_id(claims, chat_message.user_id)
+
+    async def event_stream():
+        first_chunk = True
+        try:
+            async for event, text in astream_chat_with_ai(chat_message.message, user_id):
+                if first_chunk:
+                    CHAT_STREAM_TTFB.observe(time.perf_counter() - started)
+                    first_chunk = False
+                yield _sse_event(event, {"text": text})
+            yield _sse_event("done", {})
+        except LLMGatewayError as e:
+            # Headers are already sent, so overload is reported in the stream
+            yield _sse_event("error", {"detail": str(e), "status": e.status_code, "retry_after": e.retry_after})
+        except Exception as e:
+            logger.exception("Error in chat stream")
+            yield _sse_event("error", {"detail": f"Chat error: {str(e)}"})
+        finally:
+            CHAT_STREAM_DURATION.observe(time.perf_counter() - started)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,7 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlalchemy.orm import Session
-from database import get_db
-from auth import get_user_by_username, get_user_by_email, create_user, verify_password
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, release_connection
+from auth import (
+    add_user,
+    ahash_password,
+    averify_and_rehash,
+    find_registration_conflict,
+    get_user_by_username,
+    update_password_hash
+)
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from services.tokens import InvalidTokenError, create_access_token, revoke_access_token
 from pydantic import BaseModel, EmailStr, validator
 from typing import Optional
 
@@ -42,37 +52,66 @@ class UserResponse(BaseModel):
         orm_mode = True
 
 @router.post("/register", response_model=UserResponse)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, session: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
-    # Check if username already exists
-    db_user = get_user_by_username(db, username=user.username)
-    if db_user:
+    # Check if username or email already exists, in one query
+    conflict = await session.run_sync(
+        lambda db: find_registration_conflict(db, username=user.username, email=user.email)
+    )
+    if conflict == "username":
         raise HTTPException(status_code=400, detail="Username already registered")
-    
-    # Check if email already exists (now required)
-    db_user = get_user_by_email(db, email=user.email)
-    if db_user:
+    if conflict == "email":
         raise HTTPException(status_code=400, detail="Email already registered")
-    
-    # Create new user
-    return create_user(db=db, username=user.username, password=user.password, email=user.email)
+
+    # bcrypt runs in the worker pool, off the event loop
+    hashed_password = await ahash_password(user.password)
+    try:
+        return await session.run_sync(
+            lambda db: add_user(db, username=user.username, hashed_password=hashed_password, email=user.email)
+        )
+    except IntegrityError:
+        # Registered concurrently since the check above
+        await session.rollback()
+        raise HTTPException(status_code=400, detail="Username or email already registered")
 
 @router.post("/login")
-def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, session: AsyncSession = Depends(get_async_db)):
     """Login a user and return basic information"""
     # Get user from database
-    user = get_user_by_username(db, username=user_data.username)
-    
+    user = await session.run_sync(lambda db: get_user_by_username(db, username=user_data.username))
+    # Don't hold a pooled connection while bcrypt runs
+    await session.run_sync(release_connection)
+
     # Check if user exists and password is correct
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    verified, new_hash = (False, None)
+    if user:
+        verified, new_hash = await averify_and_rehash(user_data.password, user.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
         )
-    
-    # In a real application, you would generate a token here
+
+    # The hash used outdated settings (e.g. a lower BCRYPT_ROUNDS): store the upgrade
+    if new_hash:
+        await session.run_sync(lambda db: update_password_hash(db, user.id, new_hash))
+
+    # Routes accept the token instead of a user_id parameter
+    access_token, expires_in = create_access_token(user.id)
     return {
         "id": user.id,
         "username": user.username,
-        "email": user.email
+        "email": user.email,
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": expires_in
     }
+
+@router.post("/logout")
+async def logout(credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())):
+    """Revoke the bearer token of the request"""
+    try:
+        revoke_access_token(credentials.credentials)
+    except InvalidTokenError as e:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+    return {"message": "Logged out"}
@@ -0,0 +1,99 @@
+"""
+Bounded in-process cache with LRU eviction and a per-entry time-to-live.
+
+By default values are deep-copied on the way in and out, so callers can
+mutate what they get back (the chat pipeline adds user_id and
+uncertain_fields to extraction results) without corrupting the cached copy.
+Caches of immutable values can turn copying off.
+"""
+from collections import OrderedDict
+import copy
+import threading
+import time
+
+from services.metrics import Counter, Gauge
+
+CACHE_HITS = Counter("cache_hits_total", "Cache lookups that returned a value", ("cache",))
+CACHE_MISSES = Counter("cache_misses_total", "Cache lookups that found nothing", ("cache",))
+
+def _hit_ratios():
+    """Hit ratio of every cache looked up so far, since startup"""
+    hits = CACHE_HITS.samples()
+    misses = CACHE_MISSES.samples()
+    return {
+        key: hits.get(key, 0) / (hits.get(key, 0) + misses.get(key, 0))
+        for key in set(hits) | set(misses)
+    }
+
+CACHE_HIT_RATIO = Gauge("cache_hit_ratio", "Share of cache lookups that returned a value", ("cache",), callback=_hit_ratios)
+
+_MISSING = object()
+
+class TTLCache:
+    """LRU cache whose entries also expire `ttl` seconds after being stored"""
+
+    def __init__(self, name, maxsize=1024, ttl=600.0, clock=time.monotonic, copy_values=True):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.copy_values = copy_values
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Return a copy of the cached value, or default if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] <= self._clock():
+                del self._data[key]
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                CACHE_MISSES.inc(cache=self.name)
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            CACHE_HITS.inc(cache=self.name)
+            value = entry[1]
+        return copy.deepcopy(value) if self.copy_values else value
+
+    def peek(self, key, default=None):
+        """Like get, but without touching LRU order or hit/miss counters"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] <= self._clock():
+                return default
+            value = entry[1]
+        return copy.deepcopy(value) if self.copy_values else value
+
+    def set(self, key, value):
+        """Store a copy of value, evicting the least recently used entries"""
+        if self.copy_values:
+            value = copy.deepcopy(value)
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        """Return hit/miss counters and the current hit ratio"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,370 @@
+"""
+Gateway in front of the chat model.
+
+Every model call in services.task_ai goes through LLMGateway, which
+- admits at most LLM_MAX_IN_FLIGHT calls at once, and at most
+  LLM_MAX_IN_FLIGHT_PER_USER for any one user
+- queues the rest in two priority lanes: waiting interactive calls (chat)
+  are always admitted before background ones (suggestions), and background
+  calls never hold more than LLM_BACKGROUND_MAX_IN_FLIGHT slots, so a burst
+  of them cannot starve chat
+- sheds load instead of piling up: when a lane's queue is full, or a call
+  waits longer than LLM_QUEUE_TIMEOUT_SECONDS for a slot, it fails at once
+  with LLMOverloadedError, which the app turns into 503 + Retry-After
+- gives each call a deadline of LLM_TIMEOUT_SECONDS covering the wait, the
+  call and any retries; the remaining time is passed to the provider client
+- retries transient provider errors (timeouts, connection errors, rate
+  limits, 5xx) up to LLM_MAX_RETRIES times with fully jittered exponential
+  backoff
+
+Sync callers (route handlers in the threadpool) and async ones share the
+same limits.
+"""
+import asyncio
+from collections import deque
+import os
+import random
+import threading
+import time
+
+from services.metrics import Counter, Gauge, Histogram
+
+try:
+    import openai
+    _PROVIDER_TRANSIENT_ERRORS = (
+        openai.APIConnectionError,  # includes APITimeoutError
+        openai.RateLimitError,
+        openai.InternalServerError
+    )
+    _PROVIDER_TIMEOUT_ERRORS = (openai.APITimeoutError,)
+except ImportError:
+    _PROVIDER_TRANSIENT_ERRORS = ()
+    _PROVIDER_TIMEOUT_ERRORS = ()
+
+TIMEOUT_ERRORS = (TimeoutError, asyncio.TimeoutError) + _PROVIDER_TIMEOUT_ERRORS
+TRANSIENT_ERRORS = TIMEOUT_ERRORS + (ConnectionError,) + _PROVIDER_TRANSIENT_ERRORS
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+# Admission order
+LANES = (INTERACTIVE, BACKGROUND)
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BACKOFF_SECONDS = float(os.getenv("LLM_RETRY_BACKOFF_SECONDS", "0.5"))
+LLM_RETRY_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_RETRY_BACKOFF_MAX_SECONDS", "4"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "32"))
+LLM_MAX_IN_FLIGHT_PER_USER = int(os.getenv("LLM_MAX_IN_FLIGHT_PER_USER", "4"))
+LLM_BACKGROUND_MAX_IN_FLIGHT = int(os.getenv("LLM_BACKGROUND_MAX_IN_FLIGHT", "8"))
+LLM_INTERACTIVE_QUEUE = int(os.getenv("LLM_INTERACTIVE_QUEUE", "64"))
+LLM_BACKGROUND_QUEUE = int(os.getenv("LLM_BACKGROUND_QUEUE", "16"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "5"))
+LLM_RETRY_AFTER_SECONDS = int(os.getenv("LLM_RETRY_AFTER_SECONDS", "2"))
+
+LLM_SHED = Counter("llm_gateway_shed_total", "Model calls rejected by the gateway", ("lane", "reason"))
+LLM_RETRIES = Counter("llm_gateway_retries_total", "Model calls retried after a transient error", ("stage",))
+LLM_QUEUE_WAIT = Histogram("llm_gateway_queue_wait_seconds", "Time model calls waited for a gateway slot", ("lane",))
+
+class LLMGatewayError(Exception):
+    """A model call the gateway refused or gave up on"""
+    status_code = 503
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class LLMOverloadedError(LLMGatewayError):
+    """No capacity for the call; the client should retry after `retry_after` seconds"""
+    status_code = 503
+
+class LLMDeadlineExceeded(LLMGatewayError):
+    """The call, with its retries, did not finish before its deadline"""
+    status_code = 504
+
+class _Waiter:
+    """A call queued for a slot; woken from whichever thread frees one"""
+
+    def __init__(self, lane, user_id, loop=None):
+        self.lane = lane
+        self.user_id = user_id
+        self.granted = False
+        self._loop = loop
+        if loop is None:
+            self._event = threading.Event()
+        else:
+            self._future = loop.create_future()
+
+    def wake(self):
+        # Called with the gateway lock held
+        self.granted = True
+        if self._loop is None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self._future.done():
+            self._future.set_result(None)
+
+class LLMGateway:
+    """Admission control, deadlines and retries for model calls"""
+
+    def __init__(
+        self,
+        max_in_flight=LLM_MAX_IN_FLIGHT,
+        max_in_flight_per_user=LLM_MAX_IN_FLIGHT_PER_USER,
+        background_max_in_flight=LLM_BACKGROUND_MAX_IN_FLIGHT,
+        max_queue=None,
+        queue_timeout=LLM_QUEUE_TIMEOUT_SECONDS,
+        timeout=LLM_TIMEOUT_SECONDS,
+        max_retries=LLM_MAX_RETRIES,
+        backoff=LLM_RETRY_BACKOFF_SECONDS,
+        backoff_max=LLM_RETRY_BACKOFF_MAX_SECONDS,
+        retry_after=LLM_RETRY_AFTER_SECONDS,
+        clock=time.monotonic
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_user = max_in_flight_per_user
+        self.background_max_in_flight = background_max_in_flight
+        self.max_queue = max_queue or {INTERACTIVE: LLM_INTERACTIVE_QUEUE, BACKGROUND: LLM_BACKGROUND_QUEUE}
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.retry_after = retry_after
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._lane_in_flight = {lane: 0 for lane in LANES}
+        self._user_in_flight = {}
+        self._queues = {lane: deque() for lane in LANES}
+
+    # Admission
+
+    def _can_admit(self, lane, user_id):
+        if self._in_flight >= self.max_in_flight:
+            return False
+        if lane == BACKGROUND and self._lane_in_flight[BACKGROUND] >= self.background_max_in_flight:
+            return False
+        if user_id is not None and self._user_in_flight.get(user_id, 0) >= self.max_in_flight_per_user:
+            return False
+        return True
+
+    def _dispatch(self):
+        """Hand free slots to queued calls, interactive lane first (lock held)"""
+        for lane in LANES:
+            queue = self._queues[lane]
+            for waiter in list(queue):
+                if self._in_flight >= self.max_in_flight:
+                    return
+                if self._can_admit(lane, waiter.user_id):
+                    queue.remove(waiter)
+                    self._in_flight += 1
+                    self._lane_in_flight[lane] += 1
+                    if waiter.user_id is not None:
+                        self._user_in_flight[waiter.user_id] = self._user_in_flight.get(waiter.user_id, 0) + 1
+                    waiter.wake()
+
+    def _queue(self, lane, user_id, loop=None):
+        """Queue a waiter and admit what fits; shed when the lane's queue is full"""
+        with self._lock:
+            waiter = _Waiter(lane, user_id, loop)
+            self._queues[lane].append(waiter)
+            self._dispatch()
+            if not waiter.granted and len(self._queues[lane]) > self.max_queue[lane]:
+                self._queues[lane].remove(waiter)
+                LLM_SHED.inc(lane=lane, reason="queue_full")
+                raise LLMOverloadedError(f"LLM {lane} queue is full", retry_after=self.retry_after)
+            return waiter
+
+    def _abandon(self, waiter):
+        """
+        Give up waiting; returns True if the slot was granted meanwhile, in
+        which case the caller owns it
+        """
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._queues[waiter.lane].remove(waiter)
+            return False
+
+    def _wait_timeout(self, deadline):
+        return max(0.0, min(self.queue_timeout, deadline - self._clock()))
+
+    def _shed_after_wait(self, lane):
+        LLM_SHED.inc(lane=lane, reason="queue_timeout")
+        return LLMOverloadedError(f"Timed out waiting for an LLM {lane} slot", retry_after=self.retry_after)
+
+    def _enter(self, lane, user_id, deadline):
+        started = self._clock()
+        waiter = self._queue(lane, user_id)
+        if not waiter.granted:
+            waiter._event.wait(self._wait_timeout(deadline))
+            if not waiter.granted and not self._abandon(waiter):
+                raise self._shed_after_wait(lane)
+        LLM_QUEUE_WAIT.observe(self._clock() - started, lane=lane)
+
+    async def _aenter(self, lane, user_id, deadline):
+        started = self._clock()
+        waiter = self._queue(lane, user_id, asyncio.get_running_loop())
+        if not waiter.granted:
+            try:
+                await asyncio.wait_for(waiter._future, self._wait_timeout(deadline))
+            except asyncio.TimeoutError:
+                if not self._abandon(waiter):
+                    raise self._shed_after_wait(lane)
+            except asyncio.CancelledError:
+                if self._abandon(waiter):
+                    self._leave(lane, user_id)
+                raise
+        LLM_QUEUE_WAIT.observe(self._clock() - started, lane=lane)
+
+    def _leave(self, lane, user_id):
+        with self._lock:
+            self._in_flight -= 1
+            self._lane_in_flight[lane] -= 1
+            if user_id is not None:
+                remaining = self._user_in_flight[user_id] - 1
+                if remaining:
+                    self._user_in_flight[user_id] = remaining
+                else:
+                    del self._user_in_flight[user_id]
+            self._dispatch()
+
+    # Retries
+
+    def _next_delay(self, error, attempt, deadline, stage):
+        """
+        Backoff before retrying after `error`, or None when it should be
+        raised: not transient, out of retries, or past the deadline
+        """
+        if not isinstance(error, TRANSIENT_ERRORS) or attempt >= self.max_retries:
+            return None
+        # Full jitter: anywhere between 0 and the exponential bound
+        delay = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+        if self._clock() + delay >= deadline:
+            return None
+        LLM_RETRIES.inc(stage=stage)
+        return delay
+
+    def _give_up(self, error):
+        """The error to raise once retrying is over; timeouts become LLMDeadlineExceeded"""
+        if isinstance(error, TIMEOUT_ERRORS):
+            return LLMDeadlineExceeded(f"LLM call did not finish within {self.timeout:g}s")
+        return error
+
+    def _remaining(self, deadline):
+        remaining = deadline - self._clock()
+        if remaining <= 0:
+            raise LLMDeadlineExceeded(f"LLM call did not finish within {self.timeout:g}s")
+        return remaining
+
+    # Calls
+
+    def invoke(self, model, messages, stage, lane=INTERACTIVE, user_id=None):
+        """Call model.invoke through the gateway, blocking the calling thread"""
+        deadline = self._clock() + self.timeout
+        self._enter(lane, user_id, deadline)
+        try:
+            attempt = 0
+            while True:
+                try:
+                    return model.invoke(messages, timeout=self._remaining(deadline))
+                except LLMGatewayError:
+                    raise
+                except Exception as e:
+                    delay = self._next_delay(e, attempt, deadline, stage)
+                    if delay is None:
+                        error = self._give_up(e)
+                        if error is e:
+                            raise
+                        raise error from e
+                    time.sleep(delay)
+                    attempt += 1
+        finally:
+            self._leave(lane, user_id)
+
+    async def ainvoke(self, model, messages, stage, lane=INTERACTIVE, user_id=None):
+        """Async variant of invoke"""
+        deadline = self._clock() + self.timeout
+        await self._aenter(lane, user_id, deadline)
+        try:
+            attempt = 0
+            while True:
+                try:
+                    remaining = self._remaining(deadline)
+                    return await asyncio.wait_for(model.ainvoke(messages, timeout=remaining), remaining)
+                except LLMGatewayError:
+                    raise
+                except Exception as e:
+                    delay = self._next_delay(e, attempt, deadline, stage)
+                    if delay is None:
+                        error = self._give_up(e)
+                        if error is e:
+                            raise
+                        raise error from e
+                    await asyncio.sleep(delay)
+                    attempt += 1
+        finally:
+            self._leave(lane, user_id)
+
+    async def astream(self, model, messages, stage, lane=INTERACTIVE, user_id=None):
+        """
+        Stream from model.astream through the gateway
+        The deadline and retries apply until the first chunk; after that each
+        chunk must arrive within the call timeout
+        """
+        deadline = self._clock() + self.timeout
+        await self._aenter(lane, user_id, deadline)
+        chunks = None
+        try:
+            attempt = 0
+            while True:
+                remaining = self._remaining(deadline)
+                chunks = model.astream(messages, timeout=remaining).__aiter__()
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), remaining)
+                    break
+                except StopAsyncIteration:
+                    return
+                except Exception as e:
+                    delay = self._next_delay(e, attempt, deadline, stage)
+                    if delay is None:
+                        error = self._give_up(e)
+                        if error is e:
+                            raise
+                        raise error from e
+                    await asyncio.sleep(delay)
+                    attempt += 1
+
+            while True:
+                yield chunk
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError as e:
+                    raise LLMDeadlineExceeded(f"LLM stream stalled for {self.timeout:g}s") from e
+        finally:
+            if chunks is not None and hasattr(chunks, "aclose"):
+                await chunks.aclose()
+            self._leave(lane, user_id)
+
+    def stats(self):
+        """Current in-flight and queued calls per lane"""
+        with self._lock:
+            return {
+                lane: {"in_flight": self._lane_in_flight[lane], "queued": len(self._queues[lane])}
+                for lane in LANES
+            }
+
+gateway = LLMGateway()
+
+def _lane_gauge(field):
+    def collect():
+        return {(lane,): values[field] for lane, values in gateway.stats().items()}
+    return collect
+
+LLM_IN_FLIGHT = Gauge("llm_gateway_in_flight", "Model calls holding a gateway slot", ("lane",), callback=_lane_gauge("in_flight"))
+LLM_QUEUED = Gauge("llm_gateway_queued", "Model calls waiting for a gateway slot", ("lane",), callback=_lane_gauge("queued"))
@@ -0,0 +1,82 @@
+"""
+Answer schemas for the model calls in services.task_ai.
+
+Each extractor binds its schema as the one tool the model must call, so the
+provider returns arguments shaped by the schema instead of free-form JSON
+described in the prompt. The tool definition is sent with every call and
+counts as prompt tokens, so descriptions are kept short and the generated
+JSON schema is compacted.
+"""
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+Priority = Literal["Low", "Normal", "High"]
+UncertainField = Literal["priority", "end_time", "duration", "description", "date"]
+
+def _compact_schema(schema):
+    """
+    Drop the generated field titles and null defaults, and show Optional[X]
+    as X; the model title stays, it names the tool
+    """
+    for field in schema.get("properties", {}).values():
+        field.pop("title", None)
+        options = field.pop("anyOf", None)
+        if options is not None:
+            field.update(next(option for option in options if option != {"type": "null"}))
+        if "default" in field and field["default"] is None:
+            del field["default"]
+
+class Answer(BaseModel):
+    """Base for the answer schemas"""
+    model_config = ConfigDict(json_schema_extra=_compact_schema)
+
+class TaskDetails(Answer):
+    """A task to create"""
+    title: str
+    description: Optional[str] = None
+    priority: Optional[Priority] = None
+    date: Optional[str] = Field(None, description="YYYY-MM-DD")
+    start_time: Optional[str] = Field(None, description="HH:MM, 24h")
+    end_time: Optional[str] = Field(None, description="HH:MM, 24h")
+    is_due_date: bool = Field(False, description="true if only a deadline, not a time slot")
+    uncertain_fields: List[UncertainField] = Field([], description="fields not stated explicitly")
+
+class ExtractedTask(TaskDetails):
+    """The task described by the message, if any"""
+    is_task: bool
+    title: Optional[str] = None
+
+class TaskIdentifiers(Answer):
+    """Words that identify an existing task"""
+    title_keywords: List[str] = []
+    date_reference: Optional[str] = Field(None, description="YYYY-MM-DD, or e.g. tomorrow")
+    time_reference: Optional[str] = Field(None, description="HH:MM, or e.g. morning")
+    other_descriptors: List[str] = []
+
+class TaskChanges(Answer):
+    """New values for the properties to change; leave the rest out"""
+    title: Optional[str] = None
+    description: Optional[str] = None
+    priority: Optional[Priority] = None
+    deadline: Optional[str] = Field(None, description="YYYY-MM-DD HH:MM")
+    duration: Optional[int] = Field(None, description="minutes")
+    is_due_date: Optional[bool] = None
+
+class EditRequest(Answer):
+    """Which task to edit and how"""
+    is_edit_request: bool
+    task_identifiers: Optional[TaskIdentifiers] = None
+    changes: Optional[TaskChanges] = None
+
+class DeleteRequest(Answer):
+    """Which task to delete"""
+    is_delete_request: bool
+    task_identifiers: Optional[TaskIdentifiers] = None
+
+class ClassifiedMessage(Answer):
+    """The message's intent and the fields its handler needs"""
+    intent: Literal["create", "edit", "delete", "none"]
+    task: Optional[TaskDetails] = Field(None, description="for create")
+    task_identifiers: Optional[TaskIdentifiers] = Field(None, description="for edit and delete")
+    changes: Optional[TaskChanges] = Field(None, description="for edit")
@@ -0,0 +1,133 @@
+"""
+Structured, queue-backed logging.
+
+Log calls only build a record and put it on an in-memory queue; a background
+listener thread formats the records (JSON lines by default) and writes them,
+so request handlers never block on stdout. Every record carries the ID of the
+request being served, taken from a context variable set by
+middleware.RequestContextMiddleware.
+
+High-volume events go through log_event() with a sample rate, so only a
+fraction of them is kept. SQL statements are not logged unless SQL_ECHO is
+set, or a request carries the SQL debug header (see database.py).
+
+Settings:
+    LOG_LEVEL        minimum level, default INFO
+    LOG_FORMAT       "json" (default) or "text"
+    LOG_SAMPLE_RATE  share of high-volume events kept, default 0.1
+    SQL_ECHO         log every SQL statement, default off
+"""
+import atexit
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import os
+import queue
+import random
+import sys
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+SQL_ECHO = os.getenv("SQL_ECHO", "0").lower() in ("1", "true", "yes")
+
+request_id_var = ContextVar("request_id", default=None)
+sql_debug_var = ContextVar("sql_debug", default=False)
+
+_listener = None
+
+def get_logger(name):
+    """Return a logger under the app's "scheduler" namespace"""
+    return logging.getLogger(f"scheduler.{name}")
+
+def log_event(logger, event, level=logging.INFO, sample_rate=1.0, **fields):
+    """
+    Log a structured event with key/value fields
+    With sample_rate < 1 only that share of calls is kept, and the rate is
+    recorded so counts can be scaled back up
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if sample_rate < 1.0:
+        if random.random() >= sample_rate:
+            return
+        fields["sample_rate"] = sample_rate
+    logger.log(level, event, extra={"fields": fields})
+
+class _RequestContextFilter(logging.Filter):
+    """Stamp records with the current request ID in the thread that logs them"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+class _DeferredFormatQueueHandler(QueueHandler):
+    """Queue records unformatted; formatting happens on the listener thread"""
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development"""
+
+    def format(self, record):
+        line = f"{self.formatTime(record)} {record.levelname:<7} {record.name}"
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            line += f" [{request_id}]"
+        line += f" {record.getMessage()}"
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+def setup_logging(stream=None):
+    """Route the root logger through a queue to a background writer (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    handler = _DeferredFormatQueueHandler(log_queue)
+    handler.addFilter(_RequestContextFilter())
+
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    # SQLAlchemy logs statements through "sqlalchemy.engine" at INFO
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO if SQL_ECHO else logging.WARNING)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,160 @@
+"""
+In-process metrics primitives.
+
+Counters and histograms are thread-safe and keyed by label values, so they
+can be shared by sync route handlers running in the threadpool and by the
+async request paths. render_prometheus() writes every registered metric in
+the Prometheus text format for the /metrics endpoint.
+"""
+import math
+import threading
+
+# Latency buckets in seconds, tuned for API and LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REGISTRY = []
+
+def _label_key(labelnames, labels):
+    """Order label values by the metric's label names"""
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+class Counter:
+    """A monotonically increasing count, optionally split by labels"""
+
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        """Return a copy of {label values: count}"""
+        with self._lock:
+            return dict(self._values)
+
+class Histogram:
+    """Bucketed observations with a running count and sum per label set"""
+
+    def __init__(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0}
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+            state["count"] += 1
+            state["sum"] += value
+
+    def summary(self, **labels):
+        """Return count, sum and mean for one label set"""
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if not state:
+                return {"count": 0, "sum": 0.0, "mean": 0.0}
+            return {
+                "count": state["count"],
+                "sum": state["sum"],
+                "mean": state["sum"] / state["count"]
+            }
+
+    def samples(self):
+        """Return a copy of {label values: {buckets, count, sum}}"""
+        with self._lock:
+            return {
+                key: {"buckets": list(state["buckets"]), "count": state["count"], "sum": state["sum"]}
+                for key, state in self._values.items()
+            }
+
+class Gauge:
+    """
+    A value that can go up and down, optionally split by labels
+    With a callback the values are computed at scrape time instead: it
+    returns {label values tuple: value}
+    """
+
+    def __init__(self, name, description, labelnames=(), callback=None):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        """Return a copy of {label values: value}"""
+        if self.callback is not None:
+            return dict(self.callback())
+        with self._lock:
+            return dict(self._values)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_METRIC_TYPES = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}
+
+def _escape(value, quotes=True):
+    value = str(value).replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quotes else value
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _number(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if math.isnan(value):
+            return "NaN"
+    return repr(value) if isinstance(value, float) else str(value)
+
+def render_prometheus(registry=None):
+    """Render the registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in registry if registry is not None else REGISTRY:
+        lines.append(f"# HELP {metric.name} {_escape(metric.description, quotes=False)}")
+        lines.append(f"# TYPE {metric.name} {_METRIC_TYPES[type(metric)]}")
+        for key, value in sorted(metric.samples().items()):
+            if isinstance(metric, Histogram):
+                # observe() counts a value in every bucket it fits, so the
+                # buckets are already cumulative as Prometheus expects
+                for bound, count in zip(metric.buckets, value["buckets"]):
+                    lines.append(f"{metric.name}_bucket{_labels(metric.labelnames, key, [('le', _number(float(bound)))])} {count}")
+                lines.append(f"{metric.name}_bucket{_labels(metric.labelnames, key, [('le', '+Inf')])} {value['count']}")
+                lines.append(f"{metric.name}_sum{_labels(metric.labelnames, key)} {_number(value['sum'])}")
+                lines.append(f"{metric.name}_count{_labels(metric.labelnames, key)} {value['count']}")
+            else:
+                lines.append(f"{metric.name}{_labels(metric.labelnames, key)} {_number(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,99 @@
+"""
+Prompt templates for the model calls in services.task_ai.
+
+Providers cache the longest prompt prefix they have recently seen (OpenAI
+from 1024 tokens on, in 128-token steps), so a prompt is laid out from the
+most to the least stable part:
+
+    tool definition      fixed per stage (see services/llm_schemas.py)
+    instructions         fixed per stage, the module constants below
+    date context         changes once a day
+    task list            changes with the user's tasks
+    current time         changes every minute
+    user message
+
+Anything that varies per call must stay out of the instruction constants.
+
+Only prompts past the 1024-token minimum are cached at all. The router's
+prompt is, with a typical task list; the edit and delete extractors' prompts
+(about 800 tokens with 25 tasks) are not, so they gain nothing from the
+layout until a long task list pushes them over. Padding them to reach the
+minimum would cost more tokens than the cache saves.
+"""
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+EXTRACT_TASK_INSTRUCTIONS = """You are an AI assistant that extracts task information from user messages.
+
+Give the task a concise title. Priority defaults to Normal; use TODAY'S DATE
+if only a time is mentioned.
+
+If the message doesn't contain a task, set is_task to false."""
+
+EDIT_REQUEST_INSTRUCTIONS = """You are an AI assistant that extracts task editing information from user messages.
+
+Identify which task the user wants to edit, among CURRENT TASKS, and only the
+properties to change.
+
+If the message isn't asking to edit a task, set is_edit_request to false."""
+
+DELETE_REQUEST_INSTRUCTIONS = """You are an AI assistant that extracts task deletion information from user messages.
+
+Identify which task the user wants to delete, among CURRENT TASKS. The user
+may use phrases like "remove", "delete", "cancel", "get rid of", or similar to
+indicate they want to delete a task.
+
+If the message isn't asking to delete a task, set is_delete_request to false."""
+
+CLASSIFY_INSTRUCTIONS = """You are an AI assistant that classifies scheduling messages and extracts task information from them.
+
+Decide which ONE of these intents the message has:
+- "delete": the user wants to remove, delete, cancel or get rid of an existing task
+- "edit": the user wants to change an existing task (reschedule, rename, reprioritize, etc.)
+- "create": the user wants to add a new task
+- "none": anything else (questions, small talk, advice)
+
+For "create", use TODAY'S DATE if only a time is mentioned.
+For "edit" and "delete", identify the task among CURRENT TASKS.
+Leave out the sections that do not apply to the intent."""
+
+SUGGEST_TASK_INSTRUCTIONS = """You are a helpful assistant that suggests tasks based on deadlines and priorities.
+
+Suggest one productive task for the free time the user describes, taking
+their CURRENT TASKS into account."""
+
+_DATE_CONTEXT_TEMPLATE = """CURRENT DATE INFORMATION:
+TODAY'S DATE: {today:%Y-%m-%d} ({today:%A, %B %d, %Y})
+TOMORROW'S DATE: {tomorrow:%Y-%m-%d} ({tomorrow:%A, %B %d, %Y})
+NEXT WEEK STARTS: {next_week:%Y-%m-%d} ({next_week:%A, %B %d, %Y})
+
+When interpreting dates:
+- "Today" means {today:%Y-%m-%d} ({today:%A, %B %d})
+- "Tomorrow" means {tomorrow:%Y-%m-%d} ({tomorrow:%A, %B %d})
+- "Next week" means starting {next_week:%Y-%m-%d} ({next_week:%A, %B %d})
+- Always use the full year {today.year} in dates"""
+
+@lru_cache(maxsize=4)
+def date_context(today):
+    """The CURRENT DATE INFORMATION block for `today` (a date)"""
+    return _DATE_CONTEXT_TEMPLATE.format(
+        today=today,
+        tomorrow=today + timedelta(days=1),
+        next_week=today + timedelta(days=7)
+    )
+
+def build_messages(instructions, message, task_summary=None, now=None):
+    """
+    Build the messages for a model call: the static instructions, then the
+    per-call context in order of stability, then the user's message
+    """
+    now = now or datetime.now()
+    context = [date_context(now.date())]
+    if task_summary is not None:
+        context.append(f"CURRENT TASKS:\n{task_summary}")
+    context.append(f"CURRENT TIME: {now:%H:%M}")
+    return [
+        ("system", instructions),
+        ("system", "\n\n".join(context)),
+        ("user", message)
+    ]
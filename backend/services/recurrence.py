@@ -0,0 +1,274 @@
+"""
+Recurring tasks, stored as rules and expanded per query window.
+
+A TaskRecurrence holds one RRULE (an RFC 5545 subset: FREQ=DAILY, WEEKLY or
+MONTHLY, with INTERVAL, BYDAY for weekly rules, and COUNT or UNTIL) plus
+EXDATE-style exceptions, instead of one Task row per occurrence. Readers
+expand only the window they show: iter_occurrences() jumps arithmetically to
+the first period of the window, so the cost depends on the window, not on how
+long the rule has been running.
+
+Occurrences are TaskRows with id None and recurrence_id set, so the task
+listing, the free-slot engine and the chat task context can mix them with
+stored tasks. A single occurrence is moved or changed by adding it as an
+exception and creating a regular task in its place.
+
+Rules are cached per (user_id, task-state version) like the task snapshot;
+recurrence writes bump the version, and single-task writes carry the cached
+rules forward to the new version.
+
+Settings:
+    RECURRENCE_CONTEXT_DAYS  days of occurrences included in the chat task context, default 7
+"""
+from datetime import datetime, timedelta
+import heapq
+from itertools import count as counter, islice
+import os
+from typing import FrozenSet, NamedTuple, Optional, Tuple
+
+from database import session_scope
+from models import TaskRecurrence
+from services.cache import TTLCache
+from services.task_state import TaskRow, add_write_listener, get_task_snapshot, get_version
+
+RECURRENCE_CONTEXT_DAYS = int(os.getenv("RECURRENCE_CONTEXT_DAYS", "7"))
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+class Rule(NamedTuple):
+    """Parsed RRULE; byday holds weekday numbers (Monday is 0)"""
+    freq: str
+    interval: int = 1
+    byday: Tuple[int, ...] = ()
+    count: Optional[int] = None
+    until: Optional[datetime] = None
+
+def _parse_until(value):
+    # RFC 5545 form (20261231T235959, 20261231) or ISO; times are local
+    value = value.rstrip("Z")
+    for fmt in ("%Y%m%dT%H%M%S", "%Y%m%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    return datetime.fromisoformat(value)
+
+def parse_rrule(text):
+    """Parse an RRULE string, with or without the "RRULE:" prefix; raises ValueError"""
+    text = text.strip()
+    if text.upper().startswith("RRULE:"):
+        text = text[len("RRULE:"):]
+    parts = {}
+    for part in filter(None, text.split(";")):
+        name, _, value = part.partition("=")
+        if not value.strip():
+            raise ValueError(f"Malformed RRULE part: {part}")
+        parts[name.strip().upper()] = value.strip()
+
+    unknown = set(parts) - {"FREQ", "INTERVAL", "BYDAY", "COUNT", "UNTIL"}
+    if unknown:
+        raise ValueError(f"Unsupported RRULE parts: {', '.join(sorted(unknown))}")
+    freq = parts.get("FREQ", "").upper()
+    if freq not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+    try:
+        interval = int(parts.get("INTERVAL", "1"))
+        count = int(parts["COUNT"]) if "COUNT" in parts else None
+        until = _parse_until(parts["UNTIL"]) if "UNTIL" in parts else None
+    except ValueError:
+        raise ValueError("INTERVAL and COUNT must be integers and UNTIL a date")
+    if interval < 1 or (count is not None and count < 1):
+        raise ValueError("INTERVAL and COUNT must be positive")
+    if count is not None and until is not None:
+        raise ValueError("COUNT and UNTIL cannot both be set")
+
+    byday = ()
+    if "BYDAY" in parts:
+        if freq != "WEEKLY":
+            raise ValueError("BYDAY is only supported for WEEKLY rules")
+        days = [day.strip().upper() for day in parts["BYDAY"].split(",")]
+        if not all(day in WEEKDAYS for day in days):
+            raise ValueError(f"BYDAY days must be among {','.join(WEEKDAYS)}")
+        byday = tuple(sorted({WEEKDAYS.index(day) for day in days}))
+    return Rule(freq, interval, byday, count, until)
+
+def _add_months(moment, months):
+    """`moment` moved by whole months, or None when that month lacks its day"""
+    month = moment.month - 1 + months
+    try:
+        return moment.replace(year=moment.year + month // 12, month=month % 12 + 1)
+    except ValueError:
+        return None
+
+def _candidates(rule, dtstart, start=None):
+    """
+    Occurrence starts of `rule` from the period that holds `start` on,
+    ignoring COUNT, UNTIL and exceptions
+    Returns (occurrences before the first candidate, iterator of candidates)
+    """
+    if rule.freq == "DAILY":
+        step = timedelta(days=rule.interval)
+        first = 0
+        if start is not None and start > dtstart:
+            first = -((dtstart - start) // step)
+        return first, (dtstart + step * period for period in counter(first))
+
+    if rule.freq == "WEEKLY":
+        days = rule.byday or (dtstart.weekday(),)
+        week = dtstart - timedelta(days=dtstart.weekday())
+        step = timedelta(weeks=rule.interval)
+        first = 0
+        if start is not None and start > week:
+            first = (start - week) // step
+        # The first week only holds the days from dtstart's weekday on
+        in_first_week = sum(1 for day in days if day >= dtstart.weekday())
+        before = 0 if first == 0 else in_first_week + (first - 1) * len(days)
+        moments = (
+            week + step * period + timedelta(days=day)
+            for period in counter(first) for day in days
+        )
+        return before, (moment for moment in moments if moment >= dtstart)
+
+    # MONTHLY keeps dtstart's day of the month and skips months without it,
+    # so with COUNT the months before the window have to be walked
+    first = 0
+    if start is not None and start > dtstart and rule.count is None:
+        first = ((start.year - dtstart.year) * 12 + start.month - dtstart.month) // rule.interval
+    moments = (_add_months(dtstart, period * rule.interval) for period in counter(first))
+    return 0, (moment for moment in moments if moment is not None)
+
+def iter_occurrences(rule, dtstart, start=None, end=None, exdates=frozenset()):
+    """
+    Yield the occurrence starts of a rule within [start, end), in order
+    start or end of None leaves that side of the window open
+    """
+    number, candidates = _candidates(rule, dtstart, start)
+    for moment in candidates:
+        # COUNT counts skipped occurrences too, as in RFC 5545
+        if rule.count is not None and number >= rule.count:
+            return
+        number += 1
+        if (rule.until is not None and moment > rule.until) or (end is not None and moment >= end):
+            return
+        if (start is None or moment >= start) and moment not in exdates:
+            yield moment
+
+def last_occurrence(rule, dtstart):
+    """Latest possible occurrence start, or None for an endless rule"""
+    if rule.until is not None:
+        return rule.until
+    if rule.count is not None:
+        last = None
+        for last in islice(iter_occurrences(rule, dtstart), rule.count):
+            pass
+        return last
+    return None
+
+def is_occurrence(rule, dtstart, moment):
+    """Whether a rule has an occurrence starting exactly at `moment`"""
+    return next(iter_occurrences(rule, dtstart, moment, moment + timedelta(microseconds=1)), None) == moment
+
+def parse_exdates(text):
+    return frozenset(datetime.fromisoformat(value) for value in text.split(",")) if text else frozenset()
+
+def format_exdates(exdates):
+    return ",".join(moment.isoformat() for moment in sorted(exdates)) or None
+
+class RecurrenceRow(NamedTuple):
+    """Immutable, detached copy of a TaskRecurrence with its rule parsed"""
+    id: int
+    title: str
+    description: Optional[str]
+    priority: Optional[str]
+    duration: Optional[int]
+    is_due_date: Optional[bool]
+    user_id: Optional[int]
+    dtstart: datetime
+    rule: Rule
+    until: Optional[datetime]
+    exdates: FrozenSet[datetime]
+
+    @classmethod
+    def from_recurrence(cls, recurrence):
+        return cls(
+            recurrence.id,
+            recurrence.title,
+            recurrence.description,
+            recurrence.priority,
+            recurrence.duration,
+            recurrence.is_due_date,
+            recurrence.user_id,
+            recurrence.dtstart,
+            parse_rrule(recurrence.rrule),
+            recurrence.until,
+            parse_exdates(recurrence.exdates)
+        )
+
+    def occurrence(self, moment):
+        """The occurrence starting at `moment`, as a TaskRow"""
+        return TaskRow(
+            None, self.title, self.description, self.priority, moment,
+            self.duration, self.is_due_date, self.user_id, self.id
+        )
+
+# Rules keyed by (user_id, version), with the same lifetime as task snapshots
+recurrence_cache = TTLCache(
+    "recurrence_snapshot",
+    maxsize=int(os.getenv("TASK_SNAPSHOT_MAXSIZE", "4096")),
+    ttl=float(os.getenv("TASK_SNAPSHOT_TTL_SECONDS", "60")),
+    copy_values=False
+)
+
+def _carry_recurrences(scope, old_version, new_version, before, after):
+    # A task write leaves the rules as they are
+    rows = recurrence_cache.peek((scope, old_version))
+    if rows is not None:
+        recurrence_cache.set((scope, new_version), rows)
+
+add_write_listener(_carry_recurrences)
+
+def get_recurrence_snapshot(user_id=None, db=None):
+    """Return a user's recurring tasks (all for None) as RecurrenceRows"""
+    version = get_version(user_id)
+    rows = recurrence_cache.get((user_id, version))
+    if rows is not None:
+        return rows
+
+    with session_scope(db) as db:
+        query = db.query(TaskRecurrence)
+        if user_id:
+            query = query.filter(TaskRecurrence.user_id == user_id)
+        rows = tuple(RecurrenceRow.from_recurrence(recurrence) for recurrence in query.order_by(TaskRecurrence.id))
+
+    recurrence_cache.set((user_id, version), rows)
+    return rows
+
+def iter_recurrence_occurrences(recurrences, start=None, end=None):
+    """
+    Lazily yield the occurrences of `recurrences` that start within
+    [start, end) as TaskRows, merged in sort_key order
+    """
+    streams = []
+    for recurrence in recurrences:
+        if start is not None and recurrence.until is not None and recurrence.until < start:
+            continue
+        if end is not None and recurrence.dtstart >= end:
+            continue
+        moments = iter_occurrences(recurrence.rule, recurrence.dtstart, start, end, recurrence.exdates)
+        streams.append(map(recurrence.occurrence, moments))
+    return heapq.merge(*streams, key=TaskRow.sort_key)
+
+def get_task_view(user_id=None, db=None, now=None, days=None):
+    """
+    A user's stored tasks plus the occurrences of their recurring tasks from
+    the start of today through `days` (RECURRENCE_CONTEXT_DAYS) days,
+    ordered by deadline
+    """
+    tasks = get_task_snapshot(user_id, db=db)
+    recurrences = get_recurrence_snapshot(user_id, db=db)
+    if not recurrences:
+        return tasks
+    start = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    end = start + timedelta(days=RECURRENCE_CONTEXT_DAYS if days is None else days)
+    return tuple(heapq.merge(tasks, iter_recurrence_occurrences(recurrences, start, end), key=TaskRow.sort_key))
@@ -0,0 +1,206 @@
+"""
+Free-slot engine over per-user busy intervals.
+
+A task occupies [deadline, deadline + duration) unless it is a due date
+(is_due_date tasks mark when something is due, not booked time). BusyIndex
+keeps those intervals sorted by start, plus the merged busy blocks as parallel
+sorted arrays of starts and ends. A free-slot query bisects to the first block
+of the window and only walks the blocks inside it, so it costs O(log n + k)
+for k blocks in the window. A task write re-merges only the block it touches.
+
+Indexes are cached per (user_id, task-state version) like the task snapshot
+and are patched forward by record_task_write() instead of being rebuilt.
+Occurrences of recurring tasks are not stored in the index; find_free_slots()
+expands the ones inside the query window and merges them into its blocks.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+import os
+import threading
+
+from services.cache import TTLCache
+from services.recurrence import get_recurrence_snapshot, iter_recurrence_occurrences
+from services.task_state import add_write_listener, get_task_snapshot, get_version
+
+DEFAULT_DURATION = 60  # Minutes, for tasks without a duration
+
+def _parse_clock(value):
+    return datetime.strptime(value, "%H:%M").time()
+
+WORK_DAY_START = _parse_clock(os.getenv("WORK_DAY_START", "09:00"))
+WORK_DAY_END = _parse_clock(os.getenv("WORK_DAY_END", "18:00"))
+WORKING_HOURS = (WORK_DAY_START, WORK_DAY_END)
+MIN_SLOT_MINUTES = int(os.getenv("MIN_SLOT_MINUTES", "30"))
+SCHEDULE_HORIZON_DAYS = int(os.getenv("SCHEDULE_HORIZON_DAYS", "7"))
+
+def task_interval(task):
+    """Return the (start, end, task_id) busy interval of a task, or None"""
+    if task.is_due_date or task.deadline is None:
+        return None
+    minutes = task.duration if task.duration and task.duration > 0 else DEFAULT_DURATION
+    return (task.deadline, task.deadline + timedelta(minutes=minutes), task.id)
+
+def _merge(intervals):
+    """Merge intervals sorted by start into disjoint (starts, ends) arrays"""
+    starts, ends = [], []
+    for start, end, _ in intervals:
+        # Touching intervals merge too, so back-to-back tasks form one block
+        if ends and start <= ends[-1]:
+            if end > ends[-1]:
+                ends[-1] = end
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+def _working_windows(start, end, working_hours):
+    """Split [start, end) into the parts that fall inside daily working hours"""
+    if working_hours is None:
+        yield start, end
+        return
+    day_start, day_end = working_hours
+    day = start.date()
+    while datetime.combine(day, day_start) < end:
+        window_start = max(start, datetime.combine(day, day_start))
+        window_end = min(end, datetime.combine(day, day_end))
+        if window_start < window_end:
+            yield window_start, window_end
+        day += timedelta(days=1)
+
+class BusyIndex:
+    """Sorted busy intervals of one user (or of all tasks) with merged blocks"""
+
+    def __init__(self, tasks=()):
+        self._lock = threading.Lock()
+        self._intervals = sorted(interval for interval in map(task_interval, tasks) if interval)
+        self._starts, self._ends = _merge(self._intervals)
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def blocks(self):
+        """Return the merged busy blocks as (start, end) pairs"""
+        with self._lock:
+            return list(zip(self._starts, self._ends))
+
+    def add(self, interval):
+        with self._lock:
+            position = bisect_left(self._intervals, interval)
+            if position < len(self._intervals) and self._intervals[position] == interval:
+                return
+            self._intervals.insert(position, interval)
+
+            # Blocks touching [start, end] collapse into one block with the new interval
+            start, end, _ = interval
+            first = bisect_left(self._ends, start)
+            last = bisect_right(self._starts, end)
+            if first < last:
+                start = min(start, self._starts[first])
+                end = max(end, self._ends[last - 1])
+            self._starts[first:last] = [start]
+            self._ends[first:last] = [end]
+
+    def remove(self, interval):
+        with self._lock:
+            position = bisect_left(self._intervals, interval)
+            if position == len(self._intervals) or self._intervals[position] != interval:
+                return
+            del self._intervals[position]
+
+            # Re-merge the remaining intervals of the block that held it
+            block = bisect_right(self._starts, interval[0]) - 1
+            low = bisect_left(self._intervals, (self._starts[block],))
+            high = bisect_left(self._intervals, (self._ends[block],))
+            starts, ends = _merge(self._intervals[low:high])
+            self._starts[block:block + 1] = starts
+            self._ends[block:block + 1] = ends
+
+    def apply(self, before=None, after=None):
+        """Apply a single-task write; re-applying the same write is a no-op"""
+        before = task_interval(before) if before is not None else None
+        after = task_interval(after) if after is not None else None
+        if before == after:
+            return
+        if before is not None:
+            self.remove(before)
+        if after is not None:
+            self.add(after)
+
+    def free_slots(self, start, end, min_minutes=None, working_hours=WORKING_HOURS, limit=None, extra=()):
+        """
+        Return free slots of at least min_minutes between start and end,
+        clipped to working hours (None for any time), as {"start", "end"} dicts
+        `extra` holds more busy intervals, such as occurrences of recurring tasks
+        """
+        min_length = timedelta(minutes=MIN_SLOT_MINUTES if min_minutes is None else min_minutes)
+        with self._lock:
+            first = bisect_right(self._ends, start)
+            last = bisect_left(self._starts, end)
+            blocks = list(zip(self._starts[first:last], self._ends[first:last]))
+        if extra:
+            intervals = [(block_start, block_end, None) for block_start, block_end in blocks]
+            intervals.extend(extra)
+            intervals.sort(key=lambda interval: interval[:2])
+            blocks = list(zip(*_merge(intervals)))
+
+        slots = []
+        cursor = start
+        for block_start, block_end in blocks + [(end, end)]:
+            gap_end = min(block_start, end)
+            if gap_end > cursor:
+                for slot_start, slot_end in _working_windows(cursor, gap_end, working_hours):
+                    if slot_end - slot_start >= min_length:
+                        slots.append({"start": slot_start, "end": slot_end})
+                        if limit and len(slots) >= limit:
+                            return slots
+            cursor = max(cursor, block_end)
+            if cursor >= end:
+                break
+        return slots
+
+# Indexes keyed by (user_id, version), with the same lifetime as task snapshots
+busy_index_cache = TTLCache(
+    "busy_index",
+    maxsize=int(os.getenv("TASK_SNAPSHOT_MAXSIZE", "4096")),
+    ttl=float(os.getenv("TASK_SNAPSHOT_TTL_SECONDS", "60")),
+    copy_values=False
+)
+
+def _patch_busy_index(scope, old_version, new_version, before, after):
+    index = busy_index_cache.peek((scope, old_version))
+    if index is None:
+        return
+    if after is not None and scope is not None and after.user_id != scope:
+        after = None
+    index.apply(before, after)
+    busy_index_cache.set((scope, new_version), index)
+
+add_write_listener(_patch_busy_index)
+
+def get_busy_index(user_id=None, db=None):
+    """Return the BusyIndex for a user's tasks (all tasks for None)"""
+    version = get_version(user_id)
+    index = busy_index_cache.get((user_id, version))
+    if index is None:
+        index = BusyIndex(get_task_snapshot(user_id, db=db))
+        busy_index_cache.set((user_id, version), index)
+    return index
+
+def find_free_slots(user_id=None, start=None, end=None, min_minutes=None,
+                    working_hours=WORKING_HOURS, limit=None, db=None):
+    """
+    Free slots of at least min_minutes between start (default now) and end
+    (default SCHEDULE_HORIZON_DAYS later), within working hours
+    """
+    start = start or datetime.now()
+    end = end or start + timedelta(days=SCHEDULE_HORIZON_DAYS)
+    index = get_busy_index(user_id, db=db)
+
+    extra = []
+    recurrences = get_recurrence_snapshot(user_id, db=db)
+    if recurrences:
+        # Start early enough to catch occurrences still running at `start`
+        longest = max(recurrence.duration or DEFAULT_DURATION for recurrence in recurrences)
+        occurrences = iter_recurrence_occurrences(recurrences, start - timedelta(minutes=longest), end)
+        extra = [interval for interval in map(task_interval, occurrences) if interval]
+    return index.free_slots(start, end, min_minutes=min_minutes, working_hours=working_hours, limit=limit, extra=extra)
@@ -1,59 +1,317 @@
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import re
+import time
 from langchain_openai import ChatOpenAI
 import os
 import json
 from dotenv import load_dotenv
-from database import SessionLocal
+from pydantic import ValidationError
+from database import AsyncSessionLocal, async_session_scope, release_connection, session_scope, unit_of_work
 from models import Task
-from sqlalchemy import or_, and_, func
+from services.cache import TTLCache
+from services.llm_schemas import ClassifiedMessage, DeleteRequest, EditRequest, ExtractedTask
+from services.llm_gateway import BACKGROUND, INTERACTIVE, LLMDeadlineExceeded, LLMGatewayError, LLMOverloadedError, gateway
+from services.log import get_logger
+from services.metrics import Counter, Gauge, Histogram
+from services.prompts import (
+    CLASSIFY_INSTRUCTIONS,
+    DELETE_REQUEST_INSTRUCTIONS,
+    EDIT_REQUEST_INSTRUCTIONS,
+    EXTRACT_TASK_INSTRUCTIONS,
+    SUGGEST_TASK_INSTRUCTIONS,
+    build_messages
+)
+from services.recurrence import get_task_view
+from services.scheduling import find_free_slots
+from services.task_conflicts import TaskConflictError, conflict_error
+from services.task_context import build_task_context
+from services.task_parser import FAST_PATH_MIN_CONFIDENCE, parse_task_message
+from services.task_search import apply_title_search
+from services.task_state import TaskRow, get_version, record_task_write
+from sqlalchemy import and_
+from sqlalchemy.exc import IntegrityError
 
 # Load environment variables from .env file
 load_dotenv()
 
+logger = get_logger("task_ai")
+
 # Initialize OpenAI LLM
 openai_api_key = os.getenv("OPENAI_API_KEY")
 llm = ChatOpenAI(
     model="gpt-4o-mini",
-    openai_api_key=openai_api_key
+    openai_api_key=openai_api_key,
+    # Report token usage on streamed replies too
+    stream_usage=True,
+    # Retries and timeouts are handled by the gateway (services/llm_gateway.py)
+    max_retries=0
 )
 
-def get_schedule_gaps(user_id=None):
-    """Get schedule gaps, optionally filtered by user_id"""
-    db = SessionLocal()
-    
-    # Filter tasks by user_id if provided
-    if user_id:
-        tasks = db.query(Task).filter(Task.user_id == user_id).order_by(Task.deadline).all()
-    else:
-        tasks = db.query(Task).order_by(Task.deadline).all()
-        
-    db.close()
+LLM_CALLS = Counter("llm_calls_total", "Chat model calls by stage and outcome", ("stage", "outcome"))
+LLM_CALL_DURATION = Histogram("llm_call_duration_seconds", "Time until the chat model's reply is complete", ("stage",))
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens used by chat model calls; cached_prompt counts the prompt tokens served from the provider's cache",
+    ("stage", "kind")
+)
+STRUCTURED_OUTPUT_FAILURES = Counter(
+    "llm_structured_output_failures_total",
+    "Model answers that did not validate against the stage's schema, by attempt (initial or repair)",
+    ("stage", "attempt")
+)
+
+FAST_PATH = Counter(
+    "task_parser_fast_path_total",
+    "Messages offered to the rule-based parser, by whether it was confident enough to skip the model",
+    ("stage", "outcome")
+)
+FAST_PATH_SECONDS_SAVED = Counter(
+    "task_parser_seconds_saved_total",
+    "Model latency avoided by the rule-based parser, estimated from the stage's mean call duration",
+    ("stage",)
+)
+
+def _fast_path_hit_ratios():
+    samples = FAST_PATH.samples()
+    stages = {stage for stage, _ in samples}
+    ratios = {}
+    for stage in stages:
+        hits = samples.get((stage, "hit"), 0)
+        ratios[(stage,)] = hits / (hits + samples.get((stage, "miss"), 0))
+    return ratios
+
+FAST_PATH_HIT_RATIO = Gauge(
+    "task_parser_fast_path_hit_ratio",
+    "Share of messages the rule-based parser handled without the model",
+    ("stage",),
+    callback=_fast_path_hit_ratios
+)
+
+# Cache of parsed extraction results, keyed by _extraction_cache_key
+extraction_cache = TTLCache(
+    "llm_extraction",
+    maxsize=int(os.getenv("LLM_CACHE_MAXSIZE", "1024")),
+    ttl=float(os.getenv("LLM_CACHE_TTL_SECONDS", "600"))
+)
+
+# Messages whose meaning depends on the wall clock, not just the date
+_RELATIVE_TIME_PATTERN = re.compile(
+    r"\b(now|right away|soon|later|tonight|this (morning|afternoon|evening)|in (a|an|\d+) (min|minute|hour|hr)s?)\b"
+)
 
+def _normalize_message(message):
+    """Canonical form of a user message for cache keys"""
+    normalized = re.sub(r"\s+", " ", message.strip().lower())
+    return normalized.rstrip(".!?")
+
+def _extraction_cache_key(stage, message, user_id=None, versioned=True):
+    """
+    Build the cache key for an extraction call
+    Uses the date rather than the current minute, unless the message refers to
+    a time relative to now, and the task-state version when the prompt embeds
+    the task list
+    """
     now = datetime.now()
-    available_slots = []
+    normalized = _normalize_message(message)
+    key = (stage, normalized, now.strftime("%Y-%m-%d"))
+    if versioned:
+        key += (user_id, get_version(user_id))
+    if _RELATIVE_TIME_PATTERN.search(normalized):
+        key += (now.strftime("%H:%M"),)
+    return key
 
-    # Check for gaps in tasks
-    last_task_end = now
-    for task in tasks:
-        task_start = task.deadline - timedelta(hours=2)  # Assume 2h per task
-        if task_start > last_task_end:
-            available_slots.append({"start": last_task_end, "end": task_start})
-        last_task_end = task.deadline
+async def _run_db(session, fn, *args, **kwargs):
+    """
+    Run a sync DB helper on an AsyncSession without blocking the event loop
+    Opens a short-lived AsyncSession when none is given
+    """
+    if session is not None:
+        return await session.run_sync(lambda db: fn(*args, db=db, **kwargs))
+    async with AsyncSessionLocal() as session:
+        return await session.run_sync(lambda db: fn(*args, db=db, **kwargs))
+
+@contextmanager
+def _track_llm_call(stage):
+    """Count one model call for `stage` and time it"""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except LLMOverloadedError:
+        outcome = "shed"
+        raise
+    except LLMDeadlineExceeded:
+        outcome = "timeout"
+        raise
+    finally:
+        LLM_CALLS.inc(stage=stage, outcome=outcome)
+        LLM_CALL_DURATION.observe(time.perf_counter() - started, stage=stage)
 
-    return available_slots
+def _prompt_cache_hit_ratios():
+    samples = LLM_TOKENS.samples()
+    ratios = {}
+    for (stage, kind), prompt in samples.items():
+        if kind == "prompt" and prompt:
+            ratios[(stage,)] = samples.get((stage, "cached_prompt"), 0) / prompt
+    return ratios
 
-def get_task_summary(user_id=None):
-    """Get a summary of tasks for context, optionally filtered by user_id"""
-    db = SessionLocal()
-    
-    # Filter tasks by user_id if provided
-    if user_id:
-        tasks = db.query(Task).filter(Task.user_id == user_id).order_by(Task.deadline).all()
-    else:
-        tasks = db.query(Task).order_by(Task.deadline).all()
-        
-    db.close()
+LLM_PROMPT_CACHE_HIT_RATIO = Gauge(
+    "llm_prompt_cache_hit_ratio",
+    "Share of prompt tokens served from the provider's prefix cache",
+    ("stage",),
+    callback=_prompt_cache_hit_ratios
+)
+
+def _record_token_usage(stage, usage):
+    if usage:
+        LLM_TOKENS.inc(usage.get("input_tokens", 0), stage=stage, kind="prompt")
+        LLM_TOKENS.inc(usage.get("output_tokens", 0), stage=stage, kind="completion")
+        cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+        if cached:
+            LLM_TOKENS.inc(cached, stage=stage, kind="cached_prompt")
+
+def _add_usage(total, usage):
+    """Sum usage_metadata dicts, including the nested token details"""
+    for key, value in (usage or {}).items():
+        if isinstance(value, dict):
+            _add_usage(total.setdefault(key, {}), value)
+        elif isinstance(value, int):
+            total[key] = total.get(key, 0) + value
+
+def _invoke_llm(stage, messages, user_id=None, lane=INTERACTIVE, model=None):
+    """
+    Call the model (by default the plain chat model) through the gateway,
+    recording the call, its latency and token usage under `stage`
+    """
+    with _track_llm_call(stage):
+        response = gateway.invoke(model or llm, messages, stage, lane=lane, user_id=user_id)
+    _record_token_usage(stage, getattr(response, "usage_metadata", None))
+    return response
+
+async def _ainvoke_llm(stage, messages, user_id=None, lane=INTERACTIVE, model=None):
+    """Async variant of _invoke_llm"""
+    with _track_llm_call(stage):
+        response = await gateway.ainvoke(model or llm, messages, stage, lane=lane, user_id=user_id)
+    _record_token_usage(stage, getattr(response, "usage_metadata", None))
+    return response
+
+async def _astream_llm(stage, messages, user_id=None, lane=INTERACTIVE):
+    """Stream the model's reply; usage arrives on the chunks and is summed"""
+    usage = {}
+    with _track_llm_call(stage):
+        async for chunk in gateway.astream(llm, messages, stage, lane=lane, user_id=user_id):
+            _add_usage(usage, getattr(chunk, "usage_metadata", None))
+            yield chunk
+    _record_token_usage(stage, usage)
+
+def _fast_path_parse(stage, message):
+    """
+    Parse a simple create-task message with the rule-based parser
+    Returns the parsed task, or None when the parser is not confident and
+    the model should handle the message
+    """
+    started = time.perf_counter()
+    parsed = parse_task_message(message)
+    if parsed["confidence"] < FAST_PATH_MIN_CONFIDENCE:
+        FAST_PATH.inc(stage=stage, outcome="miss")
+        return None
+    FAST_PATH.inc(stage=stage, outcome="hit")
+    saved = LLM_CALL_DURATION.summary(stage=stage)["mean"] - (time.perf_counter() - started)
+    if saved > 0:
+        FAST_PATH_SECONDS_SAVED.inc(saved, stage=stage)
+    return parsed
+
+# Models bound to one schema tool, keyed by schema; rebuilt if llm is replaced
+_structured_models = {}
+
+def _structured_model(schema):
+    """The chat model bound to `schema` as the one tool it must call"""
+    bound = _structured_models.get(schema)
+    if bound is None or bound[0] is not llm:
+        bound = (llm, llm.bind_tools([schema], tool_choice=schema.__name__))
+        _structured_models[schema] = bound
+    return bound[1]
+
+def _schema_dict(answer):
+    """A validated answer as a plain dict, without the fields left unset"""
+    dump = getattr(answer, "model_dump", None) or answer.dict
+    return dump(exclude_none=True)
+
+def _tool_arguments(response, schema):
+    for call in getattr(response, "tool_calls", None) or []:
+        if call.get("name") == schema.__name__:
+            return call.get("args") or {}
+    return None
+
+def _validate_answer(response, schema):
+    """Validate the model's tool-call arguments against `schema`"""
+    arguments = _tool_arguments(response, schema)
+    if arguments is None:
+        raise ValueError(f"the model did not call {schema.__name__}")
+    return _schema_dict(schema(**arguments))
+
+def _repair_messages(messages, response, schema, error):
+    """The original prompt plus the invalid answer and why it was rejected"""
+    arguments = _tool_arguments(response, schema)
+    answer = json.dumps(arguments) if arguments is not None else response.content
+    return list(messages) + [(
+        "user",
+        f"Your previous answer {answer[:500]} was invalid: {str(error)[:500]}\n"
+        f"Call {schema.__name__} again with valid arguments."
+    )]
+
+def _invoke_structured(stage, messages, schema, user_id=None, lane=INTERACTIVE):
+    """
+    Call the model with `schema` as a forced tool and return the validated
+    arguments as a dict
+    An invalid answer is counted and repaired once by showing the model the
+    validation error; a second invalid answer raises ValueError
+    """
+    model = _structured_model(schema)
+    response = _invoke_llm(stage, messages, user_id, lane=lane, model=model)
+    try:
+        return _validate_answer(response, schema)
+    except (ValidationError, ValueError) as e:
+        STRUCTURED_OUTPUT_FAILURES.inc(stage=stage, attempt="initial")
+        error = e
+    response = _invoke_llm(stage, _repair_messages(messages, response, schema, error), user_id, lane=lane, model=model)
+    try:
+        return _validate_answer(response, schema)
+    except (ValidationError, ValueError):
+        STRUCTURED_OUTPUT_FAILURES.inc(stage=stage, attempt="repair")
+        raise
+
+async def _ainvoke_structured(stage, messages, schema, user_id=None, lane=INTERACTIVE):
+    """Async variant of _invoke_structured"""
+    model = _structured_model(schema)
+    response = await _ainvoke_llm(stage, messages, user_id, lane=lane, model=model)
+    try:
+        return _validate_answer(response, schema)
+    except (ValidationError, ValueError) as e:
+        STRUCTURED_OUTPUT_FAILURES.inc(stage=stage, attempt="initial")
+        error = e
+    response = await _ainvoke_llm(stage, _repair_messages(messages, response, schema, error), user_id, lane=lane, model=model)
+    try:
+        return _validate_answer(response, schema)
+    except (ValidationError, ValueError):
+        STRUCTURED_OUTPUT_FAILURES.inc(stage=stage, attempt="repair")
+        raise
+
+def get_schedule_gaps(user_id=None, db=None, min_minutes=None, limit=None):
+    """
+    Get free slots in the coming days, optionally filtered by user_id
+    Slots honor task durations and working hours (see services/scheduling.py)
+    """
+    return find_free_slots(user_id, min_minutes=min_minutes, limit=limit, db=db)
+
+def get_task_summary(user_id=None, db=None):
+    """
+    Get a summary of tasks for context, optionally filtered by user_id
+    Recurring tasks appear as their occurrences in the coming days
+    """
+    tasks = get_task_view(user_id, db=db)
     
     if not tasks:
         return "You currently have no tasks scheduled."
@@ -65,117 +323,76 @@ def get_task_summary(user_id=None):
     
     return summary
 
-def suggest_task(user_id=None):
-    """Suggest task based on schedule gaps, filtered by user_id"""
-    gaps = get_schedule_gaps(user_id)
+def suggest_task(user_id=None, min_minutes=None):
+    """
+    Suggest a task for the user's next free slot, given their current tasks
+    The model call counts against the user's in-flight limit
+    """
+    gaps = get_schedule_gaps(user_id, min_minutes=min_minutes, limit=1)
     if not gaps:
         return "No free slots available."
 
     # Take the first available gap
     gap = gaps[0]
     
-    prompt = f"You have free time from {gap['start'].strftime('%H:%M')} to {gap['end'].strftime('%H:%M')}. Suggest a productive task based on deadlines and priorities."
-
-    ai_message = [
-        ("system", "You are a helpful assistant that suggests tasks based on deadlines and priorities."),
-        ("user", prompt)
-    ]
+    prompt = f"You have free time on {gap['start'].strftime('%A %Y-%m-%d')} from {gap['start'].strftime('%H:%M')} to {gap['end'].strftime('%H:%M')}. Suggest a productive task based on deadlines and priorities."
 
-    response = llm.invoke(ai_message)
+    ai_message = build_messages(SUGGEST_TASK_INSTRUCTIONS, prompt, get_task_summary(user_id))
+    response = _invoke_llm("suggest_task", ai_message, user_id, lane=BACKGROUND)
     return response.content
 
 def extract_task_from_message(message):
     """
-    Extract task details from a natural language message using the LLM
+    Extract task details from a natural language message, with the
+    rule-based parser when it is confident and the LLM otherwise
     Returns a task object or None if no task was detected
     """
-    # Get current date and time for context
-    current_date = datetime.now()
-    current_date_str = current_date.strftime("%Y-%m-%d")
-    current_time_str = current_date.strftime("%H:%M")
-    
-    # Calculate tomorrow and next week for explicit reference
-    tomorrow = current_date + timedelta(days=1)
-    tomorrow_str = tomorrow.strftime("%Y-%m-%d")
-    next_week = current_date + timedelta(days=7)
-    next_week_str = next_week.strftime("%Y-%m-%d")
-    
-    system_prompt = f"""
-    You are an AI assistant that extracts task information from user messages.
-    
-    CURRENT DATE INFORMATION:
-    TODAY'S DATE: {current_date_str} ({current_date.strftime("%A, %B %d, %Y")})
-    TOMORROW'S DATE: {tomorrow_str} ({tomorrow.strftime("%A, %B %d, %Y")})
-    NEXT WEEK STARTS: {next_week_str} ({next_week.strftime("%A, %B %d, %Y")})
-    CURRENT TIME: {current_time_str}
-    
-    Extract the following details if present:
-    1. Title - A concise name for the task
-    2. Description - A brief description of what the task involves
-    3. Priority - Low, Normal, or High (default to Normal if not specified)
-    4. Date - The date for the task (use TODAY'S DATE if only time is mentioned)
-    5. Start time - When the task starts
-    6. End time - When the task ends
-    7. Is due date - True if this is just a deadline, False if it's a scheduled time slot
-    
-    When interpreting dates:
-    - "Today" means {current_date_str} ({current_date.strftime("%A, %B %d")})
-    - "Tomorrow" means {tomorrow_str} ({tomorrow.strftime("%A, %B %d")})
-    - "Next week" means starting {next_week_str} ({next_week.strftime("%A, %B %d")})
-    - Always use the full year {current_date.year} in dates
-    
-    Format your response as a valid JSON object with these fields:
-    {{
-        "is_task": true/false,  # Whether the message contains a task
-        "title": "string",
-        "description": "string",
-        "priority": "string",
-        "date": "YYYY-MM-DD",
-        "start_time": "HH:MM",
-        "end_time": "HH:MM",
-        "is_due_date": true/false,
-        "uncertain_fields": ["field1", "field2", ...]  # List fields that were not explicitly mentioned and required guessing
-    }}
-    
-    For the "uncertain_fields" array, include any of these fields that weren't explicitly mentioned:
-    - "priority" (if priority wasn't specified)
-    - "end_time" (if only start time was given)
-    - "duration" (if duration wasn't specified)
-    - "description" (if only a basic title was given)
-    - "date" (if date was ambiguous)
-    
-    If the message doesn't contain a task, return {{"is_task": false}}.
-    If any field is missing, make a reasonable assumption or omit it from the JSON.
-    """
-    
-    ai_message = [
-        ("system", system_prompt),
-        ("user", message)
-    ]
-    
+    # Simple messages don't need the model
+    parsed = _fast_path_parse("extract_task_from_message", message)
+    if parsed is not None:
+        return parsed
+
+    cache_key = _extraction_cache_key("extract_task_from_message", message, versioned=False)
+    cached = extraction_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    ai_message = build_messages(EXTRACT_TASK_INSTRUCTIONS, message)
     try:
-        response = llm.invoke(ai_message)
-        # Extract JSON from the response
-        json_match = re.search(r'```json\s*(.*?)\s*```', response.content, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
-        else:
-            json_str = response.content
-            
-        # Clean up the string to ensure it's valid JSON
-        json_str = re.sub(r'[\n\r\t]', '', json_str)
-        json_str = re.sub(r',$\s*}', '}', json_str)
-        
-        task_data = json.loads(json_str)
+        task_data = _invoke_structured("extract_task_from_message", ai_message, ExtractedTask)
+        extraction_cache.set(cache_key, task_data)
         return task_data
+    except LLMGatewayError:
+        # Overload and timeouts reach the route as 503/504
+        raise
     except Exception as e:
-        print(f"Error extracting task: {str(e)}")
+        logger.exception("Error extracting task")
         return {"is_task": False}
 
-def create_task_from_extraction(task_data):
+@contextmanager
+def _conflict_savepoint(db, task):
+    """
+    Make the task writes in the block under a savepoint and flush them
+    An overlap rejected by the database rolls back only the savepoint, so the
+    rest of the chat turn can still commit, and raises TaskConflictError
+    """
+    written = None
+    try:
+        with db.begin_nested():
+            yield
+            written = TaskRow.from_task(task)
+            db.flush()
+    except IntegrityError as e:
+        conflict = conflict_error(db, e, written, exclude_id=written.id) if written else None
+        if conflict is None:
+            raise
+        raise conflict from e
+
+def create_task_from_extraction(task_data, db=None):
     """
     Create a task in the database from extracted task data
-    Returns the created task or an error message
+    Returns the created task or an error message; raises TaskConflictError
+    if it would overlap a scheduled task
     """
     try:
         if not task_data.get("is_task", False):
@@ -271,280 +488,187 @@ def create_task_from_extraction(task_data):
             db_task["user_id"] = task_data["user_id"]
         
         # Add to database
-        db = SessionLocal()
-        new_task = Task(**db_task)
-        db.add(new_task)
-        db.commit()
-        db.refresh(new_task)
-        db.close()
+        with unit_of_work(db) as db:
+            new_task = Task(**db_task)
+            with _conflict_savepoint(db, new_task):
+                db.add(new_task)
+            record_task_write(after=new_task, db=db)
         
         # Determine if we need to ask for confirmation
         needs_confirmation = len(uncertain_fields) > 0
         
         return new_task, uncertain_fields, needs_confirmation
+    except TaskConflictError:
+        raise
     except Exception as e:
-        print(f"Error creating task from extraction: {str(e)}")
+        logger.exception("Error creating task from extraction")
         return None, [], False
 
-def extract_task_edit_request(message):
+def extract_task_edit_request(message, user_id=None, db=None):
     """
     Extract task edit details from a natural language message using the LLM
     Returns details about which task to edit and what changes to make
     """
-    # Get current date and time for context
-    current_date = datetime.now()
-    current_date_str = current_date.strftime("%Y-%m-%d")
-    current_time_str = current_date.strftime("%H:%M")
-    
-    # Calculate tomorrow and next week for explicit reference
-    tomorrow = current_date + timedelta(days=1)
-    tomorrow_str = tomorrow.strftime("%Y-%m-%d")
-    next_week = current_date + timedelta(days=7)
-    next_week_str = next_week.strftime("%Y-%m-%d")
-    
-    # Get task summary for context
-    task_summary = get_task_summary()
-    
-    system_prompt = f"""
-    You are an AI assistant that extracts task editing information from user messages.
-    
-    CURRENT DATE INFORMATION:
-    TODAY'S DATE: {current_date_str} ({current_date.strftime("%A, %B %d, %Y")})
-    TOMORROW'S DATE: {tomorrow_str} ({tomorrow.strftime("%A, %B %d, %Y")})
-    NEXT WEEK STARTS: {next_week_str} ({next_week.strftime("%A, %B %d, %Y")})
-    CURRENT TIME: {current_time_str}
-    
-    CURRENT TASKS:
-    {task_summary}
-    
-    Extract the following details if present:
-    1. Task Identifiers - Words/phrases that help identify which task the user wants to edit (title keywords, date references, etc.)
-    2. Changes - What properties the user wants to change and their new values
-    
-    Editable task properties:
-    - title: The name of the task
-    - description: Details about the task
-    - priority: "Low", "Normal", or "High"
-    - deadline: Date and time for the task
-    - duration: Duration in minutes
-    - is_due_date: Whether this is just a deadline (true) or scheduled time slot (false)
-    
-    Format your response as a valid JSON object with these fields:
-    {{
-        "is_edit_request": true/false,  # Whether the message is asking to edit a task
-        "task_identifiers": {{
-            "title_keywords": ["keyword1", "keyword2"],  # Words that might be in the task title
-            "date_reference": "YYYY-MM-DD or relative date description",  # Like "tomorrow", "next week", etc.
-            "time_reference": "HH:MM or description",  # Like "morning", "afternoon", "3pm", etc.
-            "other_descriptors": ["any other identifying information"]
-        }},
-        "changes": {{
-            "property_name": "new_value",  # One or more properties to change with their new values
-            # Examples:
-            # "priority": "High",
-            # "deadline": "2023-05-20 15:00",
-            # "duration": 90
-        }}
-    }}
-    
-    If the message isn't asking to edit a task, return {{"is_edit_request": false}}.
-    """
-    
-    ai_message = [
-        ("system", system_prompt),
-        ("user", message)
-    ]
-    
+    cache_key = _extraction_cache_key("extract_task_edit_request", message, user_id)
+    cached = extraction_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Get the user's most relevant tasks for context
+    task_summary, _ = build_task_context(message, user_id, stage="extract_task_edit_request", db=db)
+    ai_message = build_messages(EDIT_REQUEST_INSTRUCTIONS, message, task_summary)
     try:
-        response = llm.invoke(ai_message)
-        # Extract JSON from the response
-        json_match = re.search(r'```json\s*(.*?)\s*```', response.content, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
-        else:
-            json_str = response.content
-            
-        # Clean up the string to ensure it's valid JSON
-        json_str = re.sub(r'[\n\r\t]', '', json_str)
-        json_str = re.sub(r',$\s*}', '}', json_str)
-        
-        edit_data = json.loads(json_str)
+        edit_data = _invoke_structured("extract_task_edit_request", ai_message, EditRequest, user_id)
+        extraction_cache.set(cache_key, edit_data)
         return edit_data
+    except LLMGatewayError:
+        raise
     except Exception as e:
-        print(f"Error extracting task edit request: {str(e)}")
+        logger.exception("Error extracting task edit request")
         return {"is_edit_request": False}
 
-def search_tasks_by_criteria(task_identifiers, user_id=None):
+def _day_range(start_date, days=1):
+    """Half-open [start, end) datetime range covering whole days"""
+    start = datetime.combine(start_date, datetime.min.time())
+    return start, start + timedelta(days=days)
+
+def build_task_search_query(db, task_identifiers, user_id=None):
     """
-    Search for tasks that match the criteria in task_identifiers
-    Returns a list of matching tasks, optionally filtered by user_id
+    Build the query behind search_tasks_by_criteria
+    Predicates compare the bare deadline and deadline_hour columns so they can
+    be served by the (user_id, deadline) and (user_id, deadline_hour) indexes,
+    and title keywords go through the ranked title search index
     """
-    db = SessionLocal()
-    
-    try:
-        # Start with a base query
-        query = db.query(Task)
-        
-        # Add user_id filter if provided
-        if user_id is not None:
-            query = query.filter(Task.user_id == user_id)
-        
-        # Add filters based on task_identifiers
-        title_keywords = task_identifiers.get("title_keywords", [])
-        if title_keywords:
-            title_conditions = []
-            for keyword in title_keywords:
-                if keyword:
-                    title_conditions.append(Task.title.ilike(f"%{keyword}%"))
-            if title_conditions:
-                query = query.filter(or_(*title_conditions))
-        
-        # Handle date reference
-        date_reference = task_identifiers.get("date_reference")
-        if date_reference:
-            # Process relative date references
-            today = datetime.now().date()
-            
-            if "tomorrow" in date_reference.lower():
-                date = today + timedelta(days=1)
-                query = query.filter(func.date(Task.deadline) == date)
-            elif "next week" in date_reference.lower():
-                start_of_next_week = today + timedelta(days=(7 - today.weekday()))
-                end_of_next_week = start_of_next_week + timedelta(days=6)
-                query = query.filter(
-                    and_(
-                        func.date(Task.deadline) >= start_of_next_week,
-                        func.date(Task.deadline) <= end_of_next_week
-                    )
-                )
-            elif "today" in date_reference.lower():
-                query = query.filter(func.date(Task.deadline) == today)
-            else:
-                # Try to parse as exact date
-                try:
-                    # Check if the date reference already has a year
-                    if len(date_reference.split("-")) == 3:
-                        date = datetime.strptime(date_reference, "%Y-%m-%d").date()
-                    else:
-                        # If no year, assume current year
-                        date = datetime.strptime(f"{today.year}-{date_reference}", "%Y-%m-%d").date()
-                    query = query.filter(func.date(Task.deadline) == date)
-                except ValueError:
-                    # If parsing fails, don't apply date filter
-                    pass
+    # Start with a base query
+    query = db.query(Task)
+    
+    # Add user_id filter if provided
+    if user_id is not None:
+        query = query.filter(Task.user_id == user_id)
+    
+    # Add filters based on task_identifiers; best title match comes first
+    title_keywords = task_identifiers.get("title_keywords", [])
+    if title_keywords:
+        query = apply_title_search(query, db, title_keywords)
+    
+    # Handle date reference
+    date_reference = task_identifiers.get("date_reference")
+    if date_reference:
+        # Process relative date references
+        today = datetime.now().date()
+        day_range = None
         
-        # Handle time reference (morning, afternoon, etc.)
-        time_reference = task_identifiers.get("time_reference")
-        if time_reference:
-            if "morning" in time_reference.lower():
-                query = query.filter(
-                    and_(
-                        func.extract('hour', Task.deadline) >= 5,
-                        func.extract('hour', Task.deadline) < 12
-                    )
-                )
-            elif "afternoon" in time_reference.lower():
-                query = query.filter(
-                    and_(
-                        func.extract('hour', Task.deadline) >= 12,
-                        func.extract('hour', Task.deadline) < 18
-                    )
-                )
-            elif "evening" in time_reference.lower() or "night" in time_reference.lower():
-                query = query.filter(func.extract('hour', Task.deadline) >= 18)
-            else:
-                # Try to parse as exact time
-                try:
-                    # Extract hours from time reference
-                    time_match = re.search(r'(\d{1,2})(?::(\d{2}))?(?:\s*(am|pm))?', time_reference, re.IGNORECASE)
-                    if time_match:
-                        hour = int(time_match.group(1))
-                        minute = int(time_match.group(2)) if time_match.group(2) else 0
-                        am_pm = time_match.group(3).lower() if time_match.group(3) else None
-                        
-                        # Adjust hour for AM/PM
-                        if am_pm == "pm" and hour < 12:
-                            hour += 12
-                        elif am_pm == "am" and hour == 12:
-                            hour = 0
-                            
-                        # Search for tasks around that time (within 1 hour)
-                        query = query.filter(
-                            and_(
-                                func.extract('hour', Task.deadline) >= hour - 1,
-                                func.extract('hour', Task.deadline) <= hour + 1
-                            )
-                        )
-                except Exception:
-                    # If parsing fails, don't apply time filter
-                    pass
+        if "tomorrow" in date_reference.lower():
+            day_range = _day_range(today + timedelta(days=1))
+        elif "next week" in date_reference.lower():
+            start_of_next_week = today + timedelta(days=(7 - today.weekday()))
+            day_range = _day_range(start_of_next_week, days=7)
+        elif "today" in date_reference.lower():
+            day_range = _day_range(today)
+        else:
+            # Try to parse as exact date
+            try:
+                # Check if the date reference already has a year
+                if len(date_reference.split("-")) == 3:
+                    date = datetime.strptime(date_reference, "%Y-%m-%d").date()
+                else:
+                    # If no year, assume current year
+                    date = datetime.strptime(f"{today.year}-{date_reference}", "%Y-%m-%d").date()
+                day_range = _day_range(date)
+            except ValueError:
+                # If parsing fails, don't apply date filter
+                pass
         
+        if day_range:
+            query = query.filter(and_(Task.deadline >= day_range[0], Task.deadline < day_range[1]))
+    
+    # Handle time reference (morning, afternoon, etc.)
+    time_reference = task_identifiers.get("time_reference")
+    if time_reference:
+        if "morning" in time_reference.lower():
+            query = query.filter(Task.deadline_hour.between(5, 11))
+        elif "afternoon" in time_reference.lower():
+            query = query.filter(Task.deadline_hour.between(12, 17))
+        elif "evening" in time_reference.lower() or "night" in time_reference.lower():
+            query = query.filter(Task.deadline_hour >= 18)
+        else:
+            # Try to parse as exact time
+            time_match = re.search(r'(\d{1,2})(?::(\d{2}))?(?:\s*(am|pm))?', time_reference, re.IGNORECASE)
+            if time_match:
+                hour = int(time_match.group(1))
+                am_pm = time_match.group(3).lower() if time_match.group(3) else None
+                
+                # Adjust hour for AM/PM
+                if am_pm == "pm" and hour < 12:
+                    hour += 12
+                elif am_pm == "am" and hour == 12:
+                    hour = 0
+                    
+                # Search for tasks around that time (within 1 hour)
+                query = query.filter(Task.deadline_hour.between(hour - 1, hour + 1))
+    
+    return query
+
+def search_tasks_by_criteria(task_identifiers, user_id=None, db=None):
+    """
+    Search for tasks that match the criteria in task_identifiers
+    Returns a list of matching tasks, best title match first, optionally
+    filtered by user_id
+    """
+    with session_scope(db) as db:
         # Get the results
-        tasks = query.all()
+        tasks = build_task_search_query(db, task_identifiers, user_id).all()
         return tasks
-    finally:
-        db.close()
 
-def update_task(task_id, changes):
+def update_task(task_id, changes, db=None):
     """
     Update a task with the specified changes
     Returns the updated task
     """
-    db = SessionLocal()
-    
-    try:
+    with unit_of_work(db) as db:
         task = db.query(Task).filter(Task.id == task_id).first()
         if not task:
             return None
+        before = TaskRow.from_task(task)
         
-        # Apply changes
-        for prop, value in changes.items():
-            if prop == "deadline" and isinstance(value, str):
-                # Parse deadline string to datetime
-                try:
-                    task.deadline = datetime.strptime(value, "%Y-%m-%d %H:%M")
-                except ValueError:
+        # Apply changes in a savepoint, so an overlapping edit only undoes itself
+        with _conflict_savepoint(db, task):
+            for prop, value in changes.items():
+                if prop == "deadline" and isinstance(value, str):
+                    # Parse deadline string to datetime
+                    try:
+                        task.deadline = datetime.strptime(value, "%Y-%m-%d %H:%M")
+                    except ValueError:
+                        try:
+                            # Alternative format
+                            task.deadline = datetime.strptime(value, "%Y-%m-%d")
+                        except ValueError:
+                            # Keep original if parsing fails
+                            pass
+                elif prop == "duration" and isinstance(value, (str, int)):
+                    # Convert string to int if needed
                     try:
-                        # Alternative format
-                        task.deadline = datetime.strptime(value, "%Y-%m-%d")
+                        task.duration = int(value)
                     except ValueError:
-                        # Keep original if parsing fails
+                        # Keep original if conversion fails
                         pass
-            elif prop == "duration" and isinstance(value, (str, int)):
-                # Convert string to int if needed
-                try:
-                    task.duration = int(value)
-                except ValueError:
-                    # Keep original if conversion fails
-                    pass
-            elif prop == "is_due_date" and isinstance(value, str):
-                # Convert string to boolean
-                task.is_due_date = value.lower() in ["true", "yes", "1"]
-            elif prop == "priority" and isinstance(value, str):
-                # Validate priority
-                if value in ["Low", "Normal", "High"]:
-                    task.priority = value
-            elif hasattr(task, prop):
-                # Set attribute if it exists
-                setattr(task, prop, value)
-        
-        db.commit()
-        db.refresh(task)
+                elif prop == "is_due_date" and isinstance(value, str):
+                    # Convert string to boolean
+                    task.is_due_date = value.lower() in ["true", "yes", "1"]
+                elif prop == "priority" and isinstance(value, str):
+                    # Validate priority
+                    if value in ["Low", "Normal", "High"]:
+                        task.priority = value
+                elif hasattr(task, prop):
+                    # Set attribute if it exists
+                    setattr(task, prop, value)
+
+        record_task_write(before=before, after=task, db=db)
         return task
-    finally:
-        db.close()
 
-def format_task_list(user_id=None):
+def format_task_list(user_id=None, db=None):
     """Format the current task list in a user-friendly way for display, filtered by user_id"""
-    db = SessionLocal()
-    
-    # Filter tasks by user_id if provided
-    if user_id:
-        tasks = db.query(Task).filter(Task.user_id == user_id).order_by(Task.deadline).all()
-    else:
-        tasks = db.query(Task).order_by(Task.deadline).all()
-        
-    db.close()
+    tasks = get_task_view(user_id, db=db)
     
     if not tasks:
         return "You currently have no tasks scheduled."
@@ -588,17 +712,25 @@ def format_task_list(user_id=None):
     
     return result
 
-def handle_task_edit_request(edit_data, user_id=None):
+def _conflict_info(conflicts):
+    """Tasks in the way of a create or edit, formatted for the reply prompt"""
+    return [
+        {"id": task.id, "title": task.title, "deadline": task.deadline.strftime("%Y-%m-%d %H:%M"), "duration": task.duration}
+        for task in conflicts
+    ]
+
+def handle_task_edit_request(edit_data, user_id=None, db=None):
     """
     Handle a task edit request
-    Returns information about the result of the edit
+    Returns information about the result of the edit; dispatch_intent adds
+    the updated task list once the edit is committed
     """
     if not edit_data.get("is_edit_request", False):
         return {"success": False, "message": "Not an edit request"}
     
     # Search for tasks matching the criteria, filtered by user_id
     task_identifiers = edit_data.get("task_identifiers", {})
-    matching_tasks = search_tasks_by_criteria(task_identifiers, user_id)
+    matching_tasks = search_tasks_by_criteria(task_identifiers, user_id, db=db)
     
     if not matching_tasks:
         return {"success": False, "message": "No matching tasks found", "matched_tasks": []}
@@ -606,7 +738,15 @@ def handle_task_edit_request(edit_data, user_id=None):
     # Apply changes to the first matching task
     # (Could be extended to handle multiple matches or allow user to choose)
     changes = edit_data.get("changes", {})
-    task = update_task(matching_tasks[0].id, changes)
+    try:
+        task = update_task(matching_tasks[0].id, changes, db=db)
+    except TaskConflictError as e:
+        return {
+            "success": False,
+            "message": str(e),
+            "matched_tasks": [t.title for t in matching_tasks],
+            "conflicts": _conflict_info(e.conflicts)
+        }
     
     if task:
         # Format task info for response
@@ -620,138 +760,82 @@ def handle_task_edit_request(edit_data, user_id=None):
             "is_due_date": task.is_due_date
         }
         
-        # Get updated task list
-        updated_task_list = format_task_list(user_id)
-        
         return {
             "success": True, 
             "message": "Task updated successfully", 
             "task": task_info,
             "matched_tasks": [t.title for t in matching_tasks],
-            "changed_properties": list(changes.keys()),
-            "updated_task_list": updated_task_list
+            "changed_properties": list(changes.keys())
         }
     else:
         return {"success": False, "message": "Failed to update task", "matched_tasks": [t.title for t in matching_tasks]}
 
-def extract_task_deletion_request(message):
+def extract_task_deletion_request(message, user_id=None, db=None):
     """
     Extract task deletion details from a natural language message using the LLM
     Returns details about which task to delete
     """
-    # Get current date and time for context
-    current_date = datetime.now()
-    current_date_str = current_date.strftime("%Y-%m-%d")
-    current_time_str = current_date.strftime("%H:%M")
-    
-    # Calculate tomorrow and next week for explicit reference
-    tomorrow = current_date + timedelta(days=1)
-    tomorrow_str = tomorrow.strftime("%Y-%m-%d")
-    next_week = current_date + timedelta(days=7)
-    next_week_str = next_week.strftime("%Y-%m-%d")
-    
-    # Get task summary for context
-    task_summary = get_task_summary()
-    
-    system_prompt = f"""
-    You are an AI assistant that extracts task deletion information from user messages.
-    
-    CURRENT DATE INFORMATION:
-    TODAY'S DATE: {current_date_str} ({current_date.strftime("%A, %B %d, %Y")})
-    TOMORROW'S DATE: {tomorrow_str} ({tomorrow.strftime("%A, %B %d, %Y")})
-    NEXT WEEK STARTS: {next_week_str} ({next_week.strftime("%A, %B %d, %Y")})
-    CURRENT TIME: {current_time_str}
-    
-    CURRENT TASKS:
-    {task_summary}
-    
-    Extract the following details if present:
-    - Task Identifiers - Words/phrases that help identify which task the user wants to delete (title keywords, date references, etc.)
-    
-    The user may use phrases like "remove", "delete", "cancel", "get rid of", or similar to indicate they want to delete a task.
-    
-    Format your response as a valid JSON object with these fields:
-    {{
-        "is_delete_request": true/false,  # Whether the message is asking to delete a task
-        "task_identifiers": {{
-            "title_keywords": ["keyword1", "keyword2"],  # Words that might be in the task title
-            "date_reference": "YYYY-MM-DD or relative date description",  # Like "tomorrow", "next week", etc.
-            "time_reference": "HH:MM or description",  # Like "morning", "afternoon", "3pm", etc.
-            "other_descriptors": ["any other identifying information"]
-        }}
-    }}
-    
-    If the message isn't asking to delete a task, return {{"is_delete_request": false}}.
-    """
-    
-    ai_message = [
-        ("system", system_prompt),
-        ("user", message)
-    ]
-    
+    cache_key = _extraction_cache_key("extract_task_deletion_request", message, user_id)
+    cached = extraction_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Get the user's most relevant tasks for context
+    task_summary, _ = build_task_context(message, user_id, stage="extract_task_deletion_request", db=db)
+    ai_message = build_messages(DELETE_REQUEST_INSTRUCTIONS, message, task_summary)
     try:
-        response = llm.invoke(ai_message)
-        # Extract JSON from the response
-        json_match = re.search(r'```json\s*(.*?)\s*```', response.content, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
-        else:
-            json_str = response.content
-            
-        # Clean up the string to ensure it's valid JSON
-        json_str = re.sub(r'[\n\r\t]', '', json_str)
-        json_str = re.sub(r',$\s*}', '}', json_str)
-        
-        delete_data = json.loads(json_str)
+        delete_data = _invoke_structured("extract_task_deletion_request", ai_message, DeleteRequest, user_id)
+        extraction_cache.set(cache_key, delete_data)
         return delete_data
+    except LLMGatewayError:
+        raise
     except Exception as e:
-        print(f"Error extracting task deletion request: {str(e)}")
+        logger.exception("Error extracting task deletion request")
         return {"is_delete_request": False}
 
-def delete_task(task_id):
+def delete_task(task_id, db=None):
     """
     Delete a task with the specified ID
     Returns True if successful, False otherwise
     """
-    db = SessionLocal()
-    
     try:
-        task = db.query(Task).filter(Task.id == task_id).first()
-        if not task:
-            return None
-        
-        # Store task info before deletion for confirmation message
-        task_info = {
-            "id": task.id,
-            "title": task.title,
-            "description": task.description,
-            "priority": task.priority,
-            "deadline": task.deadline.strftime("%Y-%m-%d %H:%M"),
-            "duration": task.duration,
-            "is_due_date": task.is_due_date
-        }
-        
-        # Delete the task
-        db.delete(task)
-        db.commit()
-        return task_info
+        with unit_of_work(db) as db:
+            task = db.query(Task).filter(Task.id == task_id).first()
+            if not task:
+                return None
+            
+            # Store task info before deletion for confirmation message
+            task_info = {
+                "id": task.id,
+                "title": task.title,
+                "description": task.description,
+                "priority": task.priority,
+                "deadline": task.deadline.strftime("%Y-%m-%d %H:%M"),
+                "duration": task.duration,
+                "is_due_date": task.is_due_date
+            }
+            
+            # Delete the task
+            db.delete(task)
+            db.flush()
+            record_task_write(before=task, db=db)
+            return task_info
     except Exception as e:
-        print(f"Error deleting task: {str(e)}")
+        logger.exception("Error deleting task")
         return None
-    finally:
-        db.close()
 
-def handle_task_deletion_request(delete_data, user_id=None):
+def handle_task_deletion_request(delete_data, user_id=None, db=None):
     """
     Handle a task deletion request
-    Returns information about the result of the deletion
+    Returns information about the result of the deletion; dispatch_intent
+    adds the updated task list once the deletion is committed
     """
     if not delete_data.get("is_delete_request", False):
         return {"success": False, "message": "Not a deletion request"}
     
     # Search for tasks matching the criteria, filtered by user_id
     task_identifiers = delete_data.get("task_identifiers", {})
-    matching_tasks = search_tasks_by_criteria(task_identifiers, user_id)
+    matching_tasks = search_tasks_by_criteria(task_identifiers, user_id, db=db)
     
     if not matching_tasks:
         return {"success": False, "message": "No matching tasks found", "matched_tasks": []}
@@ -769,72 +853,154 @@ def handle_task_deletion_request(delete_data, user_id=None):
         }
     
     # Delete the task
-    task_info = delete_task(matching_tasks[0].id)
+    task_info = delete_task(matching_tasks[0].id, db=db)
     
     if task_info:
-        # Get updated task list
-        updated_task_list = format_task_list(user_id)
-        
         return {
             "success": True, 
             "message": "Task deleted successfully", 
-            "task": task_info,
-            "updated_task_list": updated_task_list
+            "task": task_info
         }
     else:
         return {"success": False, "message": "Failed to delete task", "matched_tasks": [t.title for t in matching_tasks]}
 
-def chat_with_ai(user_message, user_id=None):
-    """Chat with the AI about scheduling and tasks, with user context"""
-    # Get current date information for context
-    current_date = datetime.now()
-    current_date_str = current_date.strftime("%Y-%m-%d")
-    today_formatted = current_date.strftime("%A, %B %d, %Y")
-    
-    # First, try to extract a task deletion request
-    delete_data = extract_task_deletion_request(user_message)
-    
-    # If a deletion request was detected, handle it
-    delete_result = None
-    if delete_data.get("is_delete_request", False):
-        delete_result = handle_task_deletion_request(delete_data, user_id)
-        
-    # If not a deletion request, try to extract an edit request
-    edit_data = None
-    edit_result = None
-    if not delete_data.get("is_delete_request", False):
-        edit_data = extract_task_edit_request(user_message)
-        
-        # If an edit request was detected, handle it
-        if edit_data.get("is_edit_request", False):
-            edit_result = handle_task_edit_request(edit_data, user_id)
-    
-    # If no edit or delete request, continue with task extraction
-    task_data = None
-    created_task = None
-    task_created = False
-    uncertain_fields = []
-    needs_confirmation = False
-    
-    if (not delete_data.get("is_delete_request", False) and 
-        not (edit_data and edit_data.get("is_edit_request", False))):
-        # Try to extract a task
-        task_data = extract_task_from_message(user_message)
-        
-        # If a task was detected, create it
-        if task_data.get("is_task", False):
+def classify_message(message, user_id=None, db=None):
+    """
+    Classify a chat message and extract its payload with a single LLM call
+    Returns a dict with an "intent" of create, edit, delete or none, plus the
+    fields needed by the matching handler
+    """
+    # Simple "add a task" messages are parsed without the model, or the task list
+    parsed = _fast_path_parse("classify_message", message)
+    if parsed is not None:
+        return {"intent": "create", "task": parsed}
+
+    cache_key = _extraction_cache_key("classify_message", message, user_id)
+    cached = extraction_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Get the most relevant tasks so edit/delete requests can be matched to them
+    task_summary, _ = build_task_context(message, user_id, stage="classify_message", db=db)
+    # Don't hold a pooled connection while waiting for the model
+    release_connection(db)
+
+    try:
+        intent_data = _invoke_structured(
+            "classify_message", build_messages(CLASSIFY_INSTRUCTIONS, message, task_summary), ClassifiedMessage, user_id
+        )
+    except LLMGatewayError:
+        raise
+    except Exception as e:
+        logger.exception("Error classifying message")
+        return {"intent": "none"}
+    extraction_cache.set(cache_key, intent_data)
+    return intent_data
+
+async def aclassify_message(message, user_id=None, session=None):
+    """Async variant of classify_message using ainvoke and an AsyncSession"""
+    parsed = _fast_path_parse("classify_message", message)
+    if parsed is not None:
+        return {"intent": "create", "task": parsed}
+
+    cache_key = _extraction_cache_key("classify_message", message, user_id)
+    cached = extraction_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    task_summary, _ = await _run_db(session, build_task_context, message, user_id, stage="classify_message")
+    if session is not None:
+        await session.run_sync(release_connection)
+
+    try:
+        intent_data = await _ainvoke_structured(
+            "classify_message", build_messages(CLASSIFY_INSTRUCTIONS, message, task_summary), ClassifiedMessage, user_id
+        )
+    except LLMGatewayError:
+        raise
+    except Exception as e:
+        logger.exception("Error classifying message")
+        return {"intent": "none"}
+    extraction_cache.set(cache_key, intent_data)
+    return intent_data
+
+def dispatch_intent(intent_data, user_id=None, db=None):
+    """
+    Send a classified message to the matching task handler
+    The handler's writes run as one unit of work with a single commit
+    Returns the handler results in the shape chat_with_ai expects
+    """
+    result = {
+        "intent": intent_data.get("intent", "none"),
+        "delete_result": None,
+        "edit_result": None,
+        "task_data": None,
+        "created_task": None,
+        "uncertain_fields": [],
+        "needs_confirmation": False,
+        "conflicts": [],
+        "updated_task_list": None
+    }
+
+    with unit_of_work(db) as session:
+        if result["intent"] == "delete":
+            delete_data = {
+                "is_delete_request": True,
+                "task_identifiers": intent_data.get("task_identifiers") or {}
+            }
+            result["delete_result"] = handle_task_deletion_request(delete_data, user_id, db=session)
+        elif result["intent"] == "edit":
+            edit_data = {
+                "is_edit_request": True,
+                "task_identifiers": intent_data.get("task_identifiers") or {},
+                "changes": intent_data.get("changes") or {}
+            }
+            result["edit_result"] = handle_task_edit_request(edit_data, user_id, db=session)
+        elif result["intent"] == "create":
+            task_data = dict(intent_data.get("task") or {})
+            task_data["is_task"] = True
             # Add user_id to the task data if provided
             if user_id is not None:
                 task_data["user_id"] = user_id
-                
-            result = create_task_from_extraction(task_data)
-            if result:
-                created_task, uncertain_fields, needs_confirmation = result
-                task_created = created_task is not None
-    
-    # Get current tasks for context - filtered by user_id
-    task_summary = get_task_summary(user_id)
-    
+            result["task_data"] = task_data
+
+            try:
+                created_task, uncertain_fields, needs_confirmation = create_task_from_extraction(task_data, db=session)
+            except TaskConflictError as e:
+                created_task, uncertain_fields, needs_confirmation = None, [], False
+                result["conflicts"] = _conflict_info(e.conflicts)
+            result["created_task"] = created_task
+            result["uncertain_fields"] = uncertain_fields
+            result["needs_confirmation"] = needs_confirmation
+
+    # Get the updated task list once the writes are committed: task-state
+    # versions only move on commit, so a list built inside the unit of work
+    # would come from the snapshot taken before the write
+    handled = [r for r in (result["delete_result"], result["edit_result"]) if r is not None and r["success"]]
+    if result["created_task"] is not None or handled:
+        result["updated_task_list"] = format_task_list(user_id, db=db)
+        for handler_result in handled:
+            handler_result["updated_task_list"] = result["updated_task_list"]
+
+    return result
+
+def _format_conflicts(conflicts):
+    return "\n".join(f"- {task['title']} ({task['deadline']}, {task['duration']} minutes)" for task in conflicts)
+
+def _build_reply_messages(user_message, task_summary, dispatched):
+    """Build the final conversational prompt from the handler results"""
+    # Get current date information for context
+    current_date = datetime.now()
+    today_formatted = current_date.strftime("%A, %B %d, %Y")
+
+    delete_result = dispatched["delete_result"]
+    edit_result = dispatched["edit_result"]
+    task_data = dispatched["task_data"]
+    created_task = dispatched["created_task"]
+    task_created = created_task is not None
+    uncertain_fields = dispatched["uncertain_fields"]
+    needs_confirmation = dispatched["needs_confirmation"]
+
     # Create a system message with context about the app and current tasks
     system_message = (
         "You are an AI scheduling assistant that helps users manage their tasks and time effectively. "
@@ -880,7 +1046,10 @@ def chat_with_ai(user_message, user_id=None):
             if edit_result.get('matched_tasks'):
                 system_message += f"\nMatched tasks: {', '.join(edit_result['matched_tasks'])}"
             
-            if not edit_result['matched_tasks']:
+            if edit_result.get('conflicts'):
+                system_message += f"\nThe change would overlap these scheduled tasks:\n{_format_conflicts(edit_result['conflicts'])}"
+                user_message += "\n\n[SYSTEM: I didn't make this change because it would overlap other tasks. Suggest another time or ask which task to move.]"
+            elif not edit_result['matched_tasks']:
                 user_message += "\n\n[SYSTEM: I couldn't find a task matching your description. Please try again with more details about which task you want to edit.]"
             else:
                 user_message += "\n\n[SYSTEM: I found the task but couldn't update it. Please try again with clearer instructions for what you want to change.]"
@@ -911,22 +1080,31 @@ def chat_with_ai(user_message, user_id=None):
                 system_message += "\n\nAsk about these uncertain fields in a conversational way. Don't list them all at once - focus on 1-2 most important ones (duration and priority first)."
             else:
                 user_message += "\n\n[SYSTEM: I've created this task for you. Please confirm if the details are correct.]"
+        elif dispatched["conflicts"]:
+            system_message += f"\n\nThe task was not created because it would overlap these scheduled tasks:\n{_format_conflicts(dispatched['conflicts'])}"
+            user_message += "\n\n[SYSTEM: I didn't create this task because it overlaps other tasks. Suggest another time or ask which task to move.]"
         else:
             user_message += "\n\n[SYSTEM: I tried to create a task but encountered an error. Please try again with more details.]"
     
     # Create the conversation
-    ai_message = [
+    return [
         ("system", system_message),
         ("user", user_message)
     ]
-    
-    # Get response from the AI
-    response = llm.invoke(ai_message)
-    
+
+def _format_confirmation(dispatched):
+    """
+    Build the confirmation block shown above the AI reply
+    Returns an empty string when no task was created, updated or deleted
+    """
+    delete_result = dispatched["delete_result"]
+    edit_result = dispatched["edit_result"]
+    created_task = dispatched["created_task"]
+
     # If a task was deleted, add a confirmation to the response
     if delete_result and delete_result["success"]:
         task = delete_result["task"]
-        task_info = f"""
+        return f"""
 ✅ Task deleted successfully:
 📌 Title: {task["title"]}
 📝 Description: {task["description"]}
@@ -936,12 +1114,11 @@ def chat_with_ai(user_message, user_id=None):
 
 {delete_result.get("updated_task_list", "")}
 """
-        return f"{task_info}\n\n{response.content}"
     
-    # If a task was edited, add a confirmation to the response (existing code)
+    # If a task was edited, add a confirmation to the response
     if edit_result and edit_result["success"]:
         task = edit_result["task"]
-        task_info = f"""
+        return f"""
 ✅ Task updated successfully:
 📌 Title: {task["title"]}
 📝 Description: {task["description"]}
@@ -953,14 +1130,10 @@ Changed properties: {', '.join(edit_result["changed_properties"])}
 
 {edit_result.get("updated_task_list", "")}
 """
-        return f"{task_info}\n\n{response.content}"
     
-    # If a task was created, add a confirmation to the response (existing code)
-    if task_created:
-        # Get updated task list
-        updated_task_list = format_task_list(user_id)
-        
-        task_info = f"""
+    # If a task was created, add a confirmation to the response
+    if created_task is not None:
+        return f"""
 ✅ Task created successfully:
 📌 Title: {created_task.title}
 📝 Description: {created_task.description}
@@ -968,8 +1141,70 @@ Changed properties: {', '.join(edit_result["changed_properties"])}
 🕒 Time: {created_task.deadline.strftime('%Y-%m-%d %H:%M')}
 ⏱️ Duration: {created_task.duration} minutes
 
-{updated_task_list}
+{dispatched["updated_task_list"]}
 """
-        return f"{task_info}\n\n{response.content}"
     
-    return response.content
+    return ""
+
+def _compose_reply(dispatched, reply):
+    """Prefix the AI reply with the confirmation block, if any"""
+    task_info = _format_confirmation(dispatched)
+    if task_info:
+        return f"{task_info}\n\n{reply}"
+    return reply
+
+def chat_with_ai(user_message, user_id=None, db=None):
+    """
+    Chat with the AI about scheduling and tasks, with user context
+    Every query of the turn runs on one session (e.g. from the get_db
+    dependency) and its writes commit once
+    """
+    with session_scope(db) as db:
+        # Classify the message and run the matching handler in one LLM round-trip
+        dispatched = dispatch_intent(classify_message(user_message, user_id, db=db), user_id, db=db)
+
+        # Get current tasks for context - filtered by user_id
+        task_summary = get_task_summary(user_id, db=db)
+        release_connection(db)
+
+    # Get response from the AI
+    response = _invoke_llm("chat_reply", _build_reply_messages(user_message, task_summary, dispatched), user_id)
+    return _compose_reply(dispatched, response.content)
+
+async def _prepare_chat_turn(user_message, user_id, session):
+    """Classify, dispatch and summarize on one AsyncSession, releasing its connection before the reply"""
+    intent_data = await aclassify_message(user_message, user_id, session)
+    dispatched = await _run_db(session, dispatch_intent, intent_data, user_id)
+    task_summary = await _run_db(session, get_task_summary, user_id)
+    await session.run_sync(release_connection)
+    return dispatched, task_summary
+
+async def achat_with_ai(user_message, user_id=None, session=None):
+    """
+    Async variant of chat_with_ai
+    Awaits the model with ainvoke and runs every query on one AsyncSession
+    (injected by the route, or opened here), so a slow model reply does not
+    block other requests on the event loop
+    """
+    async with async_session_scope(session) as session:
+        dispatched, task_summary = await _prepare_chat_turn(user_message, user_id, session)
+
+    response = await _ainvoke_llm("chat_reply", _build_reply_messages(user_message, task_summary, dispatched), user_id)
+    return _compose_reply(dispatched, response.content)
+
+async def astream_chat_with_ai(user_message, user_id=None, session=None):
+    """
+    Streaming variant of achat_with_ai
+    Yields ("confirmation", text) as soon as a task mutation is done, then
+    ("token", text) for each piece of the model's reply as it arrives
+    """
+    async with async_session_scope(session) as session:
+        dispatched, task_summary = await _prepare_chat_turn(user_message, user_id, session)
+
+    task_info = _format_confirmation(dispatched)
+    if task_info:
+        yield "confirmation", f"{task_info}\n\n"
+
+    async for chunk in _astream_llm("chat_reply", _build_reply_messages(user_message, task_summary, dispatched), user_id):
+        if chunk.content:
+            yield "token", chunk.content
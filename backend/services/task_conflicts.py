@@ -0,0 +1,194 @@
+"""
+Overlap checks for scheduled tasks.
+
+A scheduled task (not is_due_date, with a user) occupies
+[deadline, deadline + duration), as in services/scheduling.py, and may not
+overlap another scheduled task of the same user. The database enforces it
+on every write path, including batches and imports:
+
+    Postgres  a generated tsrange column, tasks.slot, under a GiST exclusion
+              constraint (btree_gist provides the user_id equality)
+    SQLite    an R*Tree of slots in whole minutes kept by triggers, and
+              BEFORE INSERT/UPDATE triggers that abort an overlapping write
+
+Both report the violation as tasks_no_overlap. Writers turn it into a
+TaskConflictError with conflict_error(), which looks up the tasks in the way
+through the same index; find_conflicts() and find_conflicting_pairs() serve
+GET /tasks/conflicts. Databases without either setup fall back to a bounded
+scan of the (user_id, deadline) index.
+
+The SQLite triggers fire per row, so a single statement that moves tasks
+into each other's slots (a batch swapping two tasks' times) is rejected
+there even though its result does not overlap; Postgres checks the
+constraint once the statement is done.
+
+The DDL lives next to the Task model (see models.py) and in migrate_db.py
+for existing Postgres databases. Occurrences of recurring tasks are out of
+scope: rules are expanded per query window (services/recurrence.py), so
+neither database has rows to check them against, and a task booked over an
+occurrence is accepted.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, column, func, select, table, text
+
+from models import Task
+from services.scheduling import task_interval
+from services.task_state import TaskRow
+
+CONSTRAINT_NAME = "tasks_no_overlap"
+SLOTS_TABLE = "tasks_slots"
+_slots = table(SLOTS_TABLE, column("id"), column("user_min"), column("user_max"), column("start_min"), column("end_max"))
+
+# Postgres SQLSTATE for exclusion_violation
+_EXCLUSION_VIOLATION = "23P01"
+
+# R*Tree coordinates are whole minutes since this (naive, like deadlines)
+_EPOCH = datetime(1970, 1, 1)
+
+_COLUMNS = [getattr(Task, name) for name in TaskRow._fields if name != "recurrence_id"]
+
+class TaskConflictError(Exception):
+    """A scheduled task would overlap other scheduled tasks of its user"""
+
+    def __init__(self, conflicts, message=None):
+        if message is None:
+            titles = ", ".join(f'"{task.title}"' for task in conflicts[:3])
+            message = f"Task overlaps {len(conflicts)} scheduled task(s)" + (f": {titles}" if titles else "")
+        super().__init__(message)
+        self.conflicts = conflicts
+
+# Detected backend per database URL
+_backends = {}
+
+def conflict_backend(db):
+    """Return "exclusion", "rtree" or "scan" for the session's database"""
+    bind = db.get_bind()
+    key = str(bind.url)
+    if key not in _backends:
+        backend = "scan"
+        if bind.dialect.name == "postgresql":
+            if db.execute(text(
+                "SELECT 1 FROM information_schema.columns WHERE table_name = 'tasks' AND column_name = 'slot'"
+            )).first():
+                backend = "exclusion"
+        elif bind.dialect.name == "sqlite":
+            if db.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": SLOTS_TABLE}).first():
+                backend = "rtree"
+        _backends[key] = backend
+    return _backends[key]
+
+def task_slot(task):
+    """(start, end) of a task or TaskRow, or None if it books no time"""
+    interval = task_interval(task)
+    return interval[:2] if interval else None
+
+def is_conflict_error(error):
+    """Whether a database error is the overlap constraint or trigger firing"""
+    orig = getattr(error, "orig", error)
+    return getattr(orig, "pgcode", None) == _EXCLUSION_VIOLATION or CONSTRAINT_NAME in str(orig)
+
+def _epoch_minutes(moment, round_up=False):
+    seconds = (moment - _EPOCH).total_seconds()
+    minutes = int(seconds // 60)
+    return minutes + 1 if round_up and minutes * 60 < seconds else minutes
+
+def _overlapping(rows, start, end):
+    """Exact overlap check on candidate rows, which the indexes over-select"""
+    conflicts = []
+    for row in rows:
+        slot = task_slot(row)
+        if slot and slot[0] < end and slot[1] > start:
+            conflicts.append(row)
+    return conflicts
+
+def find_conflicts(db, user_id, start, end, exclude_id=None):
+    """Scheduled tasks of a user that overlap [start, end), as TaskRows in deadline order"""
+    if user_id is None:
+        return []
+    query = db.query(*_COLUMNS)
+    if exclude_id is not None:
+        query = query.filter(Task.id != exclude_id)
+
+    backend = conflict_backend(db)
+    if backend == "exclusion":
+        query = query.filter(Task.user_id == user_id, text("tasks.slot && tsrange(:slot_start, :slot_end)").bindparams(
+            slot_start=start, slot_end=end
+        ))
+    elif backend == "rtree":
+        # The boxes pin user_id; filtering tasks on it too would let SQLite
+        # read the user's tasks through their index instead of the R*Tree
+        candidates = select(_slots.c.id).where(
+            _slots.c.user_min <= user_id, _slots.c.user_max >= user_id,
+            _slots.c.start_min < _epoch_minutes(end, round_up=True), _slots.c.end_max > _epoch_minutes(start)
+        )
+        query = query.filter(Task.id.in_(candidates))
+    else:
+        query = query.filter(Task.user_id == user_id)
+        # Only tasks starting within the longest duration before `start` can reach it
+        longest = db.query(func.max(Task.duration)).filter(Task.user_id == user_id).scalar()
+        reach = timedelta(minutes=max(longest or 0, 60))
+        query = query.filter(Task.deadline < end, Task.deadline > start - reach)
+
+    rows = [TaskRow(*row) for row in query.order_by(Task.deadline, Task.id)]
+    return _overlapping(rows, start, end)
+
+def find_conflicting_pairs(db, user_id):
+    """Pairs of a user's scheduled tasks that overlap, as (earlier, later) TaskRows"""
+    backend = conflict_backend(db)
+    if backend == "scan":
+        tasks = [TaskRow(*row) for row in db.query(*_COLUMNS).filter(Task.user_id == user_id).order_by(Task.deadline, Task.id)]
+        return _sweep(tasks)
+
+    if backend == "exclusion":
+        pairs = db.execute(text(
+            "SELECT a.id, b.id FROM tasks a JOIN tasks b "
+            "ON b.user_id = a.user_id AND b.slot && a.slot AND b.id > a.id "
+            "WHERE a.user_id = :user_id"
+        ), {"user_id": user_id}).all()
+    else:
+        a, b = _slots.alias("a"), _slots.alias("b")
+        pairs = db.execute(select(a.c.id, b.c.id).join(b, and_(
+            b.c.user_min <= user_id, b.c.user_max >= user_id,
+            b.c.start_min < a.c.end_max, b.c.end_max > a.c.start_min, b.c.id > a.c.id
+        )).where(a.c.user_min <= user_id, a.c.user_max >= user_id)).all()
+    if not pairs:
+        return []
+
+    ids = {task_id for pair in pairs for task_id in pair}
+    tasks = {row.id: TaskRow(*row) for row in db.query(*_COLUMNS).filter(Task.id.in_(ids))}
+    result = []
+    for first_id, second_id in pairs:
+        first, second = sorted((tasks[first_id], tasks[second_id]), key=TaskRow.sort_key)
+        if _overlapping([second], *task_slot(first)):
+            result.append((first, second))
+    return sorted(result, key=lambda pair: (pair[0].sort_key(), pair[1].sort_key()))
+
+def find_overlapping_pairs(tasks):
+    """Overlapping pairs among task rows in any order, regardless of user"""
+    return _sweep(sorted(tasks, key=lambda task: task.deadline))
+
+def _sweep(tasks):
+    """Overlapping pairs among tasks sorted by deadline"""
+    pairs = []
+    active = []
+    for task in tasks:
+        slot = task_slot(task)
+        if slot is None:
+            continue
+        active = [(other, end) for other, end in active if end > slot[0]]
+        pairs.extend((other, task) for other, _ in active)
+        active.append((task, slot[1]))
+    return pairs
+
+def conflict_error(db, error, task, exclude_id=None):
+    """
+    The TaskConflictError for a write rejected by the overlap constraint, or
+    None for any other error. `task` is the row as it was to be written; the
+    session must already be rolled back
+    """
+    if not is_conflict_error(error):
+        return None
+    slot = task_slot(task)
+    conflicts = find_conflicts(db, task.user_id, *slot, exclude_id=exclude_id) if slot else []
+    return TaskConflictError(conflicts)
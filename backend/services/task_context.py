@@ -0,0 +1,96 @@
+"""
+Task context for the edit/delete extraction prompts.
+
+Instead of embedding every task in the prompt, build_task_context() ranks the
+user's tasks (and the coming occurrences of their recurring tasks) by keyword
+overlap with the message and by how close their deadline is, then keeps the
+top-K that fit in a token budget.
+"""
+from datetime import datetime
+import os
+import re
+
+from services.metrics import Counter
+from services.recurrence import get_task_view
+
+TOKEN_BUDGET = int(os.getenv("TASK_CONTEXT_TOKEN_BUDGET", "800"))
+TOP_K = int(os.getenv("TASK_CONTEXT_TOP_K", "25"))
+
+PROMPT_TOKENS_SAVED = Counter(
+    "task_context_prompt_tokens_saved_total",
+    "Estimated prompt tokens saved by trimming the task context",
+    ("stage",)
+)
+
+_STOP_WORDS = {
+    "the", "and", "for", "with", "from", "that", "this", "task", "tasks", "please",
+    "my", "to", "at", "on", "in", "of", "a", "an", "it", "me", "can", "you"
+}
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+def _keywords(text):
+    return {word for word in re.findall(r"[a-z0-9]+", text.lower()) if len(word) > 2 and word not in _STOP_WORDS}
+
+def _format_task_line(task):
+    deadline = task.deadline.strftime("%Y-%m-%d %H:%M")
+    return f"- {task.title} (Priority: {task.priority}, Deadline: {deadline})\n"
+
+def _relevance(task, message_keywords, now):
+    """Keyword overlap dominates; deadline proximity breaks ties"""
+    title_overlap = len(message_keywords & _keywords(task.title or ""))
+    description_overlap = len(message_keywords & _keywords(task.description or ""))
+    days_away = abs((task.deadline - now).total_seconds()) / 86400
+    return 2 * title_overlap + description_overlap + 1 / (1 + days_away)
+
+def build_task_context(message, user_id=None, token_budget=None, top_k=None, stage="task_context", db=None):
+    """
+    Build the CURRENT TASKS block for a prompt
+    Returns (context, stats), where stats reports how many tasks were kept and
+    how many prompt tokens were saved compared with the full task list
+    """
+    token_budget = TOKEN_BUDGET if token_budget is None else token_budget
+    top_k = TOP_K if top_k is None else top_k
+
+    tasks = get_task_view(user_id, db=db)
+    if not tasks:
+        context = "You currently have no tasks scheduled."
+        return context, {"total_tasks": 0, "included_tasks": 0, "context_tokens": estimate_tokens(context), "tokens_saved": 0}
+
+    header = "Here are your current tasks:\n"
+    # Keyed by sort_key, since occurrences of recurring tasks have no id
+    lines = {task.sort_key(): _format_task_line(task) for task in tasks}
+    full_tokens = estimate_tokens(header + "".join(lines.values()))
+
+    now = datetime.now()
+    message_keywords = _keywords(message)
+    ranked = sorted(tasks, key=lambda task: _relevance(task, message_keywords, now), reverse=True)
+
+    selected = []
+    used_tokens = estimate_tokens(header)
+    for task in ranked[:top_k]:
+        line_tokens = estimate_tokens(lines[task.sort_key()])
+        if used_tokens + line_tokens > token_budget:
+            break
+        selected.append(task)
+        used_tokens += line_tokens
+
+    # Present the selection in deadline order, like the full summary
+    selected.sort(key=lambda task: task.sort_key())
+    context = header + "".join(lines[task.sort_key()] for task in selected)
+    omitted = len(tasks) - len(selected)
+    if omitted:
+        context += f"({omitted} less relevant tasks not shown)\n"
+
+    context_tokens = estimate_tokens(context)
+    tokens_saved = max(0, full_tokens - context_tokens)
+    PROMPT_TOKENS_SAVED.inc(tokens_saved, stage=stage)
+
+    return context, {
+        "total_tasks": len(tasks),
+        "included_tasks": len(selected),
+        "context_tokens": context_tokens,
+        "tokens_saved": tokens_saved
+    }
@@ -0,0 +1,417 @@
+"""
+Rule-based parser for simple "add a task" messages.
+
+parse_task_message() turns messages like "dentist tomorrow 3pm-4pm high
+priority" into the same dict extract_task_from_message() gets from the model
+(title, priority, date, start_time, end_time, is_due_date, uncertain_fields),
+plus a confidence score between 0 and 1. It understands:
+- relative and absolute dates: today, tonight, tomorrow, the day after
+  tomorrow, in N days, weekday names, next week, 2024-05-03, May 3, 3rd of May
+- 12h and 24h times: 3pm, 3:30 p.m., 15:00, at 15, noon, midnight
+- ranges: 3-4pm, 3pm to 4:30pm, from 9 to 11am, between 2 and 3pm
+- durations: for 90 minutes, for 1.5 hours, for an hour, for half an hour
+- priority words: high/low priority, urgent, important, asap
+- deadlines: due, by, before
+
+Anything it cannot account for lowers the confidence: questions, edit or
+delete wording, several tasks in one message, leftover numbers, times
+without am/pm that could be either. Messages that drop, skip, look up, mark
+or talk about the schedule ("skip gym tomorrow at 6pm", "show my tasks
+tomorrow", "tomorrow 3pm works for me") are not handled at all, and without
+an explicit cue such as "add" or "remind me to" the title must read like a
+task name, not a sentence. Callers only use the result when the confidence
+reaches FAST_PATH_MIN_CONFIDENCE and send everything else to the model.
+"""
+from datetime import datetime, timedelta
+import os
+import re
+
+# Results below this confidence go to the model; set above 1 to disable
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.8"))
+
+# Messages that are not plain "create a task" requests
+_QUESTION_WORDS = ("what", "when", "where", "why", "how", "which", "who", "do", "does", "did", "can", "could",
+                   "should", "would", "is", "are", "am", "will", "any")
+# First words of chit-chat and of commands about existing tasks
+_NOT_CREATE_FIRST_WORDS = ("hi", "hello", "hey", "ok", "okay", "yes", "yeah", "yep", "no", "nope", "sure", "cool",
+                           "great", "nice", "perfect", "make")
+_NOT_CREATE_PATTERN = re.compile(
+    r"\?|\b(delete[ds]?|deleting|remov(?:e[ds]?|ing)|cancel(?:l?ed|l?ing|s)?|call(?:ed|ing)? off|get rid of|"
+    r"drop(?:s|ped|ping)?|skip(?:s|ped|ping)?|scrap(?:s|ped|ping)?|nix(?:ed|ing)?|ditch(?:ed|ing)?|"
+    r"forget|forgot|erase[ds]?|undo|unschedule[ds]?|no longer|not going|won'?t|can'?t|cannot|"
+    r"mov(?:e[ds]?|ing)|reschedul(?:e[ds]?|ing)|chang(?:e[ds]?|ing)|renam(?:e[ds]?|ing)|updat(?:e[ds]?|ing)|"
+    r"edit(?:s|ed|ing)?|postpon(?:e[ds]?|ing)|delay(?:s|ed|ing)?|push back|push(?:ed)?|shift(?:ed)?|bump(?:ed)?|"
+    r"clear|don'?t|do not|never ?mind|instead|"
+    # Looking at or marking the schedule rather than adding to it
+    r"show|list|display|view|what'?s|whats|mark|marked|done|complete|completed|finished|swap|switch|replace|"
+    r"set(?!\s+up)|free|available|busy|"
+    # Replies and small talk that happen to mention a time
+    r"thanks|thank you|thx|cheers|works|sounds|see you|bye)\b",
+    re.IGNORECASE
+)
+_MULTIPLE_TASKS_PATTERN = re.compile(r"\b(and then|then|also)\b|;|\band\b.*\b(at|on|tomorrow|today)\b", re.IGNORECASE)
+
+_CREATE_CUES = (
+    r"(?:add|create|schedule|put|set up|new task:?|task:?|remind me to|remind me about|remind me|"
+    r"i have to|i have|i need to|i've got|i got|need to|have to|todo:?|to-do:?)"
+)
+_LEADING_FILLER = re.compile(
+    r"^\s*(?:please\s+)?(?:(?:can|could) you\s+)?" + _CREATE_CUES + r"?\s*(?:an?\s+)?",
+    re.IGNORECASE
+)
+_CREATE_CUE = re.compile(r"^\s*(?:please\s+)?" + _CREATE_CUES + r"(?!\w)", re.IGNORECASE)
+# Words that make a title read as a sentence about the schedule, not a task name
+_SENTENCE_WORDS = re.compile(
+    r"\b(?:i|i'm|im|me|my|mine|you|your|we|us|our|it|its|they|them|there|here|anything|something|everything|"
+    r"tasks?|schedule|calendar|agenda|plans?)\b",
+    re.IGNORECASE
+)
+# A title ending in one of these lost its object to the date or time cut
+_TRAILING_WORDS = re.compile(r"\b(?:to|with|as|and|or|into|onto)$", re.IGNORECASE)
+# Words left dangling once dates and times are cut out of the title
+_DANGLING_WORDS = re.compile(
+    r"\b(?:at|on|from|for|by|due|before|between|in|the|this|next|of|around|@|priority|please|deadline|is)\s*$",
+    re.IGNORECASE
+)
+
+_WEEKDAYS = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6,
+    "mon": 0, "tue": 1, "tues": 1, "wed": 2, "thu": 3, "thur": 3, "thurs": 3, "fri": 4, "sat": 5, "sun": 6
+}
+_MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3, "apr": 4, "april": 4,
+    "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7, "aug": 8, "august": 8,
+    "sep": 9, "sept": 9, "september": 9, "oct": 10, "october": 10, "nov": 11, "november": 11,
+    "dec": 12, "december": 12
+}
+_MONTH = r"(" + "|".join(sorted(_MONTHS, key=len, reverse=True)) + r")\.?"
+_FULL_WEEKDAY = r"(monday|tuesday|wednesday|thursday|friday|saturday|sunday)"
+_SHORT_WEEKDAY = r"(mon|tues?|wed|thu(?:rs?)?|fri|sat|sun)"
+
+_DATE_PATTERNS = [
+    ("iso", re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")),
+    ("day_after_tomorrow", re.compile(r"\b(?:the\s+)?day after (?:tomorrow|tmrw|tmr)\b", re.IGNORECASE)),
+    ("tomorrow", re.compile(r"\b(?:tomorrow|tomorow|tmrw|tmr)\b", re.IGNORECASE)),
+    ("today", re.compile(r"\b(today|tonight|this (?:morning|afternoon|evening))\b", re.IGNORECASE)),
+    ("in_days", re.compile(r"\bin (\d{1,2}) days?\b", re.IGNORECASE)),
+    ("next_week", re.compile(r"\bnext week\b", re.IGNORECASE)),
+    ("weekday", re.compile(r"\b(?:(next|this|on)\s+)?" + _FULL_WEEKDAY + r"\b", re.IGNORECASE)),
+    # Short weekday names ("sat", "sun") are ordinary words too, so need a prefix
+    ("weekday", re.compile(r"\b(next|this|on)\s+" + _SHORT_WEEKDAY + r"\b", re.IGNORECASE)),
+    ("month_day", re.compile(r"\b" + _MONTH + r"\s+(\d{1,2})(?:st|nd|rd|th)?\b", re.IGNORECASE)),
+    ("day_month", re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?" + _MONTH + r"(?!\w)", re.IGNORECASE))
+]
+
+_TIME = r"(?:\d{1,2}(?::\d{2})?\s*(?:[ap]\.?m\.?|[ap]\b)?|noon|midday|midnight)"
+_TIME_PARTS = re.compile(r"^(?:(\d{1,2})(?::(\d{2}))?\s*(?:([ap])\.?m?\.?)?|(noon|midday|midnight))$", re.IGNORECASE)
+_RANGE_PATTERN = re.compile(
+    r"(?:\b(?:from|between)\s+)?(?<![\w:])(" + _TIME + r")\s*(?:-|–|\bto\b|\buntil\b|\btill\b|\band\b)\s*(" + _TIME + r")(?![\w:])",
+    re.IGNORECASE
+)
+_TIME_PATTERN = re.compile(r"(?:(\b(?:at|around)\s+|@\s*))?(?<![\w:])(" + _TIME + r")(?![\w:])", re.IGNORECASE)
+_DURATION_PATTERN = re.compile(
+    r"\b(?:for\s+)?(half an?|an?|one|\d+(?:\.\d+)?)\s*(hours?|hrs?|h|minutes?|mins?|m)\b",
+    re.IGNORECASE
+)
+_PRIORITY_PATTERNS = [
+    (re.compile(r"\b(?:high|top|highest)[\s-]+priority\b|\bpriority[:\s]+high\b|\b(?:urgent|urgently|asap|important)\b",
+                re.IGNORECASE), "High"),
+    (re.compile(r"\b(?:low|lowest)[\s-]+priority\b|\bpriority[:\s]+low\b|\bnot urgent\b|\bwhenever\b", re.IGNORECASE), "Low"),
+    (re.compile(r"\b(?:normal|medium|regular)[\s-]+priority\b|\bpriority[:\s]+(?:normal|medium)\b", re.IGNORECASE), "Normal")
+]
+_DUE_PATTERN = re.compile(r"\b(?:due|deadline)\b", re.IGNORECASE)
+_DUE_BEFORE_PATTERN = re.compile(r"\b(?:by|before|due(?:\s+(?:on|by|at))?)\s*$", re.IGNORECASE)
+
+def _parse_time(text):
+    """
+    Parse one time expression
+    Returns (hour, minute, meridiem) where meridiem is "a", "p" or None, or
+    None if the text is not a valid time
+    """
+    match = _TIME_PARTS.match(text.strip())
+    if not match:
+        return None
+    hour_text, minute_text, meridiem, word = match.groups()
+    if word:
+        return (0, 0, "a") if word.lower() == "midnight" else (12, 0, "p")
+    hour, minute = int(hour_text), int(minute_text or 0)
+    if minute > 59:
+        return None
+    meridiem = meridiem.lower() if meridiem else None
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "p" else 0)
+    elif hour > 23:
+        return None
+    return hour, minute, meridiem
+
+def _is_ambiguous(parsed, text):
+    """A bare 1-12 hour such as "at 7" could be morning or evening"""
+    hour, _, meridiem = parsed
+    return meridiem is None and ":" not in text and 1 <= hour <= 12 and not re.search(r"noon|midday|midnight", text, re.I)
+
+def _resolve_ambiguous(hour):
+    """Guess a bare hour the way people usually mean it: 1-6 is afternoon"""
+    return hour + 12 if 1 <= hour <= 6 else hour
+
+def _next_weekday(today, weekday, qualifier):
+    days = (weekday - today.weekday()) % 7
+    if days == 0 and qualifier != "this":
+        days = 7
+    return today + timedelta(days=days)
+
+def _month_date(today, month, day):
+    """The next date with this month and day, this year or next"""
+    try:
+        date = today.replace(month=month, day=day)
+    except ValueError:
+        return None
+    if date < today:
+        try:
+            date = date.replace(year=today.year + 1)
+        except ValueError:
+            return None
+    return date
+
+def _find_date(text, today):
+    """
+    Find the date in the message
+    Returns (date, span, uncertain) or None; raises ValueError when the
+    message mentions more than one date
+    """
+    found = []
+    taken = []
+    for kind, pattern in _DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            if any(start < match.end() and match.start() < end for start, end in taken):
+                continue
+            taken.append(match.span())
+            groups = match.groups()
+            uncertain = False
+            if kind == "iso":
+                try:
+                    date = today.replace(year=int(groups[0]), month=int(groups[1]), day=int(groups[2]))
+                except ValueError:
+                    continue
+            elif kind == "day_after_tomorrow":
+                date = today + timedelta(days=2)
+            elif kind == "tomorrow":
+                date = today + timedelta(days=1)
+            elif kind == "today":
+                date = today
+            elif kind == "in_days":
+                date = today + timedelta(days=int(groups[0]))
+            elif kind == "next_week":
+                # Which day of next week is anyone's guess
+                date, uncertain = today + timedelta(days=7), True
+            elif kind == "weekday":
+                qualifier = (groups[0] or "").lower()
+                date = _next_weekday(today, _WEEKDAYS[groups[1].lower()], qualifier)
+                # "next friday" means this coming friday to some people and the one after to others
+                uncertain = qualifier == "next"
+            elif kind == "month_day":
+                date = _month_date(today, _MONTHS[groups[0].lower()], int(groups[1]))
+            else:
+                date = _month_date(today, _MONTHS[groups[1].lower()], int(groups[0]))
+            if date is None:
+                continue
+            found.append((date, match.span(), uncertain))
+    if len(found) > 1:
+        raise ValueError("more than one date")
+    return found[0] if found else None
+
+def _find_times(text):
+    """
+    Find the start and end time
+    Returns (start, end, spans, ambiguous) with times as (hour, minute) or None
+    """
+    match = _RANGE_PATTERN.search(text)
+    if match:
+        start_text, end_text = match.group(1), match.group(2)
+        start, end = _parse_time(start_text), _parse_time(end_text)
+        if start and end:
+            ambiguous = False
+            if start[2] is None and end[2] is not None:
+                # "3-4pm": the start takes the end's am/pm unless that would put it after the end
+                hour = start[0] % 12 + (12 if end[2] == "p" else 0)
+                if hour > end[0]:
+                    hour = start[0] % 12 + (0 if end[2] == "p" else 12)
+                start = (hour, start[1], end[2])
+            elif start[2] is not None and end[2] is None and _is_ambiguous(end, end_text):
+                hour = end[0] % 12 + (12 if start[2] == "p" else 0)
+                if hour < start[0]:
+                    hour = end[0] % 12 + (12 if start[2] == "a" else 0)
+                end = (hour, end[1], start[2])
+            elif _is_ambiguous(start, start_text) and _is_ambiguous(end, end_text):
+                ambiguous = True
+                start = (_resolve_ambiguous(start[0]), start[1], None)
+                end = (_resolve_ambiguous(end[0]), end[1], None)
+                if end[0] < start[0]:
+                    end = (end[0] + 12, end[1], None) if end[0] + 12 < 24 else end
+            return (start[0], start[1]), (end[0], end[1]), [match.span()], ambiguous
+
+    for match in _TIME_PATTERN.finditer(text):
+        prefix, time_text = match.group(1), match.group(2)
+        parsed = _parse_time(time_text)
+        if parsed is None:
+            continue
+        # A bare number is only a time after "at"/"@" or with am/pm or minutes
+        explicit = parsed[2] is not None or ":" in time_text or not time_text[0].isdigit()
+        if not explicit and not prefix:
+            continue
+        # "at 15" is a 24h time; "at 7" could be either
+        ambiguous = _is_ambiguous(parsed, time_text)
+        hour = _resolve_ambiguous(parsed[0]) if ambiguous else parsed[0]
+        return (hour, parsed[1]), None, [match.span()], ambiguous
+    return None, None, [], False
+
+def _find_duration(text):
+    """Returns (minutes, span) or None"""
+    for match in _DURATION_PATTERN.finditer(text):
+        amount, unit = match.group(1).lower(), match.group(2).lower()
+        # "m" and "h" alone need a number right before them ("30m", "2h")
+        if unit in ("m", "h") and not amount[0].isdigit():
+            continue
+        if amount.startswith("half"):
+            value = 0.5
+        elif amount in ("a", "an", "one"):
+            value = 1
+        else:
+            value = float(amount)
+        minutes = value * 60 if unit.startswith("h") else value
+        if 0 < minutes <= 24 * 60:
+            return int(round(minutes)), match.span()
+    return None
+
+def _find_priority(text):
+    """Returns (priority, spans) for the priority words in the message"""
+    found, spans = set(), []
+    for pattern, priority in _PRIORITY_PATTERNS:
+        for match in pattern.finditer(text):
+            found.add(priority)
+            spans.append(match.span())
+    if len(found) != 1:
+        return None, spans
+    return found.pop(), spans
+
+def _cut(text, spans):
+    """Replace the given spans with a separator, leaving the rest"""
+    for start, end in sorted(spans, reverse=True):
+        text = text[:start] + " | " + text[end:]
+    return text
+
+def _clean_title(text):
+    """Turn what is left of the message into a title"""
+    parts = []
+    for part in text.split("|"):
+        part = part.strip(" ,.-:")
+        # Drop connector words left at the end of each piece
+        while True:
+            trimmed = _DANGLING_WORDS.sub("", part).strip(" ,.-:")
+            if trimmed == part:
+                break
+            part = trimmed
+        if part:
+            parts.append(part)
+    title = " ".join(parts)
+    title = _LEADING_FILLER.sub("", title, count=1)
+    title = re.sub(r"\s+", " ", title).strip(" ,.-:!")
+    return title[:1].upper() + title[1:]
+
+def parse_task_message(message, now=None):
+    """
+    Parse a simple task-creation message without the model
+    Returns the extractor's dict shape plus "confidence"; a result with
+    confidence 0 means the message is not something this parser handles
+    """
+    now = now or datetime.now()
+    text = message.strip()
+    lowered = text.lower()
+    not_handled = {"is_task": False, "confidence": 0.0}
+    # The first word without punctuation, so "what's" and "hi!" are caught too
+    first_word = re.match(r"\W*([a-z]*)", lowered).group(1)
+    if not text or first_word in _QUESTION_WORDS + _NOT_CREATE_FIRST_WORDS or _NOT_CREATE_PATTERN.search(text):
+        return not_handled
+
+    try:
+        date_match = _find_date(text, now.date())
+    except ValueError:
+        return not_handled
+    spans = [date_match[1]] if date_match else []
+
+    # Times are looked for in what is left once the date is cut out, so
+    # "May 3" is not read as 3 o'clock
+    remaining = _cut(text, spans)
+    start, end, time_spans, ambiguous_time = _find_times(remaining)
+    remaining = _cut(remaining, time_spans)
+    duration = _find_duration(remaining)
+    if duration:
+        remaining = _cut(remaining, [duration[1]])
+    priority, priority_spans = _find_priority(remaining)
+    remaining = _cut(remaining, priority_spans)
+
+    is_due_date = bool(_DUE_PATTERN.search(text))
+    first_cue = min((span[0] for span in spans + time_spans), default=None)
+    if first_cue is not None and _DUE_BEFORE_PATTERN.search(text[:first_cue]):
+        is_due_date = True
+    remaining = re.sub(r"\b(?:due|deadline)\b", " | ", remaining, flags=re.IGNORECASE)
+
+    title = _clean_title(remaining)
+
+    confidence = 1.0
+    if not title:
+        return not_handled
+    if not date_match and start is None:
+        # Nothing to schedule; could be a task, could be small talk
+        confidence -= 0.6
+    if ambiguous_time:
+        confidence -= 0.3
+    if re.search(r"\d", title):
+        # A number the rules could not place (a date or time in another format?)
+        confidence -= 0.4
+    if _MULTIPLE_TASKS_PATTERN.search(title):
+        confidence -= 0.3
+    if len(title.split()) > 8:
+        confidence -= 0.2
+    if not _CREATE_CUE.match(text) and _SENTENCE_WORDS.search(title):
+        # Without "add" or "remind me" this is more likely a remark than a task
+        confidence -= 0.5
+    if _TRAILING_WORDS.search(title):
+        confidence -= 0.5
+    if len(priority_spans) and priority is None:
+        # Conflicting priority words
+        confidence -= 0.3
+    if end is not None and start is not None and end <= start:
+        # Past midnight or a typo
+        confidence -= 0.3
+
+    uncertain_fields = ["description"]
+    if priority is None:
+        uncertain_fields.append("priority")
+    if not date_match or date_match[2]:
+        uncertain_fields.append("date")
+    if start is None:
+        uncertain_fields.append("start_time")
+    if start is not None and end is None and duration is None and not is_due_date:
+        uncertain_fields.extend(["end_time", "duration"])
+
+    if start is not None and end is None and duration is not None:
+        end_at = datetime(2000, 1, 1, *start) + timedelta(minutes=duration[0])
+        end = (end_at.hour, end_at.minute) if end_at.day == 1 else None
+        if end is None:
+            confidence -= 0.3
+
+    date = date_match[0] if date_match else now.date()
+    return {
+        "is_task": True,
+        "title": title,
+        "description": "",
+        "priority": priority or "Normal",
+        "date": date.strftime("%Y-%m-%d"),
+        "start_time": f"{start[0]:02d}:{start[1]:02d}" if start else None,
+        "end_time": f"{end[0]:02d}:{end[1]:02d}" if end else None,
+        "is_due_date": is_due_date,
+        "uncertain_fields": uncertain_fields,
+        "confidence": round(max(confidence, 0.0), 2)
+    }
@@ -0,0 +1,185 @@
+"""
+Per-user task-state versions and task list snapshots.
+
+Every task write bumps the owning user's version, and the global version that
+covers queries spanning all users. Caches include the version in their keys,
+so a write makes earlier entries unreachable without explicit invalidation.
+
+get_task_snapshot() keeps the ordered task list of each user in memory under
+its current version, so the summary, list and gap helpers of one chat turn
+share a single query. Single-task writes reported through record_task_write()
+patch the cached snapshot forward instead of discarding it; other per-version
+structures (see services/scheduling.py) can do the same with
+add_write_listener().
+
+Versions and snapshots live in process memory, so they are only exact with a
+single worker process, the Dockerfile's setup. Another worker does not see a
+write until its own cached snapshots expire, up to TASK_SNAPSHOT_TTL_SECONDS
+(60) later. Deployments with several workers should set it to 0, which
+reads every snapshot from the database.
+"""
+from bisect import bisect_right
+import os
+import threading
+from typing import NamedTuple, Optional
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database import session_scope
+from models import Task
+from services.cache import TTLCache
+
+_versions = {}
+_global_version = 0
+_lock = threading.Lock()
+_write_listeners = []
+
+class TaskRow(NamedTuple):
+    """
+    Immutable, detached copy of the Task columns the read helpers need
+    Occurrences of recurring tasks (services/recurrence.py) have no id and
+    carry the id of their TaskRecurrence instead
+    """
+    id: Optional[int]
+    title: str
+    description: Optional[str]
+    priority: Optional[str]
+    deadline: datetime
+    duration: Optional[int]
+    is_due_date: Optional[bool]
+    user_id: Optional[int]
+    recurrence_id: Optional[int] = None
+
+    @classmethod
+    def from_task(cls, task):
+        return cls(
+            task.id,
+            task.title,
+            task.description,
+            task.priority,
+            task.deadline,
+            task.duration,
+            task.is_due_date,
+            task.user_id
+        )
+
+    def sort_key(self):
+        # Tasks come before occurrences with the same deadline
+        if self.id is None:
+            return (self.deadline, True, self.recurrence_id)
+        return (self.deadline, False, self.id)
+
+_TASK_ROW_COLUMNS = [getattr(Task, name) for name in TaskRow._fields if name != "recurrence_id"]
+
+# Snapshots keyed by (user_id, version); the TTL bounds how stale they get
+# when another worker process writes to the same database (see above)
+snapshot_cache = TTLCache(
+    "task_snapshot",
+    maxsize=int(os.getenv("TASK_SNAPSHOT_MAXSIZE", "4096")),
+    ttl=float(os.getenv("TASK_SNAPSHOT_TTL_SECONDS", "60")),
+    copy_values=False
+)
+
+def get_version(user_id=None):
+    """Return the task-state version for a user, or the global version for None"""
+    with _lock:
+        if user_id is None:
+            return _global_version
+        return _versions.get(user_id, 0)
+
+def bump_version(user_id=None):
+    """Record a task write for a user (and for the global view)"""
+    global _global_version
+    with _lock:
+        _global_version += 1
+        if user_id is not None:
+            _versions[user_id] = _versions.get(user_id, 0) + 1
+
+def add_write_listener(listener):
+    """
+    Register listener(scope, old_version, new_version, before, after), called
+    for every scope a single-task write touches, with before/after as TaskRows
+    """
+    _write_listeners.append(listener)
+
+def _patch_snapshot(rows, scope, before, after):
+    """
+    Apply a single-task write to a snapshot, keeping (deadline, id) order
+    An upsert by id: a snapshot loaded between the commit and this patch
+    already holds the written row, which must not be added twice
+    """
+    ids = {row.id for row in (before, after) if row is not None}
+    patched = [row for row in rows if row.id not in ids]
+    if after is not None and (scope is None or after.user_id == scope):
+        keys = [row.sort_key() for row in patched]
+        patched.insert(bisect_right(keys, after.sort_key()), after)
+    return tuple(patched)
+
+# Session.info key holding writes recorded inside a transaction
+_PENDING_WRITES = "pending_task_writes"
+
+def record_task_write(before=None, after=None, db=None):
+    """
+    Record a write to one task
+    `before` is the task as it was (None for creates) and `after` as it is now
+    (None for deletes); both may be Task objects or TaskRows. With `db`, the
+    write is applied when that session's transaction commits and dropped if
+    it rolls back
+    """
+    before = TaskRow.from_task(before) if before is not None else None
+    after = TaskRow.from_task(after) if after is not None else None
+    if db is not None and db.in_transaction():
+        db.info.setdefault(_PENDING_WRITES, []).append((before, after))
+        return
+    _apply_task_write(before, after)
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_writes(session):
+    for before, after in session.info.pop(_PENDING_WRITES, ()):
+        _apply_task_write(before, after)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_writes(session):
+    session.info.pop(_PENDING_WRITES, None)
+
+def _apply_task_write(before, after):
+    global _global_version
+    scopes = {row.user_id for row in (before, after) if row is not None and row.user_id is not None}
+    scopes.add(None)
+
+    with _lock:
+        for scope in scopes:
+            old_version = _global_version if scope is None else _versions.get(scope, 0)
+            new_version = old_version + 1
+            if scope is None:
+                _global_version = new_version
+            else:
+                _versions[scope] = new_version
+
+            rows = snapshot_cache.peek((scope, old_version))
+            if rows is not None:
+                snapshot_cache.set((scope, new_version), _patch_snapshot(rows, scope, before, after))
+            for listener in _write_listeners:
+                listener(scope, old_version, new_version, before, after)
+
+def get_task_snapshot(user_id=None, db=None):
+    """
+    Return the user's tasks (all tasks for None) as TaskRows ordered by deadline
+    Served from memory while the user's task-state version is unchanged
+    """
+    version = get_version(user_id)
+    rows = snapshot_cache.get((user_id, version))
+    if rows is not None:
+        return rows
+
+    with session_scope(db) as db:
+        query = db.query(*_TASK_ROW_COLUMNS)
+        # Filter tasks by user_id if provided
+        if user_id:
+            query = query.filter(Task.user_id == user_id)
+        rows = tuple(TaskRow(*row) for row in query.order_by(Task.deadline, Task.id).all())
+
+    snapshot_cache.set((user_id, version), rows)
+    return rows
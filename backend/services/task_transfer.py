@@ -0,0 +1,196 @@
+"""
+NDJSON/CSV encoding for bulk task import and export.
+
+Import bodies are parsed incrementally from the request stream, so memory is
+bounded by the batch size rather than by the size of the upload. Every record
+is validated on its own and reported by row number, so one bad row does not
+reject the whole file. The same validators check POST /tasks/batch operations.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+from crud import CHANGE_FIELDS, TASK_FIELDS
+
+FORMATS = ("ndjson", "csv")
+
+_TRUE = {"true", "1", "yes", "y"}
+_FALSE = {"false", "0", "no", "n", ""}
+
+def detect_format(content_type=None, requested=None):
+    """Pick the transfer format from an explicit choice or the Content-Type"""
+    if requested:
+        if requested not in FORMATS:
+            raise ValueError(f"Unsupported format: {requested}")
+        return requested
+    if content_type and "csv" in content_type:
+        return "csv"
+    return "ndjson"
+
+async def aiter_lines(chunks):
+    """Yield decoded lines from an async iterator of byte chunks"""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if pending:
+        yield pending.decode("utf-8-sig").rstrip("\r")
+
+async def aiter_records(chunks, fmt):
+    """
+    Yield (row_number, record, error) for each record of an NDJSON or CSV body
+    record is a dict of raw values, or None when the row could not be parsed
+    """
+    row_number = 0
+    header = None
+    record_lines = []
+
+    async for line in aiter_lines(chunks):
+        if fmt == "ndjson":
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("Expected a JSON object")
+                yield row_number, record, None
+            except ValueError as e:
+                yield row_number, None, str(e)
+            continue
+
+        # A CSV record may span lines inside a quoted field; it is complete
+        # once its quotes are balanced
+        record_lines.append(line)
+        text = "\n".join(record_lines)
+        if text.count('"') % 2:
+            continue
+        record_lines = []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, None, f"Expected {len(header)} columns, got {len(values)}"
+        else:
+            yield row_number, dict(zip(header, values)), None
+
+    if record_lines:
+        yield row_number + 1, None, "Unterminated quoted field"
+
+def _parse_bool(value):
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"Invalid is_due_date: {value}")
+
+def _parse_int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name}: {value}")
+
+def _parse_deadline(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid deadline: {value}")
+
+def parse_task_record(record, user_id=None):
+    """
+    Validate a raw import record and return the column values to insert
+    The task belongs to `user_id`; unknown fields, and the record's own id
+    and user_id, are ignored. Raises ValueError on bad input
+    """
+    title = str(record.get("title") or "").strip()
+    if not title:
+        raise ValueError("Missing title")
+
+    if not record.get("deadline"):
+        raise ValueError("Missing deadline")
+    deadline = _parse_deadline(record["deadline"])
+
+    duration = record.get("duration")
+    duration = 60 if duration in (None, "") else _parse_int(duration, "duration")
+    if duration <= 0:
+        raise ValueError(f"Invalid duration: {duration}")
+
+    return {
+        "title": title,
+        "description": record.get("description") or None,
+        "priority": record.get("priority") or "Normal",
+        "deadline": deadline,
+        "duration": duration,
+        "is_due_date": _parse_bool(record.get("is_due_date")),
+        "user_id": user_id or None
+    }
+
+def parse_task_changes(changes):
+    """
+    Validate the fields of a task update and return them with parsed values
+    Raises ValueError for unknown fields or bad values
+    """
+    if not changes:
+        raise ValueError("No changes given")
+    unknown = [name for name in changes if name not in CHANGE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    parsed = dict(changes)
+    if "title" in parsed:
+        parsed["title"] = str(parsed["title"] or "").strip()
+        if not parsed["title"]:
+            raise ValueError("Missing title")
+    if "deadline" in parsed:
+        parsed["deadline"] = _parse_deadline(parsed["deadline"])
+    if "duration" in parsed:
+        parsed["duration"] = _parse_int(parsed["duration"], "duration")
+        if parsed["duration"] <= 0:
+            raise ValueError(f"Invalid duration: {parsed['duration']}")
+    if "is_due_date" in parsed:
+        parsed["is_due_date"] = _parse_bool(parsed["is_due_date"])
+    return parsed
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def iter_encoded(rows, fmt, chunk_rows=500):
+    """Encode task row mappings as NDJSON or CSV text, a few hundred rows per chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n") if fmt == "csv" else None
+    if writer:
+        writer.writerow(TASK_FIELDS)
+
+    pending = 0
+    for row in rows:
+        if writer:
+            writer.writerow([
+                row[name].isoformat() if isinstance(row[name], datetime) else ("" if row[name] is None else row[name])
+                for name in TASK_FIELDS
+            ])
+        else:
+            buffer.write(json.dumps({name: row[name] for name in TASK_FIELDS}, default=_json_default))
+            buffer.write("\n")
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
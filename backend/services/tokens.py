@@ -0,0 +1,116 @@
+"""
+Signed, short-lived access tokens.
+
+Tokens are JWTs signed with HMAC-SHA256 (stdlib hmac, no extra dependency)
+and carry the user id, an expiry and a random token id. Verifying one needs
+no database round-trip; revoked token ids are kept in memory until the
+token would have expired anyway.
+
+The signing key comes from ACCESS_TOKEN_SECRET. Without it a random key is
+generated at startup, so tokens stop working on restart and are not shared
+between worker processes.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+from services.log import get_logger
+from services.metrics import Counter
+
+ACCESS_TOKEN_TTL_SECONDS = int(os.getenv("ACCESS_TOKEN_TTL_SECONDS", "900"))
+
+logger = get_logger("tokens")
+
+_secret = os.getenv("ACCESS_TOKEN_SECRET")
+if not _secret:
+    logger.warning("ACCESS_TOKEN_SECRET is not set; using a random key, tokens will not survive a restart")
+    _secret = secrets.token_urlsafe(32)
+_SECRET = _secret.encode("utf-8")
+
+TOKEN_CHECKS = Counter("access_token_checks_total", "Access tokens verified, by outcome", ("outcome",))
+
+class InvalidTokenError(Exception):
+    """The token is malformed, badly signed, expired or revoked"""
+
+    def __init__(self, message, reason="invalid"):
+        super().__init__(message)
+        self.reason = reason
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _sign(signing_input):
+    return _b64encode(hmac.new(_SECRET, signing_input.encode("ascii"), hashlib.sha256).digest())
+
+_HEADER = _b64encode(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode("utf-8"))
+
+# Revoked token ids and their expiry
+_revoked = {}
+_revoked_lock = threading.Lock()
+
+def create_access_token(user_id, ttl=None, now=None):
+    """
+    Issue a token for `user_id`
+    Returns (token, expires_in seconds)
+    """
+    ttl = ACCESS_TOKEN_TTL_SECONDS if ttl is None else ttl
+    now = int(time.time() if now is None else now)
+    claims = {"sub": str(user_id), "iat": now, "exp": now + ttl, "jti": secrets.token_hex(8)}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    signing_input = f"{_HEADER}.{payload}"
+    return f"{signing_input}.{_sign(signing_input)}", ttl
+
+def _decode(token, now=None):
+    """Check the signature and expiry; return the claims"""
+    # Signing and compare_digest need ASCII; anything else is not one of ours
+    if not token.isascii():
+        raise InvalidTokenError("Malformed token")
+    try:
+        header, payload, signature = token.split(".")
+    except ValueError:
+        raise InvalidTokenError("Malformed token")
+    if header != _HEADER or not hmac.compare_digest(signature, _sign(f"{header}.{payload}")):
+        raise InvalidTokenError("Bad token signature")
+    try:
+        claims = json.loads(_b64decode(payload))
+        int(claims["sub"])
+    except (ValueError, KeyError, TypeError):
+        raise InvalidTokenError("Malformed token")
+    if claims.get("exp", 0) <= (time.time() if now is None else now):
+        raise InvalidTokenError("Token expired", reason="expired")
+    return claims
+
+def verify_access_token(token, now=None):
+    """
+    Return the claims of a valid token, with "sub" as the int user id
+    Raises InvalidTokenError
+    """
+    try:
+        claims = _decode(token, now)
+        with _revoked_lock:
+            revoked = claims.get("jti") in _revoked
+        if revoked:
+            raise InvalidTokenError("Token revoked", reason="revoked")
+    except InvalidTokenError as e:
+        TOKEN_CHECKS.inc(outcome=e.reason)
+        raise
+    TOKEN_CHECKS.inc(outcome="ok")
+    claims["sub"] = int(claims["sub"])
+    return claims
+
+def revoke_access_token(token, now=None):
+    """Reject `token` from now on; expired entries are dropped as new ones come in"""
+    claims = _decode(token, now)
+    now = time.time() if now is None else now
+    with _revoked_lock:
+        for jti in [jti for jti, exp in _revoked.items() if exp <= now]:
+            del _revoked[jti]
+        _revoked[claims["jti"]] = claims["exp"]
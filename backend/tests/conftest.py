@@ -0,0 +1,74 @@
+"""
+Shared fixtures for the backend tests.
+
+Run from the backend directory:
+    python -m pytest
+
+The app reads its settings at import time, so a throwaway SQLite database and
+dummy keys are configured here before anything from the app is imported.
+Every test starts from empty tables and empty in-memory caches.
+"""
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+_handle, _path = tempfile.mkstemp(prefix="scheduler_test_", suffix=".db")
+os.close(_handle)
+os.environ["DATABASE_URL"] = f"sqlite:///{_path}"
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("ACCESS_TOKEN_SECRET", "test-secret")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import models  # noqa: E402
+from database import SessionLocal, init_db  # noqa: E402
+from main import app  # noqa: E402
+from services import task_ai  # noqa: E402
+from services.recurrence import recurrence_cache  # noqa: E402
+from services.scheduling import busy_index_cache  # noqa: E402
+from services.task_state import snapshot_cache  # noqa: E402
+
+@pytest.fixture(autouse=True)
+def database():
+    """Empty tables and caches; cached entries would outlive the dropped rows"""
+    init_db(drop_all=True)
+    for cache in (snapshot_cache, recurrence_cache, busy_index_cache, task_ai.extraction_cache):
+        cache.clear()
+    yield
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def start():
+    """A whole hour well in the future, so tasks never fall in the past"""
+    return datetime(2030, 1, 7, 9, 0)
+
+def add_user(db, user_id):
+    db.add(models.User(
+        id=user_id, username=f"user{user_id}", email=f"user{user_id}@example.com",
+        hashed_password="x", created_at=datetime.now()
+    ))
+    db.commit()
+
+def add_tasks(db, user_id, count, start, step=timedelta(hours=1), **values):
+    """Insert `count` one-hour tasks for a user, `step` apart; returns them in order"""
+    tasks = [
+        models.Task(title=f"Task {user_id}-{i}", deadline=start + i * step, duration=60,
+                    priority="Normal", is_due_date=False, user_id=user_id, **values)
+        for i in range(count)
+    ]
+    db.add_all(tasks)
+    db.commit()
+    return tasks
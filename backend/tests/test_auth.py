@@ -0,0 +1,66 @@
+"""Who a request acts for: bearer tokens and the legacy user_id parameter."""
+from services.tokens import create_access_token, revoke_access_token
+
+from conftest import add_tasks, add_user
+
+def bearer(user_id):
+    token, _ = create_access_token(user_id)
+    return {"Authorization": f"Bearer {token}"}
+
+def test_token_scopes_requests_to_its_user(client, db, start):
+    add_user(db, 1)
+    add_user(db, 2)
+    add_tasks(db, 1, 2, start)
+    add_tasks(db, 2, 1, start)
+    response = client.get("/tasks", headers=bearer(2))
+    assert response.status_code == 200
+    assert [task["user_id"] for task in response.json()] == [2]
+
+def test_requests_naming_no_user_are_rejected(client, db, start):
+    add_user(db, 1)
+    add_tasks(db, 1, 1, start)
+    for method, path in (("GET", "/tasks"), ("GET", "/tasks/conflicts"), ("GET", "/tasks/export"),
+                         ("POST", "/tasks/batch"), ("POST", "/chat")):
+        body = {"GET": None, "POST": {"operations": [], "message": "hi"}}[method]
+        response = client.request(method, path, json=body)
+        assert response.status_code == 401, path
+        assert response.headers["WWW-Authenticate"] == "Bearer"
+
+def test_user_id_must_match_the_token(client, db):
+    add_user(db, 1)
+    assert client.get("/tasks", params={"user_id": 2}, headers=bearer(1)).status_code == 403
+    assert client.get("/tasks", params={"user_id": 1}, headers=bearer(1)).status_code == 200
+
+def test_bad_tokens_are_rejected(client, db):
+    add_user(db, 1)
+    token, _ = create_access_token(1)
+    expired, _ = create_access_token(1, ttl=-1)
+    revoked, _ = create_access_token(1)
+    revoke_access_token(revoked)
+    header, payload, signature = token.split(".")
+    for bad in (f"{header}.{payload}.x{signature[1:]}", expired, revoked, "not-a-token", "café.a.b"):
+        response = client.get("/tasks", headers={"Authorization": f"Bearer {bad}".encode("latin-1")})
+        assert response.status_code == 401, bad
+
+def test_logout_revokes_the_token(client, db):
+    add_user(db, 1)
+    headers = bearer(1)
+    assert client.get("/tasks", headers=headers).status_code == 200
+    assert client.post("/users/logout", headers=headers).status_code == 200
+    assert client.get("/tasks", headers=headers).status_code == 401
+
+def test_put_keeps_the_task_owner(client, db, start):
+    add_user(db, 1)
+    add_user(db, 2)
+    task = add_tasks(db, 1, 1, start)[0]
+    response = client.put(f"/tasks/{task.id}", headers=bearer(1), json={"title": "Mine", "user_id": 2})
+    assert response.status_code == 200
+    assert response.json()["user_id"] == 1
+    assert client.get("/tasks", headers=bearer(2)).json() == []
+
+def test_tasks_of_other_users_are_not_found(client, db, start):
+    add_user(db, 1)
+    add_user(db, 2)
+    task = add_tasks(db, 1, 1, start)[0]
+    assert client.delete(f"/tasks/{task.id}", headers=bearer(2)).status_code == 404
+    assert len(client.get("/tasks", headers=bearer(1)).json()) == 1
@@ -0,0 +1,69 @@
+"""
+search_tasks_by_criteria date and time predicates must be served by an index.
+
+Seeds a 1M-row tasks table once for the module, runs ANALYZE, and checks the
+EXPLAIN QUERY PLAN of every query build_task_search_query makes. Seeding takes
+about a minute and a half; SEARCH_INDEX_TEST_TASKS sets a smaller table for
+quick runs, though the planner's choices are only meaningful on a large one.
+"""
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, text
+
+from database import SessionLocal, engine, init_db
+from models import Task, User
+from services.task_ai import build_task_search_query
+
+TASK_COUNT = int(os.getenv("SEARCH_INDEX_TEST_TASKS", "1000000"))
+USER_COUNT = 1000
+
+CASES = {
+    "tomorrow": {"date_reference": "tomorrow"},
+    "next_week": {"date_reference": "next week"},
+    "exact_date": {"date_reference": (datetime.now() + timedelta(days=3)).strftime("%Y-%m-%d")},
+    "morning": {"time_reference": "morning"},
+    "exact_time": {"time_reference": "3pm"},
+    "tomorrow_afternoon": {"date_reference": "tomorrow", "time_reference": "afternoon"}
+}
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    """One seeded table for every case, in place of the per-test reset"""
+    init_db(drop_all=True)
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=180)
+    with engine.begin() as connection:
+        connection.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com",
+             "hashed_password": "x", "created_at": datetime.now()}
+            for i in range(1, USER_COUNT + 1)
+        ])
+        for offset in range(0, TASK_COUNT, 50000):
+            connection.execute(insert(Task), [
+                {"title": f"Task {i}", "priority": "Normal", "duration": 60, "is_due_date": False,
+                 "user_id": 1 + i % USER_COUNT,
+                 # A year of hourly slots, distinct per user since scheduled tasks may not overlap
+                 "deadline": start + timedelta(hours=(i // USER_COUNT * 7919 + i % USER_COUNT) % (24 * 365))}
+                for i in range(offset, min(offset + 50000, TASK_COUNT))
+            ])
+        connection.execute(text("ANALYZE"))
+    yield
+    init_db(drop_all=True)
+
+def explain(db, query):
+    statement = query.statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    return [str(row[-1]) for row in db.execute(text("EXPLAIN QUERY PLAN " + str(statement)))]
+
+@pytest.mark.skipif(engine.dialect.name != "sqlite", reason="reads SQLite query plans")
+@pytest.mark.parametrize("identifiers", CASES.values(), ids=CASES.keys())
+def test_search_predicates_use_an_index(identifiers):
+    db = SessionLocal()
+    try:
+        query = build_task_search_query(db, identifiers, user_id=42)
+        plan = explain(db, query)
+        assert any(line.startswith("SEARCH tasks USING") and "INDEX" in line for line in plan), plan
+        assert not any(line.startswith("SCAN tasks") for line in plan), plan
+        assert all(task.user_id == 42 for task in query.all())
+    finally:
+        db.close()
@@ -0,0 +1,48 @@
+"""The rule-based fast path in front of the task extractors."""
+from datetime import datetime
+
+import pytest
+
+from services.task_parser import FAST_PATH_MIN_CONFIDENCE, parse_task_message
+
+# A Sunday morning
+NOW = datetime(2026, 10, 18, 10, 0)
+
+@pytest.mark.parametrize("message, expected", [
+    ("dentist tomorrow 3pm-4pm high priority",
+     {"title": "Dentist", "date": "2026-10-19", "start_time": "15:00", "end_time": "16:00", "priority": "High"}),
+    ("gym tomorrow at 7am for 90 minutes", {"title": "Gym", "start_time": "07:00", "end_time": "08:30"}),
+    ("Meeting with Bob on Friday from 9 to 11am",
+     {"title": "Meeting with Bob", "date": "2026-10-23", "start_time": "09:00", "end_time": "11:00"}),
+    ("submit report by friday 5pm", {"title": "Submit report", "start_time": "17:00", "is_due_date": True}),
+    ("team sync 2026-10-21 14:00-15:00", {"title": "Team sync", "date": "2026-10-21", "end_time": "15:00"}),
+    ("remind me to water plants tonight at 9pm", {"title": "Water plants", "date": "2026-10-18", "start_time": "21:00"}),
+    ("lunch with Sam on wednesday noon urgent", {"title": "Lunch with Sam", "start_time": "12:00", "priority": "High"})
+])
+def test_simple_create_messages_are_parsed(message, expected):
+    parsed = parse_task_message(message, now=NOW)
+    assert parsed["is_task"]
+    assert parsed["confidence"] >= FAST_PATH_MIN_CONFIDENCE
+    assert {key: parsed[key] for key in expected} == expected
+
+@pytest.mark.parametrize("message", [
+    # Not creates: look-ups, edits, deletes in their many wordings, small talk
+    "show my tasks for tomorrow",
+    "what's on tomorrow at 3pm",
+    "move gym to friday at 6pm",
+    "rescheduled dentist to tomorrow 4pm",
+    "delete the dentist appointment tomorrow 3pm",
+    "drop the dentist tomorrow 3pm",
+    "skip gym tomorrow at 6pm",
+    "dentist tomorrow 3pm is cancelled",
+    "nix lunch with Sam on wednesday noon",
+    "can't make the team sync tomorrow at 10am",
+    "mark dentist tomorrow at 3pm as done",
+    "thanks see you tomorrow at 5pm",
+    # Creates the rules cannot place with confidence
+    "dentist tomorrow 3-4",
+    "buy milk",
+    "call john at 5 and email sarah at 6"
+])
+def test_other_messages_fall_through_to_the_model(message):
+    assert parse_task_message(message, now=NOW)["confidence"] < FAST_PATH_MIN_CONFIDENCE
@@ -0,0 +1,105 @@
+"""Task snapshots: patched on committed writes, never served stale."""
+from datetime import timedelta
+
+import models
+from database import SessionLocal, unit_of_work
+from services.task_ai import dispatch_intent
+from services.task_state import get_task_snapshot, get_version, record_task_write, snapshot_cache
+
+from conftest import add_tasks, add_user
+
+def test_snapshot_is_served_from_memory_while_the_version_holds(db, start):
+    add_user(db, 1)
+    add_tasks(db, 1, 2, start)
+    rows = get_task_snapshot(1)
+    assert get_task_snapshot(1) is rows
+    assert [row.title for row in rows] == ["Task 1-0", "Task 1-1"]
+
+def test_writes_through_the_api_patch_the_snapshot(client, db, start):
+    add_user(db, 1)
+    first, second = add_tasks(db, 1, 2, start)
+    get_task_snapshot(1)
+    version = get_version(1)
+
+    created = client.post("/tasks", params={"user_id": 1}, json={
+        "title": "Early", "deadline": (start - timedelta(hours=2)).isoformat()
+    }).json()
+    client.put(f"/tasks/{second.id}", params={"user_id": 1}, json={"title": "Moved"})
+    client.delete(f"/tasks/{first.id}", params={"user_id": 1})
+
+    assert get_version(1) == version + 3
+    # Patched forward rather than reloaded: the entry is already cached
+    patched = snapshot_cache.peek((1, get_version(1)))
+    assert [(row.id, row.title) for row in patched] == [(created["id"], "Early"), (second.id, "Moved")]
+    assert get_task_snapshot(1) == patched
+
+def test_snapshot_of_another_user_is_left_alone(client, db, start):
+    add_user(db, 1)
+    add_user(db, 2)
+    add_tasks(db, 2, 1, start)
+    rows = get_task_snapshot(2)
+    client.post("/tasks", params={"user_id": 1}, json={"title": "Mine", "deadline": start.isoformat()})
+    assert get_task_snapshot(2) is rows
+
+def test_rolled_back_writes_are_not_applied(db, start):
+    add_user(db, 1)
+    add_tasks(db, 1, 1, start)
+    rows = get_task_snapshot(1)
+    version = get_version(1)
+
+    session = SessionLocal()
+    try:
+        try:
+            with unit_of_work(session):
+                task = models.Task(title="Gone", deadline=start + timedelta(hours=3), duration=60, user_id=1)
+                session.add(task)
+                session.flush()
+                record_task_write(after=task, db=session)
+                raise RuntimeError("abort")
+        except RuntimeError:
+            pass
+    finally:
+        session.close()
+
+    assert get_version(1) == version
+    assert get_task_snapshot(1) is rows
+
+def test_chat_delete_lists_the_tasks_left(db, start):
+    add_user(db, 1)
+    add_tasks(db, 1, 1, start)
+    db.add(models.Task(title="Dentist", deadline=start + timedelta(hours=2), duration=60, user_id=1))
+    db.commit()
+    get_task_snapshot(1)
+
+    session = SessionLocal()
+    try:
+        result = dispatch_intent(
+            {"intent": "delete", "task_identifiers": {"title_keywords": ["Dentist"]}}, 1, db=session
+        )
+    finally:
+        session.close()
+
+    assert result["delete_result"]["success"]
+    task_list = result["delete_result"]["updated_task_list"]
+    assert "Task 1-0" in task_list
+    assert "Dentist" not in task_list
+
+def test_chat_edit_lists_the_changed_task(db, start):
+    add_user(db, 1)
+    db.add(models.Task(title="Dentist", deadline=start, duration=60, user_id=1))
+    db.commit()
+    get_task_snapshot(1)
+
+    session = SessionLocal()
+    try:
+        result = dispatch_intent({
+            "intent": "edit",
+            "task_identifiers": {"title_keywords": ["Dentist"]},
+            "changes": {"title": "Orthodontist"}
+        }, 1, db=session)
+    finally:
+        session.close()
+
+    assert result["edit_result"]["success"]
+    assert "Orthodontist" in result["edit_result"]["updated_task_list"]
+    assert [row.title for row in get_task_snapshot(1)] == ["Orthodontist"]
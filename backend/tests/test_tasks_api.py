@@ -0,0 +1,163 @@
+"""Task routes: cursor pagination, overlap checks, batches and imports."""
+import json
+from datetime import timedelta
+
+from conftest import add_tasks, add_user
+
+def test_pages_follow_the_cursor_in_deadline_order(client, db, start):
+    add_user(db, 1)
+    add_user(db, 2)
+    tasks = add_tasks(db, 1, 7, start)
+    add_tasks(db, 2, 3, start)
+
+    seen, cursor = [], None
+    for _ in range(4):
+        params = {"user_id": 1, "limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/tasks", params=params)
+        assert response.status_code == 200
+        seen.extend(task["id"] for task in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert seen == [task.id for task in tasks]
+    assert cursor is None
+
+def test_page_keeps_its_place_when_earlier_tasks_are_deleted(client, db, start):
+    add_user(db, 1)
+    tasks = add_tasks(db, 1, 4, start)
+    first = client.get("/tasks", params={"user_id": 1, "limit": 2})
+    client.delete(f"/tasks/{tasks[0].id}", params={"user_id": 1})
+
+    second = client.get("/tasks", params={"user_id": 1, "limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+    assert [task["id"] for task in second.json()] == [tasks[2].id, tasks[3].id]
+
+def test_page_filters_by_deadline_and_selects_fields(client, db, start):
+    # from is inclusive, to exclusive
+    add_user(db, 1)
+    tasks = add_tasks(db, 1, 5, start)
+    response = client.get("/tasks", params={
+        "user_id": 1, "from": (start + timedelta(hours=1)).isoformat(),
+        "to": (start + timedelta(hours=3)).isoformat(), "fields": "id,title"
+    })
+    assert response.json() == [{"id": task.id, "title": task.title} for task in tasks[1:3]]
+
+def test_bad_cursor_and_unknown_fields_are_rejected(client, db):
+    add_user(db, 1)
+    assert client.get("/tasks", params={"user_id": 1, "cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/tasks", params={"user_id": 1, "fields": "id,password"}).status_code == 400
+
+def test_overlapping_task_is_rejected_with_the_tasks_in_the_way(client, db, start):
+    add_user(db, 1)
+    existing = add_tasks(db, 1, 1, start)[0]
+
+    response = client.post("/tasks", params={"user_id": 1}, json={
+        "title": "Clash", "deadline": (start + timedelta(minutes=30)).isoformat(), "duration": 60
+    })
+    assert response.status_code == 409
+    assert [task["id"] for task in response.json()["conflicts"]] == [existing.id]
+
+    # Back to back is fine, as are due dates and other users' tasks
+    for user_id, values in ((1, {"deadline": (start + timedelta(hours=1)).isoformat()}),
+                            (1, {"deadline": start.isoformat(), "is_due_date": True}),
+                            (2, {"deadline": start.isoformat()})):
+        if user_id == 2:
+            add_user(db, 2)
+        response = client.post("/tasks", params={"user_id": user_id}, json={"title": "Fits", "duration": 60, **values})
+        assert response.status_code == 200, response.json()
+
+def test_moving_a_task_onto_another_is_rejected(client, db, start):
+    add_user(db, 1)
+    first, second = add_tasks(db, 1, 2, start)
+    response = client.put(f"/tasks/{second.id}", params={"user_id": 1}, json={"deadline": start.isoformat()})
+    assert response.status_code == 409
+    assert [task["id"] for task in response.json()["conflicts"]] == [first.id]
+
+def test_conflicts_route_checks_a_slot(client, db, start):
+    add_user(db, 1)
+    first, second = add_tasks(db, 1, 2, start)
+    response = client.get("/tasks/conflicts", params={
+        "user_id": 1, "start": (start + timedelta(minutes=30)).isoformat(), "duration": 60, "exclude_id": first.id
+    })
+    assert [task["id"] for task in response.json()["conflicts"]] == [second.id]
+
+def test_batch_applies_every_operation_or_none(client, db, start):
+    add_user(db, 1)
+    first, second = add_tasks(db, 1, 2, start)
+    response = client.post("/tasks/batch", params={"user_id": 1}, json={"operations": [
+        {"op": "update", "id": first.id, "changes": {"title": "Renamed"}},
+        {"op": "delete", "id": 999}
+    ]})
+    assert response.status_code == 404
+    assert [result["status"] for result in response.json()["results"]] == ["skipped", "not_found"]
+
+    response = client.post("/tasks/batch", params={"user_id": 1}, json={"operations": [
+        {"op": "update", "id": first.id, "changes": {"title": "Renamed"}},
+        {"op": "delete", "id": second.id},
+        {"op": "create", "task": {"title": "New", "deadline": (start + timedelta(hours=5)).isoformat()}}
+    ]})
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == ["updated", "deleted", "created"]
+    assert [task["title"] for task in client.get("/tasks", params={"user_id": 1}).json()] == ["Renamed", "New"]
+
+def test_batch_cannot_change_task_owners(client, db, start):
+    add_user(db, 1)
+    add_user(db, 2)
+    task = add_tasks(db, 1, 1, start)[0]
+    response = client.post("/tasks/batch", params={"user_id": 1}, json={"operations": [
+        {"op": "update", "id": task.id, "changes": {"user_id": 2}},
+        {"op": "create", "task": {"title": "Other", "deadline": start.isoformat(), "user_id": 2, "is_due_date": True}}
+    ]})
+    assert response.status_code == 400
+    assert response.json()["results"][0]["error"] == "Unknown fields: user_id"
+
+    response = client.post("/tasks/batch", params={"user_id": 1}, json={"operations": [
+        {"op": "create", "task": {"title": "Other", "deadline": start.isoformat(), "user_id": 2, "is_due_date": True}}
+    ]})
+    assert response.json()["results"][0]["task"]["user_id"] == 1
+    assert client.get("/tasks", params={"user_id": 2}).json() == []
+
+def test_batch_reports_overlaps_within_the_batch(client, db, start):
+    add_user(db, 1)
+    response = client.post("/tasks/batch", params={"user_id": 1}, json={"operations": [
+        {"op": "create", "task": {"title": "A", "deadline": start.isoformat()}},
+        {"op": "create", "task": {"title": "B", "deadline": (start + timedelta(minutes=30)).isoformat()}}
+    ]})
+    assert response.status_code == 409
+    assert response.json()["conflicts"]
+    assert client.get("/tasks", params={"user_id": 1}).json() == []
+
+def test_import_creates_rows_for_the_requesting_user(client, db, start):
+    add_user(db, 1)
+    add_user(db, 2)
+    rows = [
+        {"title": "One", "deadline": start.isoformat(), "user_id": 2},
+        {"title": "", "deadline": start.isoformat()},
+        {"title": "Two", "deadline": (start + timedelta(hours=1)).isoformat(), "duration": "abc"},
+        {"title": "Three", "deadline": (start + timedelta(hours=2)).isoformat()}
+    ]
+    body = "\n".join(json.dumps(row) for row in rows) + "\n{not json\n"
+    response = client.post("/tasks/import", params={"user_id": 1, "format": "ndjson"}, content=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["imported"], result["failed"]) == (2, 3)
+    assert [error["row"] for error in result["errors"]] == [2, 3, 5]
+
+    assert [task["title"] for task in client.get("/tasks", params={"user_id": 1}).json()] == ["One", "Three"]
+    assert client.get("/tasks", params={"user_id": 2}).json() == []
+
+def test_import_errors_stay_in_row_order(client, db, start):
+    add_user(db, 1)
+    add_tasks(db, 1, 1, start)
+    # Row 1 only fails on insert (it overlaps), after row 2 failed validation
+    rows = [
+        {"title": "Clash", "deadline": start.isoformat()},
+        {"title": "", "deadline": start.isoformat()},
+        {"title": "Fine", "deadline": (start + timedelta(hours=3)).isoformat()}
+    ]
+    body = "\n".join(json.dumps(row) for row in rows)
+    result = client.post("/tasks/import", params={"user_id": 1, "format": "ndjson"}, content=body).json()
+    assert result["imported"] == 1
+    assert [error["row"] for error in result["errors"]] == [1, 2]